@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Agent join for the AIA Lucky Draw System
+Resolves each worker of the Generation sheet (a group number and an agent
+name) to their row of the Eligible Agent sheet, for the worker's agent
+code, agency code and district. The Eligible Agent rows are indexed once,
+across all groups, so each worker is resolved with a few dict lookups and
+the whole join stays linear in the rows of both sheets:
+
+    1. the same group and agent name, as written (a name listed more than
+       once keeps its last row, as the join always has);
+    2. the same group and normalized name: Unicode compatibility forms
+       folded (full-width letters, ideographic spaces), case ignored and
+       runs of whitespace collapsed, so "CHAN  Tai Man" finds "Chan Tai Man";
+    3. the same group and agent code, for Generation rows that hold the
+       agent's code instead of their name.
+
+A step that finds rows of more than one agent (different agent codes)
+leaves the worker unresolved rather than guess, except in step 1, which
+keeps its last row. Workers of a group that has no match are unmatched.
+
+The report (data/agent-join.json, next to summary.json) lists in full:
+
+    {
+      "version": 1,
+      "totals": {"workers": ..., "matched": ..., "matchedByName": ..., "matchedByCode": ...,
+                 "unmatchedWorkers": ..., "ambiguousWorkers": ...,
+                 "agentsWithoutTickets": ..., "duplicateAgents": ...},
+      "unmatchedWorkers": [{"groupNo", "name", "otherGroups"}],   # groups where the name is listed
+      "ambiguousWorkers": [{"groupNo", "name", "resolved": agent or null, "candidates": [agent, ...]}],
+      "agentsWithoutTickets": [agent, ...],                       # eligible rows no worker matched
+      "duplicateAgents": [{"agent" or "groupNo" and "name", "rows": [agent, ...]}]
+    }
+
+where an agent is {"groupNo", "agent", "agentName", "agencyCode"}. A
+duplicate agent is an agent code on more than one row, or a name without
+agent code listed more than once in a group. When several workbooks are
+merged, entries carry the campaign they come from.
+"""
+
+import unicodedata
+
+from extract_records import NO_AGENT
+
+AGENT_JOIN_FORMAT_VERSION = 1
+AGENT_JOIN_FILE = 'agent-join.json'
+
+def normalize_agent_name(name):
+    """Name folded for matching: compatibility forms, case and whitespace ignored"""
+
+    name = str(name)
+    if name.isascii():
+        # NFKC leaves ASCII as it is
+        return ' '.join(name.lower().split())
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+def normalize_agent_code(code):
+    """Agent code folded for matching: case and whitespace ignored"""
+
+    return ''.join(unicodedata.normalize('NFKC', str(code)).upper().split())
+
+def _agent_entry(group_no, agent):
+    return {'groupNo': group_no, 'agent': agent.agent, 'agentName': agent.agent_name, 'agencyCode': agent.agency_code}
+
+def _index_position(index, key, position):
+    # Most keys have one row: a bare position, turned into a list on a repeat,
+    # saves a list per row
+    found = index.get(key)
+    if found is None:
+        index[key] = position
+    elif type(found) is int:
+        index[key] = [found, position]
+    else:
+        found.append(position)
+
+def _lookup_positions(index, key):
+    found = index.get(key)
+    return (found,) if type(found) is int else found
+
+class AgentJoin:
+    """Indexes of the Eligible Agent rows, and what resolving the workers against them found
+
+    group_families_data maps group number to GroupRecord, as
+    aggregate_eligible_rows returns it. resolve() is called once per worker;
+    report() is complete once every worker has been resolved.
+    """
+
+    def __init__(self, group_families_data):
+        # Every eligible row as (group number, AgentRecord); indexes hold positions in it
+        self.agents = []
+        self.by_name = {}
+        self.by_normalized_name = {}
+        self.by_code = {}
+        for group_no, group in group_families_data.items():
+            for agent in group.agents:
+                position = len(self.agents)
+                self.agents.append((group_no, agent))
+                _index_position(self.by_name, (group_no, agent.agent_name), position)
+                _index_position(self.by_normalized_name, (group_no, normalize_agent_name(agent.agent_name)), position)
+                if agent.agent:
+                    _index_position(self.by_code, (group_no, normalize_agent_code(agent.agent)), position)
+        # Normalized name -> groups it is listed in; built for the first unmatched worker
+        self.name_groups = None
+
+        self.matched = bytearray(len(self.agents))
+        self.workers = 0
+        self.matched_by_name = 0
+        self.matched_by_code = 0
+        self.unmatched_workers = []
+        self.ambiguous_workers = []
+
+    def _agent_codes(self, positions):
+        return {normalize_agent_code(self.agents[position][1].agent) for position in positions}
+
+    def resolve(self, group_no, agent_name):
+        """The AgentRecord of a worker, or NO_AGENT"""
+
+        self.workers += 1
+        positions = _lookup_positions(self.by_name, (group_no, agent_name))
+        if positions is not None:
+            if len(positions) > 1 and len(self._agent_codes(positions)) > 1:
+                self._note_ambiguous(group_no, agent_name, positions, positions[-1])
+            return self._match(positions)
+
+        normalized_name = normalize_agent_name(agent_name)
+        for positions, by_code in ((_lookup_positions(self.by_normalized_name, (group_no, normalized_name)), False),
+                                   (_lookup_positions(self.by_code, (group_no, normalize_agent_code(agent_name))), True)):
+            if positions is None:
+                continue
+            if len(positions) > 1 and len(self._agent_codes(positions)) > 1:
+                self._note_ambiguous(group_no, agent_name, positions, None)
+                return NO_AGENT
+            if by_code:
+                self.matched_by_code += 1
+            else:
+                self.matched_by_name += 1
+            return self._match(positions)
+
+        if self.name_groups is None:
+            self.name_groups = {}
+            for listed_group, listed_name in self.by_normalized_name:
+                self.name_groups.setdefault(listed_name, []).append(listed_group)
+        other_groups = [other for other in self.name_groups.get(normalized_name, ()) if other != group_no]
+        self.unmatched_workers.append({'groupNo': group_no, 'name': agent_name, 'otherGroups': other_groups})
+        return NO_AGENT
+
+    def _match(self, positions):
+        # Rows repeating the agent are theirs too; the last one is used
+        for position in positions:
+            self.matched[position] = 1
+        return self.agents[positions[-1]][1]
+
+    def _note_ambiguous(self, group_no, agent_name, positions, resolved):
+        for position in positions:
+            self.matched[position] = 1
+        self.ambiguous_workers.append({
+            'groupNo': group_no, 'name': agent_name,
+            'resolved': None if resolved is None else _agent_entry(*self.agents[resolved]),
+            'candidates': [_agent_entry(*self.agents[position]) for position in positions],
+        })
+
+    def agents_without_tickets(self):
+        return [_agent_entry(*self.agents[position]) for position, matched in enumerate(self.matched) if not matched]
+
+    def duplicate_agents(self):
+        duplicates = {}
+        for position, (group_no, agent) in enumerate(self.agents):
+            if agent.agent:
+                key = ('agent', normalize_agent_code(agent.agent))
+            else:
+                key = ('name', group_no, normalize_agent_name(agent.agent_name))
+            _index_position(duplicates, key, position)
+        report = []
+        for key, positions in duplicates.items():
+            if type(positions) is int:
+                continue
+            entry = {'agent': key[1]} if key[0] == 'agent' else {'groupNo': key[1], 'name': self.agents[positions[0]][1].agent_name}
+            entry['rows'] = [_agent_entry(*self.agents[position]) for position in positions]
+            report.append(entry)
+        return report
+
+    def report(self):
+        """The report of one workbook's join, without its version"""
+
+        unresolved = sum(1 for worker in self.ambiguous_workers if worker['resolved'] is None)
+        agents_without_tickets = self.agents_without_tickets()
+        duplicate_agents = self.duplicate_agents()
+        return {
+            'totals': {
+                'workers': self.workers,
+                'matched': self.workers - len(self.unmatched_workers) - unresolved,
+                'matchedByName': self.matched_by_name,
+                'matchedByCode': self.matched_by_code,
+                'unmatchedWorkers': len(self.unmatched_workers),
+                'ambiguousWorkers': len(self.ambiguous_workers),
+                'agentsWithoutTickets': len(agents_without_tickets),
+                'duplicateAgents': len(duplicate_agents),
+            },
+            'unmatchedWorkers': self.unmatched_workers,
+            'ambiguousWorkers': self.ambiguous_workers,
+            'agentsWithoutTickets': agents_without_tickets,
+            'duplicateAgents': duplicate_agents,
+        }
+
+def agent_join_report(joins):
+    """The report document of [(campaign or None, AgentJoin), ...], one per workbook read"""
+
+    merged = {'version': AGENT_JOIN_FORMAT_VERSION, 'totals': {}}
+    for campaign, join in joins:
+        report = join.report()
+        for key, value in report.pop('totals').items():
+            merged['totals'][key] = merged['totals'].get(key, 0) + value
+        for key, entries in report.items():
+            if campaign is not None:
+                entries = [{'campaign': campaign, **entry} for entry in entries]
+            merged.setdefault(key, []).extend(entries)
+    return merged
+
+def describe_agent_join(report):
+    """One line for the run summary"""
+
+    totals = report['totals']
+    parts = [f"{totals['matched']} of {totals['workers']} workers matched"]
+    if totals['matchedByName'] or totals['matchedByCode']:
+        parts[0] += f" ({totals['matchedByName']} by normalized name, {totals['matchedByCode']} by agent code)"
+    for key, label in (('unmatchedWorkers', 'unmatched'), ('ambiguousWorkers', 'ambiguous'),
+                       ('agentsWithoutTickets', 'eligible agents without tickets'), ('duplicateAgents', 'duplicate agents')):
+        if totals[key]:
+            parts.append(f"{totals[key]} {label}")
+    return ", ".join(parts)
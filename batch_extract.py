@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Batch extraction for the AIA Lucky Draw System
+Extracts several campaign workbooks in parallel, one process per workbook,
+and merges them into one dataset (run with simple_extract.py --batch). The
+column mappings come from a JSON config file instead of nine positional
+arguments:
+
+    {
+      "workbooks": ["campaigns/"],
+      "columns": {
+        "generation": {"agentName": "Agent Name", "groupNo": "Group No.", "laySeeAmount": "Lay See amount"},
+        "eligible": {"groupNo": "Group No.", "family": "Family", "agent": "Agent",
+                     "agentName": "Agent name", "agencyCode": "Agency code", "district": "District"}
+      },
+      "files": {
+        "*Special Districts*": {"campaign": "Special Districts",
+                                "columns": {"generation": {"laySeeAmount": "Lay See"}}}
+      }
+    }
+
+"workbooks" lists workbook files, directories (every .xlsx/.xlsm in them)
+and glob patterns, relative to the config file; workbooks named on the
+command line are used instead. "files" sets the campaign name (by default
+the file name without its extension) and overrides some of the columns for
+workbooks whose file name matches a pattern; the first match applies.
+
+Workbooks are merged in path order and each one's groups in sheet order.
+A group is identified by its campaign and group number, so group 1 of two
+campaigns stays two groups. New groups and workers are numbered in that
+order by the employee ID registry (employee_ids.py), so the numbering does
+not depend on which workbook finished extracting first. Agents found in
+more than one workbook are listed in batch_report.json next to the output.
+"""
+
+import contextlib
+import fnmatch
+import glob
+import hashlib
+import io
+import json
+import os
+
+from agent_join import AgentJoin
+from employee_ids import EmployeeIdRegistry
+from extract_cache import file_content_hash
+from extract_stats import NO_STATS
+from search_index import normalize_search_text
+from spill_aggregate import parse_memory_budget
+from simple_extract import (
+    OUTPUT_PATH,
+    _run_tasks_in_pool,
+    employee_ids_path,
+    extract_workbook_data,
+    iter_javascript_groups,
+    publish_extraction,
+    write_text_if_changed,
+)
+
+DEFAULT_CONFIG_PATH = 'extract_config.json'
+BATCH_REPORT_FORMAT_VERSION = 1
+
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# Config keys for the columns simple_extract.py takes as positional arguments, in order
+GENERATION_COLUMN_KEYS = ('agentName', 'groupNo', 'laySeeAmount')
+ELIGIBLE_COLUMN_KEYS = ('groupNo', 'family', 'agent', 'agentName', 'agencyCode', 'district')
+
+class BatchConfigError(ValueError):
+    """Raised for a config file or workbook list that cannot be used"""
+
+def load_batch_config(config_path):
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except OSError as e:
+        raise BatchConfigError(f"Cannot read config file {config_path}: {e}")
+    except ValueError as e:
+        raise BatchConfigError(f"Config file {config_path} is not valid JSON: {e}")
+    if not isinstance(config, dict):
+        raise BatchConfigError(f"Config file {config_path} must hold a JSON object")
+    return config
+
+def is_workbook_file(path):
+    name = os.path.basename(path)
+    # Excel's "~$name.xlsx" lock files sit beside open workbooks
+    return name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith('~$') and os.path.isfile(path)
+
+def resolve_workbook_paths(entries, base_dir='.'):
+    """Expand workbook files, directories and glob patterns into a sorted list of distinct paths"""
+
+    paths = {}
+    for entry in entries:
+        pattern = os.path.join(base_dir, os.path.expanduser(entry))
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        matches = [path for path in matches if is_workbook_file(path)]
+        if not matches:
+            raise BatchConfigError(f"No workbooks found for {entry}")
+        for path in matches:
+            paths.setdefault(os.path.realpath(path), os.path.abspath(path))
+    return sorted(paths.values())
+
+def _column_names(columns, sheet, keys, source):
+    mapping = columns.get(sheet, {})
+    missing = [key for key in keys if not mapping.get(key)]
+    if missing:
+        raise BatchConfigError(f"{source}: no {sheet} column given for {', '.join(missing)}")
+    return tuple(mapping[key] for key in keys)
+
+def workbook_settings(config, path):
+    """(campaign, generation columns, eligible columns) for one workbook"""
+
+    campaign = os.path.splitext(os.path.basename(path))[0]
+    columns = {sheet: dict(mapping) for sheet, mapping in config.get('columns', {}).items()}
+    for pattern, settings in config.get('files', {}).items():
+        if fnmatch.fnmatch(os.path.basename(path), pattern):
+            campaign = settings.get('campaign', campaign)
+            for sheet, mapping in settings.get('columns', {}).items():
+                columns.setdefault(sheet, {}).update(mapping)
+            break
+    return (
+        campaign,
+        _column_names(columns, 'generation', GENERATION_COLUMN_KEYS, path),
+        _column_names(columns, 'eligible', ELIGIBLE_COLUMN_KEYS, path),
+    )
+
+def _extract_workbook_task(task):
+    """Process-pool entry point: extract one workbook; returns (content hash, workers, groups, log text)
+
+    The workbook's sheets are read one after the other, as the pool already
+    runs one process per workbook. Its log is returned rather than printed,
+    so the logs of workbooks read side by side do not interleave.
+    """
+
+    excel_path, generation_columns, eligible_columns, use_snapshot, fast, memory_budget = task
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        content_hash = file_content_hash(excel_path)
+        workers_data, group_families_data = extract_workbook_data(
+            excel_path, generation_columns, eligible_columns, max_workers=1,
+            content_hash=content_hash, use_snapshot=use_snapshot, fast=fast, memory_budget=memory_budget)
+    return content_hash, workers_data, group_families_data, log.getvalue()
+
+def agent_key(worker):
+    """What identifies the same agent across workbooks: the agent code, else the normalized name"""
+
+    if worker.get('agent'):
+        return f"agent:{worker['agent']}"
+    return f"name:{normalize_search_text(worker['name'])}"
+
+def iter_merged_groups(workbooks, results, employee_ids, appearances, joins):
+    """Yield every workbook's groups in turn, noting where each agent appears
+
+    appearances maps agent_key to a list of (workbook index, group ID,
+    employee ID, name, tickets) tuples. Each workbook's AgentJoin is
+    appended to joins as (campaign, AgentJoin).
+    """
+
+    for index, ((_, campaign, _, _), (_, workers_data, group_families_data, _)) in enumerate(zip(workbooks, results)):
+        join = AgentJoin(group_families_data)
+        joins.append((campaign, join))
+        for group_id, group in iter_javascript_groups(workers_data, group_families_data, employee_ids, campaign, join):
+            for worker in group['workers']:
+                appearance = (index, group_id, worker['employeeId'], worker['name'], worker['tickets'])
+                appearances.setdefault(agent_key(worker), []).append(appearance)
+            yield group_id, group
+
+def find_duplicate_agents(workbooks, appearances):
+    """Agents that appear in more than one workbook, sorted by agent key"""
+
+    duplicates = []
+    for key in sorted(appearances):
+        found = appearances[key]
+        if len({index for index, _, _, _, _ in found}) < 2:
+            continue
+        kind, _, value = key.partition(':')
+        duplicates.append({kind: value, 'appearances': [
+            {'workbook': workbooks[index][0], 'campaign': workbooks[index][1], 'groupId': group_id,
+             'employeeId': employee_id, 'name': name, 'tickets': tickets}
+            for index, group_id, employee_id, name, tickets in found
+        ]})
+    return duplicates
+
+def run_batch_extraction(config_path, workbook_entries, flags, stats=NO_STATS):
+    """Extract and merge the workbooks of a batch config; returns False if the batch cannot run
+
+    workbook_entries (files, directories or globs) replace the config's
+    "workbooks" list when given. --jobs=N limits the number of workbooks
+    read at once (default: one per CPU). With --memory-budget the workbooks
+    are read one at a time in this process, each spilling its worker totals
+    to disk beyond the budget (see spill_aggregate.py).
+    """
+
+    try:
+        config = load_batch_config(config_path)
+        if workbook_entries:
+            paths = resolve_workbook_paths(workbook_entries)
+        else:
+            paths = resolve_workbook_paths(config.get('workbooks', []), os.path.dirname(os.path.abspath(config_path)))
+        if not paths:
+            raise BatchConfigError("No workbooks given (list them under \"workbooks\" or on the command line)")
+        workbooks = [(path,) + workbook_settings(config, path) for path in paths]
+        campaigns = [campaign for _, campaign, _, _ in workbooks]
+        repeated = sorted({campaign for campaign in campaigns if campaigns.count(campaign) > 1})
+        if repeated:
+            raise BatchConfigError(f"Several workbooks have the campaign name {', '.join(repeated)}; "
+                                   "set distinct names under \"files\"")
+    except BatchConfigError as e:
+        print(f"Error: {e}")
+        return False
+
+    print(f"Extracting {len(workbooks)} workbooks:")
+    for path, campaign, _, _ in workbooks:
+        print(f"  {campaign}: {path}")
+
+    use_snapshot = 'no-snapshot' not in flags
+    fast = 'fast-xlsx' in flags
+    memory_budget = parse_memory_budget(flags['memory-budget']) if 'memory-budget' in flags else None
+    tasks = [(path, generation_columns, eligible_columns, use_snapshot, fast, memory_budget)
+             for path, _, generation_columns, eligible_columns in workbooks]
+    max_workers = int(flags['jobs']) if isinstance(flags.get('jobs'), str) else (os.cpu_count() or 1)
+    if memory_budget:
+        # Spilled totals stay in the process that read them
+        max_workers = 1
+    with stats.stage('extract workbooks'):
+        results = None
+        if max_workers > 1 and len(tasks) > 1:
+            results = _run_tasks_in_pool(_extract_workbook_task, tasks, min(max_workers, len(tasks)))
+        if results is None:
+            results = [_extract_workbook_task(task) for task in tasks]
+    stats.set('workbooks', len(workbooks))
+
+    for (path, campaign, _, _), (_, _, _, log_text) in zip(workbooks, results):
+        print(f"\n[{campaign}]")
+        print(log_text.rstrip())
+
+    # Identifies the set of workbook versions in data/delta.json
+    batch_hash = hashlib.sha256('\n'.join(content_hash for content_hash, _, _, _ in results).encode('utf-8')).hexdigest()
+
+    employee_ids = EmployeeIdRegistry.load(employee_ids_path())
+    appearances = {}
+    joins = []
+    groups = iter_merged_groups(workbooks, results, employee_ids, appearances, joins)
+    sheet_totals = [(campaign, getattr(workers_data, 'sheet_totals', None))
+                    for (_, campaign, _, _), (_, workers_data, _, _) in zip(workbooks, results)]
+    publish_extraction(groups, flags, stats, employee_ids, batch_hash, sheet_totals=sheet_totals, joins=joins)
+
+    duplicates = find_duplicate_agents(workbooks, appearances)
+    report = {
+        'version': BATCH_REPORT_FORMAT_VERSION,
+        'workbooks': [
+            {'path': path, 'campaign': campaign, 'contentHash': content_hash,
+             'groups': len(workers_data), 'workers': sum(len(workers) for workers in workers_data.values())}
+            for (path, campaign, _, _), (content_hash, workers_data, _, _) in zip(workbooks, results)
+        ],
+        'duplicateAgents': duplicates,
+    }
+    report_path = os.path.join(os.path.dirname(OUTPUT_PATH), 'batch_report.json')
+    write_text_if_changed(report_path, json.dumps(report, indent=2, ensure_ascii=False))
+    stats.set('duplicate_agents', len(duplicates))
+
+    print(f"\n{len(duplicates)} agents appear in more than one workbook (see {report_path})")
+    for duplicate in duplicates[:10]:
+        names = sorted({appearance['name'] for appearance in duplicate['appearances']})
+        found_in = sorted({appearance['campaign'] for appearance in duplicate['appearances']})
+        identity = f"agent {duplicate['agent']}" if 'agent' in duplicate else "no agent code"
+        print(f"  {' / '.join(names)} ({identity}): {', '.join(found_in)}")
+    if len(duplicates) > 10:
+        print(f"  ... and {len(duplicates) - 10} more")
+    return True
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Extractor benchmarks for the AIA Lucky Draw System
+Times the simple_extract.py and extract_excel_data.py stages on synthetic
+campaign workbooks (see synthetic_workbook.py) and prints the results as JSON,
+so runs can be saved and compared across commits.
+
+Each case runs in its own Python process, so its peak RSS covers only that
+case: the workbook reads it needs as setup plus the timed stage.
+setup_peak_rss_bytes is the peak before the timed call started.
+
+Usage: python3 benchmark_extract.py [--sizes=1k,100k,1M] [--cases=name,...]
+                                    [--repeat=N] [--seed=N] [--output=results.json]
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from extract_cache import CACHE_DIR
+from extract_stats import peak_rss_bytes
+from simple_extract import split_cli_flags
+from synthetic_workbook import ELIGIBLE_HEADERS, GENERATION_HEADERS, generate_campaign_workbook
+
+BENCHMARK_FORMAT_VERSION = 1
+
+SIZES = {'1k': 1000, '100k': 100000, '1M': 1000000}
+
+# Generated workbooks are kept and reused across runs
+WORKBOOK_DIR = os.path.join(CACHE_DIR, 'benchmarks')
+
+CASES = (
+    'simple.process_generation_data',
+    'simple.process_generation_data[fast]',
+    'simple.process_eligible_agent_data',
+    'simple.process_eligible_agent_data[fast]',
+    'simple.generate_javascript_data',
+    'pandas.extract_excel_data',
+    'pandas.process_worker_data',
+    'pandas.process_agency_data',
+    'pandas.generate_javascript_data',
+)
+
+def benchmark_workbook(size, seed=0):
+    """Path and row counts of the synthetic workbook for a size, generating it on first use"""
+
+    os.makedirs(WORKBOOK_DIR, exist_ok=True)
+    excel_path = os.path.join(WORKBOOK_DIR, f"campaign-{size}-seed{seed}.xlsx")
+    info_path = f"{excel_path}.json"
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            return excel_path, json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    print(f"Generating {size} workbook: {excel_path}", file=sys.stderr)
+    ticket_rows, eligible_rows = generate_campaign_workbook(excel_path, SIZES[size], seed)
+    info = {'ticket_rows': ticket_rows, 'eligible_rows': eligible_rows}
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return excel_path, info
+
+def prepare_case(case, excel_path, info):
+    """Do a case's untimed setup; returns (timed callable, rows it processes)"""
+
+    agent_name_col, group_no_col, lay_see_amount_col = GENERATION_HEADERS
+    eligible_group_no_col, family_col, agent_col, eligible_agent_name_col, agency_code_col, district_col = ELIGIBLE_HEADERS
+    library, _, function = case.partition('.')
+
+    if library == 'simple':
+        import simple_extract
+
+        fast = function.endswith('[fast]')
+        generation = lambda: simple_extract.process_generation_data(
+            excel_path, agent_name_col, group_no_col, lay_see_amount_col, fast=fast)
+        eligible = lambda: simple_extract.process_eligible_agent_data(
+            excel_path, eligible_group_no_col, family_col, agent_col, eligible_agent_name_col,
+            agency_code_col, district_col, fast=fast)
+        if function.startswith('process_generation_data'):
+            return generation, info['ticket_rows']
+        if function.startswith('process_eligible_agent_data'):
+            return eligible, info['eligible_rows']
+        workers_data, group_families_data = generation(), eligible()
+        return (lambda: simple_extract.generate_javascript_data(workers_data, group_families_data),
+                sum(len(workers) for workers in workers_data.values()))
+
+    import extract_excel_data
+
+    if function == 'extract_excel_data':
+        return (lambda: extract_excel_data.extract_excel_data(excel_path),
+                info['ticket_rows'] + info['eligible_rows'])
+    excel_data = extract_excel_data.extract_excel_data(excel_path)
+    worker = lambda: extract_excel_data.process_worker_data(excel_data, agent_name_col, group_no_col, lay_see_amount_col)
+    agency = lambda: extract_excel_data.process_agency_data(
+        excel_data, eligible_group_no_col, family_col, eligible_agent_name_col, agency_code_col, district_col)
+    if function == 'process_worker_data':
+        return worker, info['ticket_rows']
+    if function == 'process_agency_data':
+        return agency, info['eligible_rows']
+    workers_data, group_families_data = worker(), agency()
+    return (lambda: extract_excel_data.generate_javascript_data(workers_data, group_families_data),
+            sum(len(workers) for workers in workers_data.values()))
+
+def run_case(case, excel_path, info):
+    """Time one case in this process; extractor output is discarded"""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        call, rows = prepare_case(case, excel_path, info)
+        setup_peak_rss = peak_rss_bytes()
+        start = time.perf_counter()
+        call()
+        seconds = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'setup_peak_rss_bytes': setup_peak_rss,
+    }
+
+def run_case_process(case, excel_path, info):
+    """Run one case in a fresh interpreter so memory use is not shared between cases"""
+
+    command = [sys.executable, os.path.abspath(__file__), f"--run-case={case}",
+               f"--workbook={excel_path}", f"--info={json.dumps(info)}"]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        error_lines = completed.stderr.strip().splitlines()
+        return {'error': error_lines[-1] if error_lines else f"exit code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def current_commit():
+    try:
+        completed = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+def run_benchmarks(sizes, cases, repeat=1, seed=0):
+    """Run every case on every size; keeps the fastest of `repeat` runs and the highest peak RSS"""
+
+    results = []
+    for size in sizes:
+        excel_path, info = benchmark_workbook(size, seed)
+        for case in cases:
+            runs = [run_case_process(case, excel_path, info) for _ in range(repeat)]
+            failed = [run for run in runs if 'error' in run]
+            if failed:
+                result = {'size': size, 'case': case, 'error': failed[0]['error']}
+            else:
+                result = {'size': size, 'case': case, **min(runs, key=lambda run: run['seconds'])}
+                peaks = [run['peak_rss_bytes'] for run in runs if run['peak_rss_bytes'] is not None]
+                result['peak_rss_bytes'] = max(peaks) if peaks else None
+            results.append(result)
+            print_result(result)
+    return {
+        'version': BENCHMARK_FORMAT_VERSION,
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+def print_result(result):
+    """One readable line per result on stderr; stdout is kept for the JSON report"""
+
+    label = f"{result['size']:>5} {result['case']:<42}"
+    if 'error' in result:
+        print(f"{label} ERROR {result['error']}", file=sys.stderr)
+        return
+    peak = f"{result['peak_rss_bytes'] / 1024 / 1024:8.1f} MB peak" if result['peak_rss_bytes'] is not None else "peak n/a"
+    print(f"{label} {result['seconds']:9.3f}s {result['rows_per_sec'] or 0:12,.0f} rows/s {peak}", file=sys.stderr)
+
+if __name__ == "__main__":
+    args, flags = split_cli_flags(sys.argv[1:])
+
+    if 'run-case' in flags:
+        # Child process for one case (see run_case_process)
+        print(json.dumps(run_case(flags['run-case'], flags['workbook'], json.loads(flags['info']))))
+        sys.exit(0)
+
+    sizes = flags['sizes'].split(',') if isinstance(flags.get('sizes'), str) else list(SIZES)
+    cases = flags['cases'].split(',') if isinstance(flags.get('cases'), str) else list(CASES)
+    unknown = [size for size in sizes if size not in SIZES] + [case for case in cases if case not in CASES]
+    if unknown:
+        print(f"Unknown sizes or cases: {', '.join(unknown)}")
+        print(f"Sizes: {', '.join(SIZES)}")
+        print(f"Cases: {', '.join(CASES)}")
+        sys.exit(1)
+
+    report = run_benchmarks(sizes, cases, repeat=int(flags.get('repeat', 1)), seed=int(flags.get('seed', 0)))
+    report_text = json.dumps(report, indent=2)
+    if isinstance(flags.get('output'), str):
+        with open(flags['output'], 'w', encoding='utf-8') as f:
+            f.write(report_text + '\n')
+        print(f"Results saved to: {flags['output']}", file=sys.stderr)
+    else:
+        print(report_text)
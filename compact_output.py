@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Compact output format for the AIA Lucky Draw System
+Encodes the generated group data with a shared string dictionary and columnar
+record tables, serialized without indentation, plus precompressed .gz/.br
+siblings. js/compact-data.js holds the matching browser decoder.
+
+Layout (version 1):
+
+    {
+      "format": "aia-lucky-draw-compact",
+      "version": 1,
+      "strings": ["group-1", "PORTFOLIO MANAGEMENT", "$50", ...],
+      "groupIds": ["group-1", ...],     # keys of the output mapping, in order
+      "groups": <table>                 # one record per group
+    }
+
+A table is {"length": n, "columns": [[field, kind, values], ...]} where
+values holds one entry per record and kind is:
+
+    "s"  string; values are stored as-is (columns of mostly distinct strings)
+    "d"  string; values are indexes into "strings" (columns with repeated strings)
+    "n"  number; values are stored as-is
+    "m"  {string: number} map; each value is a flat [key index, number, ...] list
+    "t"  nested table (a group's "workers"); each value is a table
+    "j"  anything else; values are stored as plain JSON
+
+Decoding every table back into records, in column order, reproduces the
+original mapping exactly, field order included.
+"""
+
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPACT_FORMAT = 'aia-lucky-draw-compact'
+COMPACT_FORMAT_VERSION = 1
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _column_kind(values):
+    if all(isinstance(value, str) for value in values):
+        return 's'
+    if all(_is_number(value) for value in values):
+        return 'n'
+    if all(isinstance(value, list) and all(isinstance(item, dict) for item in value) for value in values):
+        return 't'
+    if all(isinstance(value, dict) and all(isinstance(key, str) and _is_number(item) for key, item in value.items())
+           for value in values):
+        return 'm'
+    return 'j'
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+def _encode_table(records, strings):
+    """Encode a list of same-shaped dicts as a columnar table"""
+
+    fields = list(records[0]) if records else []
+    for record in records:
+        if list(record) != fields:
+            raise ValueError(f"Records must share the same fields in the same order: {fields} vs {list(record)}")
+
+    columns = []
+    for field in fields:
+        values = [record[field] for record in records]
+        kind = _column_kind(values)
+        if kind == 's' and len(set(values)) * 2 <= len(values):
+            # Repeated strings go through the shared dictionary; mostly-unique
+            # ones (names, IDs) compress better inline than as indexes
+            kind = 'd'
+            values = [strings.intern(value) for value in values]
+        elif kind == 'm':
+            values = [[item for key, count in value.items() for item in (strings.intern(key), count)] for value in values]
+        elif kind == 't':
+            values = [_encode_table(value, strings) for value in values]
+        columns.append([field, kind, values])
+    return {'length': len(records), 'columns': columns}
+
+def _decode_table(table, strings):
+    records = [{} for _ in range(table['length'])]
+    for field, kind, values in table['columns']:
+        for record, value in zip(records, values):
+            if kind == 'd':
+                value = strings[value]
+            elif kind == 'm':
+                value = {strings[value[i]]: value[i + 1] for i in range(0, len(value), 2)}
+            elif kind == 't':
+                value = _decode_table(value, strings)
+            record[field] = value
+    return records
+
+def encode_compact_data(js_groups):
+    """Encode the generate_javascript_data mapping in the compact format"""
+
+    strings = _StringTable()
+    groups = _encode_table(list(js_groups.values()), strings)
+    return {
+        'format': COMPACT_FORMAT,
+        'version': COMPACT_FORMAT_VERSION,
+        'strings': strings.strings,
+        'groupIds': list(js_groups),
+        'groups': groups,
+    }
+
+def decode_compact_data(payload):
+    """Inverse of encode_compact_data"""
+
+    if payload.get('format') != COMPACT_FORMAT or payload.get('version') != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact data: {payload.get('format')} v{payload.get('version')}")
+    strings = payload['strings']
+    groups = _decode_table(payload['groups'], strings)
+    return dict(zip(payload['groupIds'], groups))
+
+def dumps_compact(js_groups):
+    """Compact format as minified JSON text"""
+
+    return json.dumps(encode_compact_data(js_groups), ensure_ascii=False, separators=(',', ':'))
+
+def precompressed_variants(data):
+    """Gzip and (if the brotli package is installed) Brotli encodings of data, by file suffix"""
+
+    # mtime=0 keeps the .gz bytes stable, so unchanged data is not rewritten
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return variants
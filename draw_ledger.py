@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Draw ledger for the AIA Lucky Draw System
+Records every draw in one place, so a player can only be drawn once across
+all kiosks. serve.py --ledger serves it under /api/draws, and the drawing
+page claims a player there before the draw starts (see sales-lottery.js).
+
+The ledger is an append-only log (.ledger/draws.log by default; serve.py
+never serves dot directories as files), one JSON record per line:
+
+    {"seq": 1, "key": "group-3/EMP003012", "groupId": "group-3",
+     "employeeId": "EMP003012", "name": "...", "kiosk": "kiosk-4f2a", "tickets": 3,
+     "prizes": {"$50 Cash Prize": 2, "$100 Cash Prize": 1}, "time": "2026-10-18T09:30:00Z"}
+
+A draw is acknowledged only once its line is on disk (fsync). Concurrent
+submissions share fsyncs: a single writer thread appends everything that
+arrived while the previous fsync ran in one write and one fsync (group
+commit), so throughput grows with the number of kiosks instead of being
+capped at one fsync per draw.
+
+Which players were drawn is kept in memory, keyed by group and employee
+ID, so a duplicate is refused without touching the disk. On start the
+index is rebuilt by reading the log once. A last line cut short by a crash
+was never acknowledged and is truncated away; damage anywhere else stops
+the ledger from opening rather than forgetting draws.
+
+Usage: python3 draw_ledger.py [log path]    (prints a summary of the log)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+DEFAULT_LEDGER_PATH = os.path.join('.ledger', 'draws.log')
+
+class LedgerError(Exception):
+    """Raised when the ledger log cannot be read or written"""
+
+def draw_key(group_id, employee_id):
+    """What a draw is unique on; group and employee IDs are kept stable by employee_ids.py"""
+
+    return f"{group_id}/{employee_id}"
+
+def _validate_draw(draw):
+    """The ledger fields of a submitted draw; raises ValueError for a draw that cannot be recorded"""
+
+    if not isinstance(draw, dict):
+        raise ValueError("A draw must be a JSON object")
+    for field in ('groupId', 'employeeId'):
+        if not isinstance(draw.get(field), str) or not draw[field]:
+            raise ValueError(f"A draw needs {field}")
+    prizes = draw.get('prizes', {})
+    if not isinstance(prizes, dict) or not all(
+            isinstance(count, int) and not isinstance(count, bool) for count in prizes.values()):
+        raise ValueError("prizes must map prize names to counts")
+    tickets = draw.get('tickets', sum(prizes.values()))
+    if not isinstance(tickets, int) or isinstance(tickets, bool):
+        raise ValueError("tickets must be a whole number")
+    return {
+        'groupId': draw['groupId'],
+        'employeeId': draw['employeeId'],
+        'name': str(draw.get('name', '')),
+        'kiosk': str(draw.get('kiosk', '')),
+        'tickets': tickets,
+        'prizes': prizes,
+    }
+
+class _PendingCommit:
+    """Draws waiting for the writer thread, and the outcome their submitters wait for"""
+
+    __slots__ = ('records', 'done', 'error')
+
+    def __init__(self):
+        self.records = []
+        self.done = threading.Event()
+        self.error = None
+
+class DrawLedger:
+    """Append-only draw log with an in-memory index of drawn players"""
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = os.path.abspath(path)
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.drawn = {}
+        self.records = []
+        self.pending = _PendingCommit()
+        self.closed = False
+        self.error = None
+        self.commits = 0
+
+        directory = os.path.dirname(self.path)
+        created = not os.path.exists(self.path)
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        self.file = open(self.path, 'ab')
+        if created:
+            # Make the new file's directory entry durable as well
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._fsync_directory(directory)
+        self.writer = threading.Thread(target=self._write_commits, name='draw-ledger-writer', daemon=True)
+        self.writer.start()
+
+    @staticmethod
+    def _fsync_directory(directory):
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return  # Not supported on Windows
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _load(self):
+        """Rebuild the index from the log, truncating a torn last line"""
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            raise LedgerError(f"Cannot read draw ledger {self.path}: {e}")
+
+        valid_length = 0
+        line_number = 0
+        for line in data.splitlines(keepends=True):
+            line_number += 1
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError("line is not terminated")
+                record = json.loads(line)
+                key = record['key']
+            except (ValueError, KeyError, TypeError) as e:
+                if valid_length + len(line) == len(data):
+                    break
+                raise LedgerError(f"Draw ledger {self.path} is damaged at line {line_number}: {e}")
+            valid_length += len(line)
+            self.records.append(record)
+            self.drawn[key] = record
+
+        if valid_length < len(data):
+            print(f"Draw ledger {self.path}: discarding an incomplete last record ({len(data) - valid_length} bytes)")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_length)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _write_commits(self):
+        """Writer thread: append and fsync whatever has been submitted, one batch at a time"""
+
+        while True:
+            with self.lock:
+                while not self.pending.records and not self.closed:
+                    self.wake.wait()
+                if not self.pending.records:
+                    return
+                commit = self.pending
+                self.pending = _PendingCommit()
+
+            if self.error is None:
+                data = b''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+                                for record in commit.records)
+                try:
+                    self.file.write(data)
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                except OSError as e:
+                    # After a failed write the end of the log is unknown, so nothing more is appended
+                    self.error = LedgerError(f"Cannot write draw ledger {self.path}: {e}")
+            with self.lock:
+                if self.error is None:
+                    self.records.extend(commit.records)
+                    self.commits += 1
+                else:
+                    commit.error = self.error
+                    self.closed = True
+                    for record in commit.records:
+                        del self.drawn[record['key']]
+            commit.done.set()
+
+    def record_draw(self, draw):
+        """Record a draw once it is on disk; returns (True, record), or (False, existing record) if already drawn
+
+        Raises ValueError for an invalid draw and LedgerError if it could
+        not be written.
+        """
+
+        fields = _validate_draw(draw)
+        key = draw_key(fields['groupId'], fields['employeeId'])
+        with self.lock:
+            if self.closed:
+                raise self.error or LedgerError(f"Draw ledger {self.path} is closed")
+            existing = self.drawn.get(key)
+            if existing is not None:
+                return False, existing
+            record = {'seq': len(self.drawn) + 1, 'key': key, **fields,
+                      'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+            # Claimed at once, so a concurrent submission for the same player is refused
+            # even before this one is on disk
+            self.drawn[key] = record
+            commit = self.pending
+            commit.records.append(record)
+            self.wake.notify()
+
+        commit.done.wait()
+        if commit.error is not None:
+            raise commit.error
+        return True, record
+
+    def lookup(self, group_id, employee_id):
+        """The draw recorded for a player, or None"""
+
+        with self.lock:
+            record = self.drawn.get(draw_key(group_id, employee_id))
+        # A claimed draw only counts once it is durable
+        if record is not None and record['seq'] > len(self.records):
+            return None
+        return record
+
+    def records_since(self, seq=0):
+        """Durable draws after sequence number seq, in order"""
+
+        with self.lock:
+            return self.records[seq:]
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.wake.notify()
+        self.writer.join()
+        self.file.close()
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LEDGER_PATH
+    if not os.path.exists(path):
+        print(f"Draw ledger not found: {path}")
+        sys.exit(1)
+    started = time.perf_counter()
+    try:
+        ledger = DrawLedger(path)
+    except LedgerError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    records = ledger.records_since()
+    ledger.close()
+    print(f"{len(records)} draws in {path} (index rebuilt in {elapsed:.3f}s)")
+    kiosks = {}
+    for record in records:
+        kiosks[record['kiosk'] or '(unknown)'] = kiosks.get(record['kiosk'] or '(unknown)', 0) + 1
+    for kiosk, count in sorted(kiosks.items()):
+        print(f"  {kiosk}: {count}")
+    if records:
+        print(f"Last draw: {records[-1]['name'] or records[-1]['employeeId']} ({records[-1]['key']}) at {records[-1]['time']}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Stable group and employee IDs for the AIA Lucky Draw System
+Group IDs (group-N) and employee IDs (EMP<group><employee>) used to be
+numbered in workbook row order, so inserting a row or a group renumbered
+everything after it. The registry remembers the number given to each group
+(by group number) and to each worker (by name within the group) and only
+numbers groups and workers it has not seen before, continuing after the
+highest number already used. Numbers are never reused, so a worker removed
+from the workbook keeps its ID if they come back.
+
+A fresh registry numbers groups and workers exactly as the old row-order
+scheme did, so the first run produces the same IDs as before. The registry is
+saved next to the group shards as data/employee-ids.json:
+
+    {
+      "version": 1,
+      "groups": {"G001": {"number": 1, "workers": {"Chan Tai Man": 1, ...}}, ...}
+    }
+"""
+
+import hashlib
+import json
+
+EMPLOYEE_IDS_VERSION = 1
+EMPLOYEE_IDS_FILE = 'employee-ids.json'
+
+class EmployeeIdRegistry:
+    """Group and worker numbers handed out so far, keyed by group number and worker name"""
+
+    def __init__(self, groups=None):
+        self.groups = {} if groups is None else groups
+        self.next_group_number = max((entry['number'] for entry in self.groups.values()), default=0) + 1
+        self.next_worker_numbers = {}
+        self.changed = False
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved registry, or start an empty one if there is none (or it is unreadable)"""
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except OSError:
+            return cls()
+        except ValueError as e:
+            print(f"Ignoring unreadable employee ID registry {path} ({e})")
+            return cls()
+        if data.get('version') != EMPLOYEE_IDS_VERSION:
+            print(f"Ignoring employee ID registry {path} with unknown version {data.get('version')!r}")
+            return cls()
+        return cls(data['groups'])
+
+    def _group_entry(self, group_no):
+        entry = self.groups.get(group_no)
+        if entry is None:
+            entry = self.groups[group_no] = {'number': self.next_group_number, 'workers': {}}
+            self.next_group_number += 1
+            self.changed = True
+        return entry
+
+    def group_id(self, group_no):
+        return f"group-{self._group_entry(group_no)['number']}"
+
+    def employee_id(self, group_no, name):
+        entry = self._group_entry(group_no)
+        workers = entry['workers']
+        number = workers.get(name)
+        if number is None:
+            number = self.next_worker_numbers.get(group_no)
+            if number is None:
+                number = max(workers.values(), default=0) + 1
+            workers[name] = number
+            self.next_worker_numbers[group_no] = number + 1
+            self.changed = True
+        return f"EMP{entry['number']:03d}{number:03d}"
+
+    def dumps(self):
+        # One group per line keeps the file readable without indenting every worker
+        lines = [f"{json.dumps(group_no, ensure_ascii=False)}: {json.dumps(entry, ensure_ascii=False)}"
+                 for group_no, entry in self.groups.items()]
+        body = ',\n    '.join(lines)
+        groups_text = f"{{\n    {body}\n  }}" if lines else '{}'
+        return f'{{\n  "version": {EMPLOYEE_IDS_VERSION},\n  "groups": {groups_text}\n}}\n'
+
+    def content_hash(self):
+        """SHA-256 of the saved form; part of the extraction cache key, since cached output embeds the IDs"""
+
+        return hashlib.sha256(self.dumps().encode('utf-8')).hexdigest()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Extraction cache for the AIA Lucky Draw System
+Stores generated output keyed on the workbook's content hash, the chosen sheet
+and the column mapping, so re-running the extractor on an unchanged workbook
+skips the Excel parse entirely
+"""
+
+import hashlib
+import json
+import os
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.extract_cache')
+
+# Bump when the generated output changes shape so old entries are never reused
+CACHE_FORMAT_VERSION = 3
+
+# Storage bounds; the least recently used entries are evicted first
+MAX_CACHE_ENTRIES = 32
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in chunks"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extraction_cache_key(content_hash, sheet_name, column_names, employee_ids_hash=None, allocation=None):
+    """Cache key for one workbook version, sheet choice and column mapping
+
+    employee_ids_hash identifies the employee ID registry the output was
+    numbered with (see employee_ids.py), allocation the prize quotas and
+    seed the prizes were dealt with, if they were (see prize_allocation.py).
+    """
+
+    key_data = {
+        'version': CACHE_FORMAT_VERSION,
+        'workbook': content_hash,
+        'sheet': sheet_name,
+        'columns': list(column_names),
+        'employeeIds': employee_ids_hash,
+    }
+    if allocation is not None:
+        key_data['allocation'] = allocation
+    return hashlib.sha256(json.dumps(key_data, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json")
+
+def cache_entry_path(key, cache_dir=CACHE_DIR):
+    """Path to write a key's output text to
+
+    Entries are streamed into place by publish_extraction: its
+    JsonObjectStreamWriter (json_stream.py) writes a temp file beside this
+    path and renames it over the path, so a reader never sees a partial
+    entry. The caller then calls evict_cache_entries to keep the cache
+    within its bounds.
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    return _entry_path(key, cache_dir)
+
+def load_cached_output(key, cache_dir=CACHE_DIR):
+    """Return the cached output text for a key, or None on a miss"""
+
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return None
+
+    # Mark as recently used for eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return text
+
+def evict_cache_entries(cache_dir=CACHE_DIR, max_entries=MAX_CACHE_ENTRIES, max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits its bounds"""
+
+    entries = []
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    # Newest first; keep entries while both bounds hold
+    entries.sort(reverse=True)
+    total_bytes = 0
+    for position, (mtime, size, path) in enumerate(entries):
+        total_bytes += size
+        if position >= max_entries or total_bytes > max_bytes:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -2,23 +2,33 @@
 """
 Excel Data Extractor for AIA Lucky Draw System
 Extracts worker data from the Excel file and generates JavaScript data structure
+pandas is imported when a workbook is first read, so the column listing
+(run without arguments) starts at once.
 """
 
-import pandas as pd
 import json
 import sys
 import os
 
+from employee_ids import EMPLOYEE_IDS_FILE, EmployeeIdRegistry
+from extract_records import AgentRecord, GroupRecord, WorkerRecord, intern
+
 def extract_excel_data(excel_path):
     """Extract data from the Excel file and return structured data"""
     
+    import pandas as pd
+    
     print(f"Reading Excel file: {excel_path}")
     
     try:
-        # Read the Excel file with multiple sheets
-        excel_data = pd.read_excel(excel_path, sheet_name=None, engine='openpyxl')
+        # Only the Generation and Eligible Agent sheets are used; skip loading the rest
+        excel_file = pd.ExcelFile(excel_path, engine='openpyxl')
+        print(f"Available sheets: {excel_file.sheet_names}")
         
-        print(f"Available sheets: {list(excel_data.keys())}")
+        wanted_sheets = [sheet for sheet in excel_file.sheet_names
+                         if sheet == 'Generation' or ('eligible' in sheet.lower() and 'agent' in sheet.lower())]
+        excel_data = excel_file.parse(sheet_name=wanted_sheets)
+        excel_file.close()
         
         # Initialize data structures
         workers_data = {}
@@ -52,94 +62,113 @@ def extract_excel_data(excel_path):
         print(f"Error reading Excel file: {e}")
         return None
 
+def _clean_text(series):
+    """Vectorized str(value).strip(), with '' for missing values"""
+    
+    return series.astype(str).str.strip().where(series.notna(), '')
+
+def _prize_keys(prize_amounts):
+    """Vectorized prize key ("$50", "$12.50") for positive prize amounts, as simple_extract.py formats them"""
+    
+    is_whole = prize_amounts == prize_amounts.round()
+    whole_keys = '$' + prize_amounts.where(is_whole, 0).astype('int64').astype(str)
+    cent_keys = '$' + prize_amounts.map('{:.2f}'.format)
+    return whole_keys.where(is_whole, cent_keys)
+
 def process_worker_data(excel_data, agent_name_col, group_no_col, lay_see_amount_col):
     """Process worker data based on specified columns from Generation sheet"""
     
-    generation_sheet = excel_data['Generation']
+    import pandas as pd
     
-    workers = {}
+    generation_sheet = excel_data['Generation']
     
-    # Process each row in the generation sheet
     # Multiple rows for one person means multiple tickets/prizes
-    for index, row in generation_sheet.iterrows():
-        if pd.isna(row[agent_name_col]) or pd.isna(row[group_no_col]):
-            continue
-            
-        agent_name = str(row[agent_name_col]).strip()
-        group_no = str(row[group_no_col]).strip()
-        lay_see_amount = str(row[lay_see_amount_col]).strip() if not pd.isna(row[lay_see_amount_col]) else None
-        
-        # Create group if not exists
-        if group_no not in workers:
-            workers[group_no] = {}
-        
-        # Create worker if not exists
-        if agent_name not in workers[group_no]:
-            workers[group_no][agent_name] = {
-                'name': agent_name,
-                'group_no': group_no,
-                'lay_see_amounts': [],
-                'tickets': 0
-            }
-        
-        # Add lay see amount if exists (each row = 1 ticket)
-        if lay_see_amount and lay_see_amount != 'nan':
-            workers[group_no][agent_name]['lay_see_amounts'].append(lay_see_amount)
-        
-        # Each row represents one ticket for this person
-        workers[group_no][agent_name]['tickets'] += 1
+    tickets = generation_sheet[[agent_name_col, group_no_col, lay_see_amount_col]]
+    tickets = tickets[tickets[agent_name_col].notna() & tickets[group_no_col].notna()]
+    
+    keys = pd.DataFrame({
+        'group_no': tickets[group_no_col].astype(str).str.strip(),
+        'agent_name': tickets[agent_name_col].astype(str).str.strip(),
+    })
+    lay_see_amounts = _clean_text(tickets[lay_see_amount_col])
+    
+    # Each row represents one ticket for this person; groupby keeps first-appearance order
+    ticket_counts = keys.groupby(['group_no', 'agent_name'], sort=False).size()
+    
+    has_amount = (lay_see_amounts != '') & (lay_see_amounts != 'nan')
+    amount_lists = lay_see_amounts[has_amount].groupby([keys['group_no'][has_amount], keys['agent_name'][has_amount]], sort=False).agg(list)
+    
+    # Prize histogram and totals over positive numeric amounts
+    prize_amounts = pd.to_numeric(lay_see_amounts.where(has_amount), errors='coerce')
+    is_prize = prize_amounts > 0
+    prizes = keys[is_prize].assign(prize=prize_amounts[is_prize], prize_key=_prize_keys(prize_amounts[is_prize]))
+    prize_totals = prizes.groupby(['group_no', 'agent_name'], sort=False)['prize'].sum()
+    prize_histogram = prizes.groupby(['group_no', 'agent_name', 'prize_key'], sort=False).size()
+    
+    workers = {}
+    for (group_no, agent_name), ticket_count in ticket_counts.items():
+        group_no = intern(group_no)
+        workers.setdefault(group_no, {})[agent_name] = WorkerRecord(
+            agent_name,
+            group_no,
+            tickets=int(ticket_count),
+            total_prize_amount=float(prize_totals[(group_no, agent_name)]) if (group_no, agent_name) in prize_totals.index else 0,
+            lay_see_amounts=amount_lists.get((group_no, agent_name), [])
+        )
+    for (group_no, agent_name, prize_key), prize_count in prize_histogram.items():
+        workers[group_no][agent_name].prize_counts[intern(prize_key)] = int(prize_count)
     
     return workers
 
 def process_agency_data(excel_data, group_no_col, family_col, agent_name_col, agency_code_col, district_col):
     """Process agency data based on specified columns from Eligible Agent sheet"""
     
+    import pandas as pd
+    
     # Find eligible agent sheet
     eligible_sheets = [sheet for sheet in excel_data.keys() if 'eligible' in sheet.lower() and 'agent' in sheet.lower()]
     if not eligible_sheets:
         return {}
     
     eligible_sheet = excel_data[eligible_sheets[0]]
+    eligible_sheet = eligible_sheet[eligible_sheet[group_no_col].notna()]
+    
+    agents = pd.DataFrame({
+        'group_no': eligible_sheet[group_no_col].astype(str).str.strip(),
+        'family': _clean_text(eligible_sheet[family_col]),
+        'agent_name': _clean_text(eligible_sheet[agent_name_col]),
+        'agency_code': _clean_text(eligible_sheet[agency_code_col]),
+        'district': _clean_text(eligible_sheet[district_col]),
+    })
     
-    agencies = {}
+    # The first row of each group sets its family and district
     group_families = {}
+    for group_no, family, district in agents.drop_duplicates('group_no')[['group_no', 'family', 'district']].itertuples(index=False):
+        group_families[intern(group_no)] = GroupRecord(intern(family), intern(district))
     
-    # Process each row in the eligible agent sheet
-    for index, row in eligible_sheet.iterrows():
-        if pd.isna(row[group_no_col]):
-            continue
-            
-        group_no = str(row[group_no_col]).strip()
-        family = str(row[family_col]).strip() if not pd.isna(row[family_col]) else ''
-        agent_name = str(row[agent_name_col]).strip() if not pd.isna(row[agent_name_col]) else ''
-        agency_code = str(row[agency_code_col]).strip() if not pd.isna(row[agency_code_col]) else ''
-        district = str(row[district_col]).strip() if not pd.isna(row[district_col]) else ''
-        
-        # Store group to family mapping
-        if group_no not in group_families:
-            group_families[group_no] = {
-                'family': family,
-                'district': district,
-                'agents': []
-            }
-        
-        # Add agent info
-        if agent_name:
-            group_families[group_no]['agents'].append({
-                'agent_name': agent_name,
-                'agency_code': agency_code
-            })
+    # Add agent info; this sheet mapping has no agent code column
+    named_agents = agents[agents['agent_name'] != '']
+    for group_no, group_agents in named_agents.groupby('group_no', sort=False):
+        group_families[group_no].agents = [
+            AgentRecord("", agent_name, intern(agency_code), intern(district))
+            for agent_name, agency_code, district in group_agents[['agent_name', 'agency_code', 'district']].itertuples(index=False)
+        ]
     
     return group_families
 
-def generate_javascript_data(workers_data, group_families_data):
-    """Generate JavaScript data structure for the player selection system"""
+def generate_javascript_data(workers_data, group_families_data, employee_ids=None):
+    """Generate JavaScript data structure for the player selection system
     
+    Group and employee IDs come from employee_ids (an EmployeeIdRegistry,
+    see employee_ids.py); a fresh registry numbers them in workbook order.
+    """
+    
+    if employee_ids is None:
+        employee_ids = EmployeeIdRegistry()
     js_groups = {}
-    group_counter = 1
     
     for group_no, workers in workers_data.items():
-        group_id = f"group-{group_counter}"
+        group_id = employee_ids.group_id(group_no)
         
         # Get family and district info from group_families_data
         family_name = group_no  # Default to group number
@@ -147,24 +176,24 @@ def generate_javascript_data(workers_data, group_families_data):
         
         if group_no in group_families_data:
             family_info = group_families_data[group_no]
-            family_name = family_info['family'] if family_info['family'] else group_no
-            district_name = family_info['district']
+            family_name = family_info.family if family_info.family else group_no
+            district_name = family_info.district
         
         # Convert workers to the required format
         js_workers = []
-        emp_counter = 1
         
         for agent_name, worker_info in workers.items():
-            employee_id = f"EMP{group_counter:03d}{emp_counter:03d}"
+            employee_id = employee_ids.employee_id(group_no, agent_name)
             
             js_workers.append({
                 'name': agent_name,
-                'tickets': worker_info['tickets'],
+                'tickets': worker_info.tickets,
                 'employeeId': employee_id,
                 'groupNo': group_no,
-                'laySeAmounts': worker_info['lay_see_amounts']
+                'laySeAmounts': worker_info.lay_see_amounts,
+                'prizeCounts': worker_info.prize_counts,
+                'totalPrizeAmount': worker_info.total_prize_amount
             })
-            emp_counter += 1
         
         # Create group data
         js_groups[group_id] = {
@@ -176,8 +205,6 @@ def generate_javascript_data(workers_data, group_families_data):
             'description': f"{district_name} District" if district_name else f"Group {group_no}",
             'workers': js_workers
         }
-        
-        group_counter += 1
     
     return js_groups
 
@@ -188,10 +215,11 @@ def main():
         print(f"Excel file not found: {excel_path}")
         return
     
-    # Extract and show data structure first
-    excel_data = extract_excel_data(excel_path)
+    # Show the sheets, headers and first rows; only what that needs is read
+    from simple_extract import inspect_workbook
+    sheet_names = inspect_workbook(excel_path)
     
-    if excel_data is None:
+    if sheet_names is None:
         print("Failed to read Excel file")
         return
     
@@ -233,7 +261,17 @@ if __name__ == "__main__":
         if excel_data:
             workers_data = process_worker_data(excel_data, agent_name_col, group_no_col, lay_see_amount_col)
             group_families_data = process_agency_data(excel_data, eligible_group_no_col, family_col, eligible_agent_name_col, agency_code_col, district_col)
-            js_data = generate_javascript_data(workers_data, group_families_data)
+            output_path = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/extracted_data.json"
+            
+            # Keep group and employee IDs the same as previous runs
+            data_dir = os.path.join(os.path.dirname(output_path), 'data')
+            employee_ids_path = os.path.join(data_dir, EMPLOYEE_IDS_FILE)
+            employee_ids = EmployeeIdRegistry.load(employee_ids_path)
+            js_data = generate_javascript_data(workers_data, group_families_data, employee_ids)
+            if employee_ids.changed:
+                os.makedirs(data_dir, exist_ok=True)
+                with open(employee_ids_path, 'w', encoding='utf-8') as f:
+                    f.write(employee_ids.dumps())
             
             # Output the JavaScript data
             print("\n" + "="*50)
@@ -242,9 +280,18 @@ if __name__ == "__main__":
             print(json.dumps(js_data, indent=2, ensure_ascii=False))
             
             # Save to file
-            output_path = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/extracted_data.json"
             with open(output_path, 'w', encoding='utf-8') as f:
                 json.dump(js_data, f, indent=2, ensure_ascii=False)
             print(f"\nData saved to: {output_path}")
+            
+            # A compact copy from an earlier simple_extract.py --compact run would hide this data
+            from simple_extract import remove_compact_output
+            if remove_compact_output(os.path.join(os.path.dirname(output_path), 'extracted_data.compact.json')):
+                print("Removed compact data of an earlier run (rerun simple_extract.py --compact to rebuild it)")
+            # As would a database from an earlier simple_extract.py --sqlite run, served by serve.py --db
+            from player_db import DEFAULT_DB_FILE
+            from simple_extract import remove_player_database
+            if remove_player_database(os.path.join(os.path.dirname(output_path), DEFAULT_DB_FILE)):
+                print("Removed database of an earlier run (rerun simple_extract.py --sqlite to rebuild it)")
     else:
         main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Record types for the AIA Lucky Draw System extractors
+Workers, eligible agents and groups are held as __slots__ objects rather
+than dicts while a workbook is aggregated: a slotted record has no per-object
+dict, so hundreds of thousands of them take a fraction of the memory.
+Strings repeated across many rows (group numbers, districts, agency codes,
+prize keys) are interned, so each distinct value is stored once.
+"""
+
+import sys
+
+intern = sys.intern
+
+class WorkerRecord:
+    """One worker's tickets and prizes from the Generation sheet
+
+    lay_see_amounts is only collected by extract_excel_data.py.
+    """
+
+    __slots__ = ('name', 'group_no', 'tickets', 'prize_counts', 'total_prize_amount', 'lay_see_amounts')
+
+    def __init__(self, name, group_no, tickets=0, prize_counts=None, total_prize_amount=0, lay_see_amounts=None):
+        self.name = name
+        self.group_no = group_no
+        self.tickets = tickets
+        self.prize_counts = {} if prize_counts is None else prize_counts
+        self.total_prize_amount = total_prize_amount
+        self.lay_see_amounts = lay_see_amounts
+
+    def __repr__(self):
+        return f"WorkerRecord({self.name!r}, {self.group_no!r}, tickets={self.tickets})"
+
+class SheetTotals:
+    """Totals of the Generation sheet as read, for reconciling the per-worker totals against
+
+    Counted over every non-empty row, including rows skipped for lacking an
+    agent name or group number. groups maps group number to [tickets,
+    prize amount].
+    """
+
+    __slots__ = ('rows', 'rows_skipped', 'prize_amount', 'prize_amount_skipped', 'groups')
+
+    def __init__(self):
+        self.rows = 0
+        self.rows_skipped = 0
+        self.prize_amount = 0
+        self.prize_amount_skipped = 0
+        self.groups = {}
+
+    def __repr__(self):
+        return f"SheetTotals(rows={self.rows}, prize_amount={self.prize_amount})"
+
+class WorkersByGroup(dict):
+    """Workers of the Generation sheet by group number, then agent name
+
+    A plain dict of dicts of WorkerRecords, which also carries the sheet's
+    SheetTotals (None when they were not collected).
+    """
+
+    __slots__ = ('sheet_totals',)
+
+    def __init__(self, *args, sheet_totals=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sheet_totals = sheet_totals
+
+class AgentRecord:
+    """One row of the Eligible Agent sheet"""
+
+    __slots__ = ('agent', 'agent_name', 'agency_code', 'district')
+
+    def __init__(self, agent, agent_name, agency_code, district):
+        self.agent = agent
+        self.agent_name = agent_name
+        self.agency_code = agency_code
+        self.district = district
+
+    def __repr__(self):
+        return f"AgentRecord({self.agent!r}, {self.agent_name!r}, {self.agency_code!r}, {self.district!r})"
+
+# Stands in for an agent missing from the Eligible Agent sheet
+NO_AGENT = AgentRecord("", "", "", "")
+
+class GroupRecord:
+    """A group's family, district and eligible agents"""
+
+    __slots__ = ('family', 'district', 'agents')
+
+    def __init__(self, family, district, agents=None):
+        self.family = family
+        self.district = district
+        self.agents = [] if agents is None else agents
+
+    def __repr__(self):
+        return f"GroupRecord({self.family!r}, {self.district!r}, {len(self.agents)} agents)"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Extraction statistics for the AIA Lucky Draw System
+Collects per-stage wall times, sheet row counts and output sizes for
+`simple_extract.py --stats`. Functions take a stats object defaulting to
+NO_STATS, whose methods do nothing, so runs without --stats pay only a
+no-op call per stage.
+"""
+
+import contextlib
+import sys
+import time
+
+STATS_FORMAT_VERSION = 1
+
+def peak_rss_bytes(children=False):
+    """Peak resident set size so far, of this process or (children) its largest child
+
+    None where the resource module is missing (Windows).
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class ExtractionStats:
+    """Stage timings and counters for one extraction run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.sheets = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one stage; stages may nest"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({'stage': name, 'seconds': time.perf_counter() - start})
+
+    def record_sheet(self, label, row_counts):
+        """Record rows scanned and skipped while aggregating one sheet"""
+
+        if row_counts:
+            self.sheets[label] = dict(row_counts)
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def report(self):
+        """The collected statistics as a JSON-serializable dict"""
+
+        return {
+            'version': STATS_FORMAT_VERSION,
+            'total_seconds': time.perf_counter() - self.started,
+            'stages': self.stages,
+            'sheets': self.sheets,
+            **self.counters,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'peak_child_rss_bytes': peak_rss_bytes(children=True),
+        }
+
+class _NoStats:
+    """Stand-in used when statistics are off; records nothing"""
+
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def record_sheet(self, label, row_counts):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def set(self, name, value):
+        pass
+
+NO_STATS = _NoStats()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Summary aggregates for the AIA Lucky Draw System
+Totals per group, district and campaign, with prize histograms, collected
+while the groups are written (data/summary.json), so dashboards read them
+instead of adding up every worker:
+
+    {
+      "version": 1,
+      "workbook": "<sha256 of the workbook>",
+      "totals": {"groups": 38, "workers": 891, "tickets": 1148,
+                 "prizeAmount": 131650.0, "prizes": {"$20": 66, "$50": 745, ...}},
+      "groups": {"group-1": {"name": ..., "groupNo": "1", "district": ...,
+                             "workers": ..., "tickets": ..., "prizeAmount": ..., "prizes": {...}}},
+      "districts": {"MACAU": {"workers": ..., "tickets": ..., "prizeAmount": ..., "prizes": {...}}},
+      "campaigns": {...},        # only when several workbooks are merged
+      "reconciliation": {...}
+    }
+
+A worker counts towards their own district, or the group's if they have
+none. Prize histograms count tickets per prize, in order of amount.
+
+The reconciliation compares the workers' totals with the Generation sheet's
+own totals (extract_records.SheetTotals, counted while the sheet was read).
+It also checks each worker's prizeCounts against their totalPrizeAmount.
+Its status is "ok", "mismatch" or "not checked"; the last is used when the
+output came from the extraction cache and no earlier check of the same
+workbook is available. Rows skipped for lacking an agent name or group
+number, but holding a ticket or amount, show up as a mismatch with their
+counts under "sheet".
+"""
+
+import json
+
+SUMMARY_FORMAT_VERSION = 1
+SUMMARY_FILE = 'summary.json'
+
+# Amounts are sums of floats; differences below a cent are rounding
+AMOUNT_TOLERANCE = 0.005
+
+# Mismatches listed in full; the rest are only counted
+MAX_LISTED_MISMATCHES = 50
+
+def prize_value(prize):
+    """Amount of a prize key such as "$50" or "$12.50", or None if it is not one"""
+
+    try:
+        return float(prize.replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return None
+
+def _round_amount(amount):
+    return round(amount, 2)
+
+class _Totals:
+    __slots__ = ('workers', 'tickets', 'prize_amount', 'prizes')
+
+    def __init__(self):
+        self.workers = 0
+        self.tickets = 0
+        self.prize_amount = 0
+        self.prizes = {}
+
+    def add_worker(self, worker):
+        self.workers += 1
+        self.tickets += worker['tickets']
+        self.prize_amount += worker['totalPrizeAmount']
+        for prize, count in (worker.get('prizeCounts') or {}).items():
+            self.prizes[prize] = self.prizes.get(prize, 0) + count
+
+    def to_dict(self):
+        return {
+            'workers': self.workers,
+            'tickets': self.tickets,
+            'prizeAmount': _round_amount(self.prize_amount),
+            'prizes': {prize: self.prizes[prize]
+                       for prize in sorted(self.prizes, key=lambda prize: (prize_value(prize) is None, prize_value(prize) or 0, prize))},
+        }
+
+class SummaryBuilder:
+    """Accumulate the summary one group at a time, as the groups are published"""
+
+    def __init__(self):
+        self.totals = _Totals()
+        self.groups = {}
+        self.districts = {}
+        self.campaigns = {}
+        # (campaign, group number) -> (group ID, tickets, prize amount) for reconciling
+        self.sheet_groups = {}
+        self.worker_mismatches = []
+        self.worker_mismatch_count = 0
+
+    def add_group(self, group_id, group):
+        group_totals = _Totals()
+        campaign = group.get('campaign')
+        campaign_totals = None
+        if campaign is not None:
+            campaign_totals = self.campaigns.get(campaign)
+            if campaign_totals is None:
+                campaign_totals = self.campaigns[campaign] = _Totals()
+
+        for worker in group['workers']:
+            group_totals.add_worker(worker)
+            self.totals.add_worker(worker)
+            if campaign_totals is not None:
+                campaign_totals.add_worker(worker)
+            district = worker.get('district') or group.get('district') or ''
+            district_totals = self.districts.get(district)
+            if district_totals is None:
+                district_totals = self.districts[district] = _Totals()
+            district_totals.add_worker(worker)
+
+            counted_amount = 0
+            for prize, count in (worker.get('prizeCounts') or {}).items():
+                value = prize_value(prize)
+                if value is not None:
+                    counted_amount += value * count
+            if abs(counted_amount - worker['totalPrizeAmount']) > AMOUNT_TOLERANCE:
+                self.worker_mismatch_count += 1
+                if len(self.worker_mismatches) < MAX_LISTED_MISMATCHES:
+                    self.worker_mismatches.append({
+                        'groupId': group_id, 'employeeId': worker['employeeId'], 'name': worker['name'],
+                        'totalPrizeAmount': worker['totalPrizeAmount'], 'prizeCountsAmount': _round_amount(counted_amount),
+                    })
+
+        summary = {key: group[key] for key in ('name', 'groupNo', 'district', 'campaign') if key in group}
+        summary.update(group_totals.to_dict())
+        self.groups[group_id] = summary
+        self.sheet_groups[(campaign, group['groupNo'])] = (group_id, group_totals.tickets, group_totals.prize_amount)
+
+    def reconcile(self, sheet_totals):
+        """Reconciliation against [(campaign or None, SheetTotals), ...], one per workbook read"""
+
+        rows = rows_skipped = 0
+        prize_amount = prize_amount_skipped = 0
+        group_mismatches = []
+        group_mismatch_count = 0
+        seen_groups = set()
+        for campaign, totals in sheet_totals:
+            rows += totals.rows
+            rows_skipped += totals.rows_skipped
+            prize_amount += totals.prize_amount
+            prize_amount_skipped += totals.prize_amount_skipped
+            for group_no, (sheet_tickets, sheet_amount) in totals.groups.items():
+                seen_groups.add((campaign, group_no))
+                group_id, tickets, amount = self.sheet_groups.get((campaign, group_no), (None, 0, 0))
+                if sheet_tickets != tickets or abs(sheet_amount - amount) > AMOUNT_TOLERANCE:
+                    group_mismatch_count += 1
+                    if len(group_mismatches) < MAX_LISTED_MISMATCHES:
+                        group_mismatches.append({
+                            'groupId': group_id, 'groupNo': group_no, 'campaign': campaign,
+                            'sheetTickets': sheet_tickets, 'workerTickets': tickets,
+                            'sheetPrizeAmount': _round_amount(sheet_amount), 'workerPrizeAmount': _round_amount(amount),
+                        })
+        # Groups in the output that the sheet does not have
+        for (campaign, group_no), (group_id, tickets, amount) in self.sheet_groups.items():
+            if (campaign, group_no) not in seen_groups:
+                group_mismatch_count += 1
+                if len(group_mismatches) < MAX_LISTED_MISMATCHES:
+                    group_mismatches.append({
+                        'groupId': group_id, 'groupNo': group_no, 'campaign': campaign,
+                        'sheetTickets': 0, 'workerTickets': tickets,
+                        'sheetPrizeAmount': 0, 'workerPrizeAmount': _round_amount(amount),
+                    })
+        if all(campaign is None for campaign, _ in sheet_totals):
+            for mismatch in group_mismatches:
+                del mismatch['campaign']
+
+        matches = (rows == self.totals.tickets
+                   and abs(prize_amount - self.totals.prize_amount) <= AMOUNT_TOLERANCE
+                   and not group_mismatch_count and not self.worker_mismatch_count)
+        return {
+            'status': 'ok' if matches else 'mismatch',
+            'sheet': {'tickets': rows, 'prizeAmount': _round_amount(prize_amount),
+                      'rowsSkipped': rows_skipped, 'prizeAmountSkipped': _round_amount(prize_amount_skipped)},
+            'workers': {'tickets': self.totals.tickets, 'prizeAmount': _round_amount(self.totals.prize_amount)},
+            'groupMismatches': group_mismatches,
+            'groupMismatchCount': group_mismatch_count,
+            'workerMismatches': self.worker_mismatches,
+            'workerMismatchCount': self.worker_mismatch_count,
+        }
+
+    def summary(self, content_hash=None, sheet_totals=None, previous_summary=None):
+        """The summary document
+
+        sheet_totals are the SheetTotals of the workbooks read for this
+        output (see reconcile), or None if it came from the cache; the
+        reconciliation of previous_summary is then kept if it checked the
+        same workbook.
+        """
+
+        if sheet_totals is not None and all(totals is not None for _, totals in sheet_totals):
+            reconciliation = self.reconcile(sheet_totals)
+        elif (previous_summary is not None and content_hash is not None
+              and previous_summary.get('workbook') == content_hash and 'reconciliation' in previous_summary):
+            reconciliation = previous_summary['reconciliation']
+        else:
+            reconciliation = {'status': 'not checked'}
+
+        totals = {'groups': len(self.groups)}
+        totals.update(self.totals.to_dict())
+        summary = {
+            'version': SUMMARY_FORMAT_VERSION,
+            'workbook': content_hash,
+            'totals': totals,
+            'groups': self.groups,
+            'districts': {district: self.districts[district].to_dict() for district in sorted(self.districts)},
+        }
+        if self.campaigns:
+            summary['campaigns'] = {campaign: totals.to_dict() for campaign, totals in self.campaigns.items()}
+        summary['reconciliation'] = reconciliation
+        return summary
+
+def load_summary(path):
+    """The summary saved at path, or None"""
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return summary if isinstance(summary, dict) and summary.get('version') == SUMMARY_FORMAT_VERSION else None
+
+def describe_reconciliation(reconciliation):
+    """One line for the run summary"""
+
+    status = reconciliation['status']
+    if status != 'mismatch':
+        return status
+    parts = []
+    sheet, workers = reconciliation['sheet'], reconciliation['workers']
+    if sheet['tickets'] != workers['tickets']:
+        parts.append(f"sheet has {sheet['tickets']} tickets, workers {workers['tickets']}")
+    if abs(sheet['prizeAmount'] - workers['prizeAmount']) > AMOUNT_TOLERANCE:
+        parts.append(f"sheet has ${sheet['prizeAmount']:,.2f}, workers ${workers['prizeAmount']:,.2f}")
+    if sheet['rowsSkipped']:
+        parts.append(f"{sheet['rowsSkipped']} rows without agent name or group number (${sheet['prizeAmountSkipped']:,.2f})")
+    if reconciliation['groupMismatchCount']:
+        parts.append(f"{reconciliation['groupMismatchCount']} groups differ")
+    if reconciliation['workerMismatchCount']:
+        parts.append(f"{reconciliation['workerMismatchCount']} workers' prize counts do not add up to their total")
+    return "MISMATCH: " + "; ".join(parts)
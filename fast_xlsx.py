@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Fast .xlsx/.xlsm sheet reader for the AIA Lucky Draw System
+Streams sheet XML and shared strings straight out of the workbook zip with an
+incremental expat parser, decoding only the mapped columns. Produces the same
+values openpyxl does for the cell types our sheets use, and raises
+UnsupportedWorkbookContent for anything else (formulas, dates, ...) so callers
+can fall back to openpyxl
+"""
+
+import posixpath
+import re
+import zipfile
+from xml.parsers import expat
+
+SPREADSHEETML_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Built-in number formats openpyxl reads as dates or durations; it reads every
+# other built-in format, known or not, as a number
+BUILTIN_DATE_FORMAT_IDS = frozenset(range(14, 23)) | {45, 46, 47}
+_DATE_FORMAT_LETTERS = re.compile(r'[dmhysDMHYS]')
+
+class UnsupportedWorkbookContent(Exception):
+    """Raised when the fast reader meets a construct it does not decode like openpyxl"""
+
+class _StopParsing(Exception):
+    """Internal: abort parsing once the wanted rows have been read"""
+
+def _local_name(name):
+    # Tags may carry a namespace prefix (x:row); only the local name matters
+    return name.rpartition(':')[2]
+
+def _column_number(reference):
+    """1-based column number from a cell reference such as "AB12" """
+
+    number = 0
+    for char in reference:
+        if 'A' <= char <= 'Z':
+            number = number * 26 + (ord(char) - 64)
+        elif 'a' <= char <= 'z':
+            number = number * 26 + (ord(char) - 96)
+        else:
+            break
+    return number
+
+def _cast_number(text):
+    # Same rule as openpyxl: a decimal point or exponent makes it a float
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+def _parse_xml(source, parser):
+    """Feed an open zip member to an expat parser in chunks"""
+
+    while True:
+        chunk = source.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.Parse(chunk, False)
+        yield
+    parser.Parse(b'', True)
+    yield
+
+def _shared_strings_parser(strings):
+    """Expat parser appending each shared string to strings, joining rich-text runs and skipping phonetic runs"""
+
+    parts = []
+    state = {'in_si': False, 'in_t': False, 'phonetic_depth': 0}
+
+    def start(name, attrs):
+        name = _local_name(name)
+        if name == 'si':
+            state['in_si'] = True
+            parts.clear()
+        elif name == 'rPh':
+            state['phonetic_depth'] += 1
+        elif name == 't' and state['in_si'] and not state['phonetic_depth']:
+            state['in_t'] = True
+
+    def end(name):
+        name = _local_name(name)
+        if name == 'si':
+            # openpyxl strips the escaped-underscore marker the same way
+            strings.append(''.join(parts).replace('x005F_', ''))
+            state['in_si'] = False
+        elif name == 'rPh':
+            state['phonetic_depth'] -= 1
+        elif name == 't':
+            state['in_t'] = False
+
+    def text(data):
+        if state['in_t']:
+            parts.append(data)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text
+    return parser
+
+def read_shared_strings(archive, path):
+    """Read the shared strings table"""
+
+    strings = []
+    parser = _shared_strings_parser(strings)
+    with archive.open(path) as source:
+        for _ in _parse_xml(source, parser):
+            pass
+    return strings
+
+class LazySharedStrings:
+    """Shared strings table parsed only as far as the highest index looked up
+
+    Stands in for the list read_shared_strings returns when only the first
+    rows of a sheet are read, which mostly use the first strings.
+    """
+
+    def __init__(self, archive, path):
+        self.strings = []
+        self._source = archive.open(path)
+        self._chunks = _parse_xml(self._source, _shared_strings_parser(self.strings))
+
+    def __getitem__(self, index):
+        while index >= len(self.strings) and self._chunks is not None:
+            try:
+                next(self._chunks)
+            except StopIteration:
+                self.close()
+        return self.strings[index]
+
+    def close(self):
+        if self._chunks is not None:
+            self._chunks = None
+            self._source.close()
+
+def read_date_style_ids(archive, path):
+    """Indexes of cell styles whose number format is a date or duration, as openpyxl computes them
+
+    Built-in formats are classified here; openpyxl (slow to import) is only
+    loaded for custom formats that contain date letters.
+    """
+
+    custom_formats = {}
+    style_format_ids = []
+    state = {'in_cell_xfs': False}
+
+    def start(name, attrs):
+        name = _local_name(name)
+        if name == 'numFmt':
+            custom_formats[int(attrs['numFmtId'])] = attrs.get('formatCode')
+        elif name == 'cellXfs':
+            state['in_cell_xfs'] = True
+        elif name == 'xf' and state['in_cell_xfs']:
+            style_format_ids.append(int(attrs.get('numFmtId', 0)))
+
+    def end(name):
+        if _local_name(name) == 'cellXfs':
+            state['in_cell_xfs'] = False
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    with archive.open(path) as source:
+        for _ in _parse_xml(source, parser):
+            pass
+
+    date_style_ids = set()
+    for idx, format_id in enumerate(style_format_ids):
+        if format_id not in custom_formats:
+            if format_id in BUILTIN_DATE_FORMAT_IDS:
+                date_style_ids.add(idx)
+            continue
+        fmt = custom_formats[format_id]
+        # Currency and number formats such as "$"#,##0.00 have no date letters at all
+        if fmt and _DATE_FORMAT_LETTERS.search(fmt):
+            from openpyxl.styles.numbers import is_date_format, is_timedelta_format
+            if is_date_format(fmt) or is_timedelta_format(fmt):
+                date_style_ids.add(idx)
+    return date_style_ids
+
+def iter_sheet_rows(source, shared_strings, column_indices=None, date_style_ids=(), min_row=1, max_row=None):
+    """Stream rows of an open sheet XML member as tuples of decoded cell values
+
+    column_indices are 0-based columns to decode, in the order yielded; other
+    cells are skipped without decoding. With column_indices None every cell is
+    decoded and each row is as wide as its last cell. Rows missing from the XML
+    are yielded as all-None rows, as openpyxl's iter_rows does.
+    """
+
+    mapped = None
+    empty_row = ()
+    if column_indices is not None:
+        # 1-based column number -> position in the yielded tuple
+        mapped = {col + 1: position for position, col in enumerate(column_indices)}
+        empty_row = (None,) * len(column_indices)
+    local_names = {}
+    # Column letters -> 1-based column number, memoized per sheet
+    column_numbers = {}
+
+    completed = []
+    row_number = col_number = 0
+    next_row = min_row
+    values = target = text = None
+    cell_type = 'n'
+    style_id = 0
+    collect = in_inline = False
+    phonetic_depth = 0
+
+    def cell_value():
+        if cell_type == 'inlineStr':
+            return ''.join(text) if text is not None else None
+        value = ''.join(text) if text else None
+        if not value:
+            return None
+        if cell_type == 'n':
+            if style_id in date_style_ids:
+                raise UnsupportedWorkbookContent(f"date-formatted cell in row {row_number}")
+            return _cast_number(value)
+        if cell_type == 's':
+            return shared_strings[int(value)]
+        if cell_type == 'b':
+            return bool(int(value))
+        if cell_type in ('str', 'e'):
+            return value
+        raise UnsupportedWorkbookContent(f"cell type {cell_type!r} in row {row_number}")
+
+    def start(name, attrs):
+        nonlocal row_number, col_number, values, target, text, cell_type, style_id, collect, in_inline, phonetic_depth
+        name = local_names.get(name) or local_names.setdefault(name, _local_name(name))
+        if name == 'c':
+            reference = attrs.get('r')
+            if reference:
+                letters = reference.rstrip('0123456789')
+                col_number = column_numbers.get(letters) or column_numbers.setdefault(letters, _column_number(letters))
+            else:
+                col_number += 1
+            if values is None:
+                target = None
+            elif mapped is None:
+                target = col_number
+            else:
+                target = mapped.get(col_number)
+            if target is not None:
+                cell_type = attrs.get('t', 'n')
+                style_id = int(attrs.get('s') or 0)
+                text = None
+        elif target is not None:
+            if name == 'v':
+                if cell_type != 'inlineStr':
+                    text = []
+                    collect = True
+            elif name == 'f':
+                raise UnsupportedWorkbookContent(f"formula cell in row {row_number}")
+            elif name == 'is':
+                in_inline = True
+                text = []
+            elif name == 'rPh':
+                phonetic_depth += 1
+            elif name == 't' and in_inline and not phonetic_depth:
+                collect = True
+        elif name == 'row':
+            number = attrs.get('r')
+            row_number = int(float(number)) if number else row_number + 1
+            col_number = 0
+            if row_number < next_row:
+                values = None
+            else:
+                values = [None] * len(mapped) if mapped is not None else {}
+
+    def end(name):
+        nonlocal next_row, values, target, text, collect, in_inline, phonetic_depth
+        name = local_names.get(name) or local_names.setdefault(name, _local_name(name))
+        if name == 'c':
+            if target is not None:
+                values[target] = cell_value()
+                target = text = None
+                in_inline = False
+        elif name == 'v' or name == 't':
+            collect = False
+        elif name == 'rPh':
+            phonetic_depth -= 1
+        elif name == 'row':
+            if values is None:
+                return
+            if max_row is not None and row_number > max_row:
+                raise _StopParsing()
+            for _ in range(next_row, row_number):
+                completed.append(empty_row)
+            if mapped is None:
+                width = max(values) if values else 0
+                completed.append(tuple(values.get(col) for col in range(1, width + 1)))
+            else:
+                completed.append(tuple(values))
+            next_row = row_number + 1
+            values = None
+            if max_row is not None and row_number >= max_row:
+                raise _StopParsing()
+
+    def character_data(data):
+        if collect:
+            text.append(data)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = character_data
+
+    try:
+        for _ in _parse_xml(source, parser):
+            yield from completed
+            completed.clear()
+    except _StopParsing:
+        yield from completed
+
+class FastWorkbook:
+    """Minimal read-only view of an .xlsx/.xlsm zip: sheet names, shared strings and sheet rows"""
+
+    def __init__(self, excel_path):
+        self.archive = zipfile.ZipFile(excel_path)
+        try:
+            self._read_manifest()
+        except (KeyError, ValueError, expat.ExpatError) as e:
+            self.archive.close()
+            raise UnsupportedWorkbookContent(f"unreadable workbook manifest: {e}")
+        self._shared_strings = None
+        self._lazy_shared_strings = None
+        self._date_style_ids = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._lazy_shared_strings, LazySharedStrings):
+            self._lazy_shared_strings.close()
+        self.archive.close()
+
+    def _read_manifest(self):
+        from xml.etree import ElementTree
+
+        rels = ElementTree.fromstring(self.archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {}
+        self._part_paths = {}
+        for rel in rels:
+            target = rel.get('Target')
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = path
+            self._part_paths[rel.get('Type', '').rpartition('/')[2]] = path
+
+        workbook = ElementTree.fromstring(self.archive.read('xl/workbook.xml'))
+        self._sheet_paths = {}
+        self.sheetnames = []
+        for sheet in workbook.iter(f"{{{SPREADSHEETML_NS}}}sheet"):
+            name = sheet.get('name')
+            self.sheetnames.append(name)
+            self._sheet_paths[name] = targets.get(sheet.get(f"{{{RELATIONSHIPS_NS}}}id"))
+
+    @property
+    def shared_strings(self):
+        if self._shared_strings is None:
+            path = self._part_paths.get('sharedStrings')
+            self._shared_strings = read_shared_strings(self.archive, path) if path else []
+        return self._shared_strings
+
+    @property
+    def date_style_ids(self):
+        if self._date_style_ids is None:
+            path = self._part_paths.get('styles')
+            self._date_style_ids = read_date_style_ids(self.archive, path) if path else set()
+        return self._date_style_ids
+
+    def sheet_path(self, sheet_name):
+        path = self._sheet_paths.get(sheet_name)
+        if path is None:
+            raise UnsupportedWorkbookContent(f"sheet {sheet_name!r} not found")
+        return path
+
+    def sheet_fingerprint(self, sheet_name):
+        """Identify a sheet's content without parsing it
+
+        Combines the zip CRC and size of the sheet XML with those of the
+        shared strings and styles it is decoded with, all read from the zip
+        directory. Two workbooks with equal fingerprints for a sheet give the
+        same rows for it.
+        """
+
+        parts = (self.sheet_path(sheet_name), self._part_paths.get('sharedStrings'), self._part_paths.get('styles'))
+        fingerprint = [sheet_name]
+        for path in parts:
+            info = self.archive.getinfo(path) if path else None
+            fingerprint.append((path, info.CRC, info.file_size) if info else None)
+        return tuple(fingerprint)
+
+    def sheet_width(self, sheet_name):
+        """Column count from the sheet's <dimension>, or None if it has none"""
+
+        return self.sheet_dimension(sheet_name)[1]
+
+    def sheet_dimension(self, sheet_name):
+        """(row count, column count) from the sheet's <dimension>, each None if it has none"""
+
+        state = {'dimension': (None, None)}
+
+        def start(name, attrs):
+            name = _local_name(name)
+            if name == 'dimension':
+                last_cell = attrs.get('ref', '').rpartition(':')[2]
+                row_digits = last_cell.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+                state['dimension'] = (int(row_digits) if row_digits.isdigit() else None, _column_number(last_cell) or None)
+                raise _StopParsing()
+            if name == 'sheetData':
+                raise _StopParsing()
+
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = start
+        with self.archive.open(self.sheet_path(sheet_name)) as source:
+            try:
+                for _ in _parse_xml(source, parser):
+                    pass
+            except _StopParsing:
+                pass
+        return state['dimension']
+
+    def read_header_row(self, sheet_name):
+        """Header row padded to the sheet width, blank headers named Col1, Col2, ..."""
+
+        width = self.sheet_width(sheet_name)
+        with self.archive.open(self.sheet_path(sheet_name)) as source:
+            first_row = next(iter_sheet_rows(source, self.shared_strings, None, self.date_style_ids, 1, 1), ())
+        if width is not None:
+            first_row = (first_row + (None,) * width)[:width]
+        return [str(cell_value) if cell_value else f"Col{col}" for col, cell_value in enumerate(first_row, start=1)]
+
+    def preview_rows(self, sheet_name, max_row):
+        """Every cell of rows 1 to max_row, reading no further into the sheet
+
+        Shared strings are parsed only as far as these rows need.
+        """
+
+        if self._lazy_shared_strings is None:
+            path = self._part_paths.get('sharedStrings')
+            self._lazy_shared_strings = self._shared_strings or (LazySharedStrings(self.archive, path) if path else [])
+        with self.archive.open(self.sheet_path(sheet_name)) as source:
+            return list(iter_sheet_rows(source, self._lazy_shared_strings, None, self.date_style_ids, 1, max_row))
+
+    def iter_rows(self, sheet_name, column_indices, min_row=2):
+        """Stream the mapped columns of a sheet from min_row on"""
+
+        with self.archive.open(self.sheet_path(sheet_name)) as source:
+            yield from iter_sheet_rows(source, self.shared_strings, column_indices, self.date_style_ids, min_row)
+
+def iter_zip_sheet_rows(excel_path, sheet_path, shared_strings, date_style_ids, column_indices, min_row=2):
+    """Stream the mapped columns of one sheet member, for process-pool workers"""
+
+    with zipfile.ZipFile(excel_path) as archive, archive.open(sheet_path) as source:
+        yield from iter_sheet_rows(source, shared_strings, column_indices, date_style_ids, min_row)
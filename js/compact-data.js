@@ -0,0 +1,80 @@
+// Compact Data Decoder
+//
+// extracted_data.compact.json is written by `simple_extract.py --compact`
+// (format defined in compact_output.py). It holds the same group data as
+// extracted_data.json, minified, with repeated strings moved into a shared
+// dictionary and every list of records stored column by column:
+//
+//   {
+//     "format": "aia-lucky-draw-compact",
+//     "version": 1,
+//     "strings": [...],          // shared string dictionary
+//     "groupIds": [...],         // keys of the decoded object, in order
+//     "groups": <table>          // one record per group
+//   }
+//
+// A table is { "length": n, "columns": [[field, kind, values], ...] } with
+// one value per record. Kinds:
+//
+//   "s"  string stored as-is
+//   "d"  index into "strings"
+//   "n"  number stored as-is
+//   "m"  { string: number } map stored as [keyIndex, number, keyIndex, number, ...]
+//   "t"  nested table (a group's workers)
+//   "j"  any other JSON value stored as-is
+//
+// The server may deliver the .gz/.br siblings of the file; the browser
+// decompresses those transparently when they arrive with Content-Encoding.
+class CompactData {
+    static FORMAT = 'aia-lucky-draw-compact';
+    static VERSION = 1;
+
+    static decode(payload) {
+        if (payload.format !== CompactData.FORMAT || payload.version !== CompactData.VERSION) {
+            throw new Error(`Unsupported compact data: ${payload.format} v${payload.version}`);
+        }
+        const groups = CompactData.decodeTable(payload.groups, payload.strings);
+        const data = {};
+        payload.groupIds.forEach((groupId, i) => {
+            data[groupId] = groups[i];
+        });
+        return data;
+    }
+
+    static decodeTable(table, strings) {
+        const records = Array.from({ length: table.length }, () => ({}));
+        table.columns.forEach(([field, kind, values]) => {
+            values.forEach((value, i) => {
+                if (kind === 'd') {
+                    value = strings[value];
+                } else if (kind === 'm') {
+                    const map = {};
+                    for (let j = 0; j < value.length; j += 2) {
+                        map[strings[value[j]]] = value[j + 1];
+                    }
+                    value = map;
+                } else if (kind === 't') {
+                    value = CompactData.decodeTable(value, strings);
+                }
+                records[i][field] = value;
+            });
+        });
+        return records;
+    }
+
+    // Full group data: the compact file when it was generated, else extracted_data.json
+    static async fetchAll() {
+        try {
+            const response = await fetch('./extracted_data.compact.json');
+            if (response.ok) {
+                return CompactData.decode(await response.json());
+            }
+        } catch (e) {
+            console.warn('Compact data not available, loading extracted_data.json', e);
+        }
+        const response = await fetch('./extracted_data.json');
+        return response.json();
+    }
+}
+
+window.CompactData = CompactData;
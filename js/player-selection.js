@@ -8,12 +8,20 @@ document.addEventListener('DOMContentLoaded', () => {
             this.filteredPlayers = [];
             this.filteredGroups = [];
             this.isReturningFromDrawing = false; // Flag to track if returning from drawing page
+            this.dataRevision = null; // Revision of data/delta.json the loaded data matches
+            this.deltaPollMs = 15000;
+            this.deltaPollPending = false;
             
             // Initialize the component
             this.init();
         }
         
         async init() {
+            // Read the delta revision before the manifest, so a change published
+            // in between is applied again rather than missed
+            const delta = await this.fetchDataDelta();
+            this.dataRevision = delta ? delta.revision : null;
+            
             // Generate groups with workers - now async
             this.groupData = await this.generateGroupData();
             
@@ -39,6 +47,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
                 // Show Step 2 (player selection) without scrolling
                 this.showPlayerStep(group);
+                await this.loadGroupWorkers(group);
                 this.populatePlayerGrid(group);
             } else {
                 // First-time load: clear selectedGroupId and start at top
@@ -48,15 +57,156 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             
             this.setupEventListeners();
+            
+            // Sharded data is updated in place by the extractor's watch mode
+            if (Object.values(this.groupData).some(group => group.shard)) {
+                setInterval(() => this.pollDataDelta(), this.deltaPollMs);
+            }
+        }
+        
+        async fetchDataDelta() {
+            try {
+                const response = await fetch('./data/delta.json', { cache: 'no-store' });
+                return response.ok ? await response.json() : null;
+            } catch (error) {
+                return null;
+            }
+        }
+        
+        async pollDataDelta() {
+            // A slow refresh must not overlap the next poll
+            if (this.deltaPollPending) {
+                return;
+            }
+            this.deltaPollPending = true;
+            try {
+                await this.applyDataDelta();
+            } finally {
+                this.deltaPollPending = false;
+            }
+        }
+        
+        async applyDataDelta() {
+            const delta = await this.fetchDataDelta();
+            if (!delta || delta.revision === this.dataRevision) {
+                return;
+            }
+            
+            // Groups touched since the loaded revision; null when the log no
+            // longer reaches back that far and everything must be reloaded
+            let changedGroupIds = null;
+            if (this.dataRevision !== null && this.dataRevision >= delta.baseRevision) {
+                changedGroupIds = new Set();
+                delta.changes
+                    .filter(change => change.revision > this.dataRevision)
+                    .forEach(change => Object.keys(change.groups).forEach(groupId => changedGroupIds.add(groupId)));
+            }
+            
+            if (await this.refreshGroups(changedGroupIds)) {
+                this.dataRevision = delta.revision;
+            }
+        }
+        
+        async refreshGroups(changedGroupIds) {
+            let manifest;
+            try {
+                const response = await fetch('./data/manifest.json', { cache: 'no-store' });
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                manifest = await response.json();
+            } catch (error) {
+                console.warn('Could not reload the group manifest, retrying on the next poll', error);
+                return false;
+            }
+            
+            // Unchanged groups keep their loaded workers; changed ones are refetched when opened
+            const previousData = this.groupData;
+            Object.keys(manifest).forEach(groupId => {
+                const previous = previousData[groupId];
+                if (previous && changedGroupIds && !changedGroupIds.has(groupId)) {
+                    manifest[groupId] = previous;
+                }
+            });
+            this.groupData = manifest;
+            
+            const groupSearch = document.getElementById('group-search');
+            this.filterGroups(groupSearch ? groupSearch.value : '');
+            
+            if (this.selectedGroup) {
+                const group = this.groupData[this.selectedGroup];
+                if (!group) {
+                    this.goBackToGroups();
+                } else if (group !== previousData[this.selectedGroup]) {
+                    await this.reloadSelectedGroup(group);
+                }
+            }
+            return true;
+        }
+        
+        async reloadSelectedGroup(group) {
+            const selectedCard = document.querySelector(`[data-group="${group.id}"]`);
+            if (selectedCard) {
+                selectedCard.classList.add('selected');
+            }
+            const selectedGroupName = document.getElementById('selected-group-name');
+            if (selectedGroupName) {
+                selectedGroupName.textContent = `Group ${group.groupNo} - ${group.name}`;
+            }
+            
+            await this.loadGroupWorkers(group);
+            if (this.selectedGroup !== group.id) {
+                return;
+            }
+            
+            // Employee IDs are stable across extractions, so the selected
+            // player stays selected unless they were removed
+            if (this.selectedPlayer && !group.workers.some(worker => worker.employeeId === this.selectedPlayer)) {
+                this.selectedPlayer = null;
+                const proceedBtn = document.getElementById('proceed-btn');
+                if (proceedBtn) {
+                    proceedBtn.style.display = 'none';
+                }
+            }
+            
+            // Redraw with the current search, staying on the current page
+            const playerSearch = document.getElementById('player-search');
+            const searchTerm = playerSearch ? playerSearch.value : '';
+            const page = this.currentPage;
+            if (searchTerm) {
+                this.filterPlayers(searchTerm);
+            } else {
+                this.populatePlayerGrid(group);
+            }
+            const totalPages = Math.max(1, Math.ceil(this.filteredPlayers.length / this.playersPerPage));
+            this.currentPage = Math.min(page, totalPages);
+            this.displayPlayers();
+            
+            const playerCard = document.querySelector(`[data-player="${this.selectedPlayer}"]`);
+            if (playerCard) {
+                playerCard.classList.add('selected');
+            }
         }
         
         async generateGroupData() {
             try {
-                const response = await fetch('./extracted_data.json');
-                const realData = await response.json();
-                
+                // Sharded data: the manifest lists every group with its totals,
+                // each group's workers are fetched only when the group is opened
+                const response = await fetch('./data/manifest.json');
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return await response.json();
+            } catch (error) {
+                console.warn('Group manifest not available, loading extracted_data.json', error);
+                return this.loadMonolithicData();
+            }
+        }
+        
+        async loadMonolithicData() {
+            try {
                 // Use the real data structure directly
-                const groups = realData;
+                const groups = await CompactData.fetchAll();
                 
                 // Calculate total statistics for each group
                 Object.values(groups).forEach(group => {
@@ -71,6 +221,41 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         }
         
+        async loadGroupWorkers(group) {
+            // Monolithic data already carries workers; shards are fetched once and kept
+            if (group.workers) {
+                return group;
+            }
+            try {
+                const searchIndex = this.loadPlayerSearchIndex(group);
+                const response = await fetch(`./data/${group.shard}`);
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                const shard = await response.json();
+                group.workers = shard.workers;
+                group.playerSearch = await searchIndex;
+            } catch (error) {
+                console.error(`Failed to load players for ${group.id}`, error);
+                group.workers = [];
+            }
+            return group;
+        }
+        
+        async loadPlayerSearchIndex(group) {
+            // Optional: without it, player search scans every worker
+            if (!group.searchIndex) {
+                return null;
+            }
+            try {
+                const response = await fetch(`./data/${group.searchIndex}`);
+                return response.ok ? await response.json() : null;
+            } catch (error) {
+                console.warn(`Search index not available for ${group.id}`, error);
+                return null;
+            }
+        }
+        
         setupEventListeners() {
             // Group search
             const groupSearch = document.getElementById('group-search');
@@ -173,7 +358,7 @@ document.addEventListener('DOMContentLoaded', () => {
             this.displayGroups();
         }
         
-        selectGroup(groupId) {
+        async selectGroup(groupId) {
             this.selectedGroup = groupId;
             const group = this.groupData[groupId];
             
@@ -191,7 +376,10 @@ document.addEventListener('DOMContentLoaded', () => {
             
             // Show player selection step with smooth scroll
             this.showPlayerStep(group);
-            this.populatePlayerGrid(group);
+            await this.loadGroupWorkers(group);
+            if (this.selectedGroup === groupId) {
+                this.populatePlayerGrid(group);
+            }
         }
         
         showPlayerStep(group) {
@@ -308,16 +496,68 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         
         filterPlayers(searchTerm) {
-            const term = searchTerm.toLowerCase();
             const group = this.groupData[this.selectedGroup];
-            this.filteredPlayers = group.workers.filter(player => 
-                player.name.toLowerCase().includes(term) || 
-                (player.agent && player.agent.toLowerCase().includes(term))
-            );
+            if (group.playerSearch) {
+                this.filteredPlayers = this.searchPlayers(group, searchTerm);
+            } else {
+                const term = searchTerm.toLowerCase();
+                this.filteredPlayers = group.workers.filter(player => 
+                    player.name.toLowerCase().includes(term) || 
+                    (player.agent && player.agent.toLowerCase().includes(term))
+                );
+            }
             this.currentPage = 1;
             this.displayPlayers();
         }
         
+        searchPlayers(group, searchTerm) {
+            // Answers a search from the prebuilt postings (see search_index.py):
+            // short queries match name word / code prefixes, longer ones are
+            // substring matches found by intersecting 3-gram postings
+            const index = group.playerSearch;
+            const normalize = text => String(text).toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+            const term = normalize(searchTerm);
+            if (!term) {
+                return [...group.workers];
+            }
+            const chars = Array.from(term);
+            if (chars.length < index.gramSize) {
+                return (index.prefixes[term] || []).map(position => group.workers[position]);
+            }
+            
+            const postings = [];
+            for (let i = 0; i + index.gramSize <= chars.length; i++) {
+                const posting = index.grams[chars.slice(i, i + index.gramSize).join('')];
+                if (!posting) {
+                    return [];
+                }
+                postings.push(posting);
+            }
+            
+            // Intersect the sorted position lists, smallest first
+            postings.sort((a, b) => a.length - b.length);
+            let candidates = postings[0];
+            for (let p = 1; p < postings.length && candidates.length; p++) {
+                const posting = postings[p];
+                const matched = [];
+                let j = 0;
+                candidates.forEach(position => {
+                    while (j < posting.length && posting[j] < position) {
+                        j++;
+                    }
+                    if (posting[j] === position) {
+                        matched.push(position);
+                    }
+                });
+                candidates = matched;
+            }
+            
+            // Every 3-gram matching does not guarantee the whole term is contiguous
+            return candidates
+                .map(position => group.workers[position])
+                .filter(worker => ['name', 'agent', 'agencyCode'].some(field => normalize(worker[field] || '').includes(term)));
+        }
+        
         sortPlayers(sortBy) {
             switch (sortBy) {
                 case 'name':
@@ -415,7 +655,21 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         }
         
-        proceedToDrawing() {
+        async fetchRecordedDraw(groupId, employeeId) {
+            // The player's draw from the draw ledger (serve.py --ledger), or null if
+            // not drawn or there is no ledger; the drawing page makes the binding check
+            try {
+                const response = await fetch(`./api/draws/${encodeURIComponent(groupId)}/${encodeURIComponent(employeeId)}`, { cache: 'no-store' });
+                if (response.ok) {
+                    return (await response.json()).draw;
+                }
+            } catch (e) {
+                console.warn('Draw ledger not reachable', e);
+            }
+            return null;
+        }
+        
+        async proceedToDrawing() {
             if (!this.selectedGroup || !this.selectedPlayer) {
                 alert('Please select both a group and a player.');
                 return;
@@ -425,6 +679,13 @@ document.addEventListener('DOMContentLoaded', () => {
             const group = this.groupData[this.selectedGroup];
             const playerData = group.workers.find(p => p.employeeId === this.selectedPlayer);
             
+            const draw = await this.fetchRecordedDraw(this.selectedGroup, playerData.employeeId);
+            if (draw) {
+                alert(`${playerData.name} has already been drawn` +
+                      `${draw.kiosk ? ` on ${draw.kiosk}` : ''} at ${new Date(draw.time).toLocaleTimeString()}.`);
+                return;
+            }
+            
             // Store selected player data in localStorage
             localStorage.setItem('selectedPlayer', JSON.stringify({
                 id: `Group ${group.groupNo} ${group.name}-${playerData.name}`,
@@ -14,46 +14,90 @@ class SalesLottery {
         });
     }
 
+    async fetchDrawData() {
+        // Only the selected player's group is needed; fall back to the full file
+        const playerData = JSON.parse(localStorage.getItem('selectedPlayer') || '{}');
+        if (playerData.groupId) {
+            try {
+                const response = await fetch(`./data/groups/${playerData.groupId}.json`);
+                if (response.ok) {
+                    const group = await response.json();
+                    return { [group.id]: group };
+                }
+            } catch (e) {
+                console.warn('Group shard not available, loading extracted_data.json', e);
+            }
+        }
+        return CompactData.fetchAll();
+    }
+
+    async fetchDrawIndex() {
+        // Preset results and players for the selected player's group, precomputed
+        // by simple_extract.py; null when not available
+        const playerData = JSON.parse(localStorage.getItem('selectedPlayer') || '{}');
+        if (!playerData.groupId) {
+            return null;
+        }
+        try {
+            const response = await fetch(`./data/draw/${playerData.groupId}.json`);
+            if (response.ok) {
+                return await response.json();
+            }
+        } catch (e) {
+            console.warn('Draw index not available, building it from group data', e);
+        }
+        return null;
+    }
+
     async loadPresetResultsFromJSON() {
         try {
-            const response = await fetch('./extracted_data.json');
-            const data = await response.json();
-            const prizeKeyMap = {
-                '$20': '$20 Cash Prize',
-                '$50': '$50 Cash Prize',
-                '$100': '$100 Cash Prize',
-                '$200': '$200 Cash Prize',
-                '$500': '$500 Cash Prize',
-                '$1000': '$1000 Cash Prize'
-            };
-            Object.values(data).forEach(group => {
-                group.workers.forEach(worker => {
-                    const groupKey = (group.name || group.district || group.id || '').replace(/\s+/g, '');
-                    const workerKey = (worker.name || worker.employeeId || '').replace(/\s+/g, '');
-                    const key = `${groupKey}-${workerKey}`;
-                    const mappedPrizeCounts = {};
-                    if (worker.prizeCounts) {
-                        Object.entries(worker.prizeCounts).forEach(([prize, count]) => {
-                            const mappedPrize = prizeKeyMap[prize] || prize;
-                            mappedPrizeCounts[mappedPrize] = count;
-                        });
-                    }
-                    this.presetResults[key] = mappedPrizeCounts;
-                    this.players[key] = {
-                        name: worker.name || worker.employeeId || 'Unknown',
-                        tickets: Object.values(mappedPrizeCounts).reduce((sum, count) => sum + count, 0),
-                        remaining: Object.values(mappedPrizeCounts).reduce((sum, count) => sum + count, 0),
-                        totalWinnings: 0
-                    };
-                });
-            });
-            console.log('Preset results loaded from extracted_data.json:', this.presetResults);
+            const drawIndex = await this.fetchDrawIndex();
+            if (drawIndex) {
+                this.presetResults = drawIndex.presetResults;
+                this.players = drawIndex.players;
+            } else {
+                this.buildPresetResults(await this.fetchDrawData());
+            }
+            console.log('Preset results loaded:', this.presetResults);
             console.log('Initialized players:', this.players);
         } catch (e) {
-            console.error('Failed to load preset results from extracted_data.json:', e);
+            console.error('Failed to load preset results:', e);
         }
     }
 
+    buildPresetResults(data) {
+        // Same structures as generate_draw_index in simple_extract.py
+        const prizeKeyMap = {
+            '$20': '$20 Cash Prize',
+            '$50': '$50 Cash Prize',
+            '$100': '$100 Cash Prize',
+            '$200': '$200 Cash Prize',
+            '$500': '$500 Cash Prize',
+            '$1000': '$1000 Cash Prize'
+        };
+        Object.values(data).forEach(group => {
+            group.workers.forEach(worker => {
+                const groupKey = (group.name || group.district || group.id || '').replace(/\s+/g, '');
+                const workerKey = (worker.name || worker.employeeId || '').replace(/\s+/g, '');
+                const key = `${groupKey}-${workerKey}`;
+                const mappedPrizeCounts = {};
+                if (worker.prizeCounts) {
+                    Object.entries(worker.prizeCounts).forEach(([prize, count]) => {
+                        const mappedPrize = prizeKeyMap[prize] || prize;
+                        mappedPrizeCounts[mappedPrize] = count;
+                    });
+                }
+                this.presetResults[key] = mappedPrizeCounts;
+                this.players[key] = {
+                    name: worker.name || worker.employeeId || 'Unknown',
+                    tickets: Object.values(mappedPrizeCounts).reduce((sum, count) => sum + count, 0),
+                    remaining: Object.values(mappedPrizeCounts).reduce((sum, count) => sum + count, 0),
+                    totalWinnings: 0
+                };
+            });
+        });
+    }
+
     initializeEvents() {
         const playerSelect = document.getElementById('player-select');
         const drawBtn = document.getElementById('draw-btn');
@@ -71,7 +115,7 @@ class SalesLottery {
         }
 
         if (drawBtn) {
-            drawBtn.addEventListener('click', () => {
+            drawBtn.addEventListener('click', async () => {
                 console.log('=== DRAW BUTTON CLICKED ===');
                 console.log('Current player:', this.currentPlayer);
                 console.log('Players object:', this.players);
@@ -106,6 +150,14 @@ class SalesLottery {
                     return;
                 }
 
+                // Blocks further clicks while the draw is being recorded
+                this.isDrawing = true;
+                const claimed = await this.claimDraw();
+                this.isDrawing = false;
+                if (!claimed) {
+                    return;
+                }
+
                 // Permanently stop pre-drawing animation
                 this.isPreDrawingStopped = true;
                 console.log('Pre-drawing animation permanently stopped');
@@ -212,6 +264,58 @@ class SalesLottery {
         document.getElementById('remaining-tickets').textContent = player.remaining;
     }
 
+    kioskId() {
+        let kioskId = localStorage.getItem('kioskId');
+        if (!kioskId) {
+            kioskId = `kiosk-${Math.random().toString(36).slice(2, 8)}`;
+            localStorage.setItem('kioskId', kioskId);
+        }
+        return kioskId;
+    }
+
+    async claimDraw() {
+        // Record the draw in the ledger (serve.py --ledger) before it starts, so the
+        // same player cannot be drawn on two kiosks. Without a ledger (a plain
+        // static server) the draw goes ahead; returns whether it may start.
+        const playerData = JSON.parse(localStorage.getItem('selectedPlayer') || '{}');
+        if (!playerData.groupId || !playerData.employeeId) {
+            return true;
+        }
+        const player = this.players[this.currentPlayer] || {};
+        let response;
+        try {
+            response = await fetch('./api/draws', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    groupId: playerData.groupId,
+                    employeeId: playerData.employeeId,
+                    name: playerData.name,
+                    kiosk: this.kioskId(),
+                    tickets: player.tickets,
+                    prizes: this.presetResults[this.currentPlayer] || {}
+                })
+            });
+        } catch (e) {
+            console.warn('Draw ledger not reachable, drawing without recording', e);
+            return true;
+        }
+        if (response.status === 409) {
+            const { draw } = await response.json();
+            alert(`${playerData.name} has already been drawn` +
+                  `${draw.kiosk ? ` on ${draw.kiosk}` : ''} at ${new Date(draw.time).toLocaleTimeString()}.`);
+            return false;
+        }
+        if (response.status === 404 || response.status === 405 || response.status === 501) {
+            return true;
+        }
+        if (!response.ok) {
+            alert('This draw could not be recorded. Please try again.');
+            return false;
+        }
+        return true;
+    }
+
     startPreDrawingAnimationDebounced() {
         // Pre-drawing animation is permanently stopped after draw, never start again
         if (this.isPreDrawingStopped) {
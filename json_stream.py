@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON output for the AIA Lucky Draw System
+Writes the generated group data one group at a time, as it is produced,
+instead of building and serializing the whole document in memory, and
+replaces output files atomically so a kiosk reading them never sees a
+half-written file. Such a document can be read back the same way, one
+group at a time (iter_object_members).
+"""
+
+import filecmp
+import json
+import os
+import re
+
+def temp_path_for(path):
+    """Temp file next to path, on the same filesystem so os.replace is atomic"""
+
+    return f"{path}.{os.getpid()}.tmp"
+
+def replace_if_changed(tmp_path, path):
+    """Move tmp_path over path unless path already has the same bytes; returns True if replaced"""
+
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+class JsonObjectStreamWriter:
+    """Write a JSON object member by member to files and text streams
+
+    The result is byte-identical to json.dumps(obj, indent=2,
+    ensure_ascii=False). Each member's value is passed already serialized
+    at the top level (json.dumps(value, indent=2, ensure_ascii=False)), so a
+    caller that also needs that text elsewhere serializes it only once.
+
+    Files are written to a temp file beside each path and renamed over it
+    when the writer is closed; files whose content did not change are left
+    untouched. On an exception inside the with block the temp files are
+    removed and the old files are kept.
+    """
+
+    def __init__(self, paths=(), streams=(), indent=2):
+        self.paths = list(paths)
+        self.tmp_paths = [temp_path_for(path) for path in self.paths]
+        self.files = [open(tmp_path, 'w', encoding='utf-8') for tmp_path in self.tmp_paths]
+        self.streams = list(streams)
+        self.outputs = self.files + self.streams
+        self.padding = ' ' * indent
+        self.member_count = 0
+        self.paths_written = []
+
+    def _write(self, text):
+        for output in self.outputs:
+            output.write(text)
+
+    def write_member(self, key, value_text):
+        """Append one "key": value member; value_text is the value's top-level serialization"""
+
+        separator = ',\n' if self.member_count else '{\n'
+        indented_value = value_text.replace('\n', '\n' + self.padding)
+        self._write(f"{separator}{self.padding}{json.dumps(key, ensure_ascii=False)}: {indented_value}")
+        self.member_count += 1
+
+    def close(self):
+        """Finish the object and move every file into place; returns the paths that changed"""
+
+        self._write('\n}' if self.member_count else '{}')
+        for stream in self.streams:
+            stream.write('\n')
+        for f in self.files:
+            f.close()
+        for tmp_path, path in zip(self.tmp_paths, self.paths):
+            if replace_if_changed(tmp_path, path):
+                self.paths_written.append(path)
+        return self.paths_written
+
+    def abort(self):
+        for f in self.files:
+            f.close()
+        for tmp_path in self.tmp_paths:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+def iter_object_members(text):
+    """Yield the (key, value) members of the JSON object in text one at a time
+
+    The reading counterpart of JsonObjectStreamWriter: only one member's
+    value is decoded at a time, so a large document can be walked with
+    little more memory than its text. Raises ValueError for text that is
+    not a JSON object.
+    """
+
+    decoder = json.JSONDecoder()
+    pos = _WHITESPACE.match(text).end()
+    if not text.startswith('{', pos):
+        raise ValueError("Expecting a JSON object")
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    if text.startswith('}', pos):
+        return
+    while True:
+        key, pos = decoder.raw_decode(text, pos)
+        if not isinstance(key, str):
+            raise ValueError(f"Expecting a member name at {pos}")
+        pos = _WHITESPACE.match(text, pos).end()
+        if not text.startswith(':', pos):
+            raise ValueError(f"Expecting ':' at {pos}")
+        value, pos = decoder.raw_decode(text, _WHITESPACE.match(text, pos + 1).end())
+        yield key, value
+        pos = _WHITESPACE.match(text, pos).end()
+        if text.startswith('}', pos):
+            return
+        if not text.startswith(',', pos):
+            raise ValueError(f"Expecting ',' or '}}' at {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
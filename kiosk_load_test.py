@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Kiosk load test for the AIA Lucky Draw System
+Rehearses event-day load: N simulated kiosks walk the real flow of the
+pages over and over (group list, player list, drawing page, draw) against
+serve.py, and the latency of each step, throughput and error rates are
+reported for each way of shipping the data:
+
+    sharded          data/manifest.json, then one group's shard, search
+                     index and draw index (the default layout)
+    compact          extracted_data.compact.json, precompressed (.br/.gz)
+    monolithic       extracted_data.json, uncompressed
+    monolithic-gzip  extracted_data.json, gzipped by the server if it fits
+                     in its cache (as a browser would ask for it)
+
+A variant is only run if its files exist under the root.
+
+Each kiosk is an asyncio task with up to six keep-alive connections, as a
+browser opens per host, and a browser-like cache: files served with
+max-age are not requested again while fresh, the rest are revalidated
+with If-None-Match. A step's latency is the time until all its requests
+have completed; requests within a step run in parallel, as a page loads
+its scripts. Players are picked at random (seeded) from the data under the
+root. A draw is recorded with POST /api/draws; a 409 for a player another
+kiosk drew first counts as a conflict, not an error.
+
+By default a stand-in server (serve.py in its own process, serving the
+root with a fresh ledger in a temporary directory) is started for each
+variant. --url=http://host:port tests a running server instead; its
+ledger is only written to with --record-draws.
+
+Usage: python3 kiosk_load_test.py [--kiosks=24] [--sessions=10] [--think=ms]
+                                  [--variants=sharded,compact,...] [--root=dir]
+                                  [--url=http://host:port] [--record-draws]
+                                  [--seed=N] [--output=results.json]
+"""
+
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+from benchmark_extract import current_commit
+from simple_extract import split_cli_flags
+
+LOAD_TEST_FORMAT_VERSION = 1
+
+DEFAULT_KIOSKS = 24
+DEFAULT_SESSIONS = 10
+
+# Connections a browser opens per host
+CONNECTIONS_PER_KIOSK = 6
+
+REQUEST_TIMEOUT = 30
+SERVER_START_TIMEOUT = 10
+
+INDEX_PAGE = ('index.html', 'css/styles.css', 'js/compact-data.js', 'js/player-selection.js', 'assets/pic/aialogo.jpeg')
+DRAWING_PAGE = ('drawing.html', 'css/styles.css', 'js/compact-data.js', 'js/blocks.js', 'js/sales-lottery.js',
+                'js/app.js', 'js/drawing-page.js', 'assets/pic/aialogo.jpeg')
+
+# Variant -> (file that must exist under the root, Accept-Encoding sent)
+VARIANTS = {
+    'sharded': ('data/manifest.json', 'gzip, deflate, br'),
+    'compact': ('extracted_data.compact.json', 'gzip, deflate, br'),
+    'monolithic': ('extracted_data.json', 'identity'),
+    'monolithic-gzip': ('extracted_data.json', 'gzip, deflate, br'),
+}
+
+# Options taking a value, and flags
+VALUE_OPTIONS = ('kiosks', 'sessions', 'think', 'variants', 'root', 'url', 'seed', 'output')
+FLAG_OPTIONS = ('record-draws',)
+
+STEPS = ('index page', 'group list', 'player list', 'player check', 'drawing page', 'draw data', 'draw')
+
+class RequestFailed(Exception):
+    """Raised for a request that got no complete HTTP response"""
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, method, target, headers, body=None):
+        """Send a request and read the whole response; returns (status, headers, body length)"""
+
+        lines = [f"{method} {target} HTTP/1.1"] + [f"{name}: {value}" for name, value in headers.items()]
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise RequestFailed("connection closed by the server")
+        status = int(status_line.split(None, 2)[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        length = 0
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            pass
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # The last chunk has no data; trailers (if any) end with a blank line
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                await self.reader.readexactly(size + 2)
+                length += size
+        elif 'content-length' in response_headers:
+            length = int(response_headers['content-length'])
+            await self.reader.readexactly(length)
+        else:
+            length = len(await self.reader.read())
+            self.reusable = False
+        if response_headers.get('connection', '').lower() == 'close':
+            self.reusable = False
+        return status, response_headers, length
+
+    def close(self):
+        self.writer.close()
+
+class LoadResults:
+    """Latencies, statuses and bytes collected by every kiosk of one variant"""
+
+    def __init__(self):
+        self.step_latencies = {step: [] for step in STEPS}
+        self.requests = 0
+        self.bytes = 0
+        self.statuses = {}
+        self.errors = {}
+        self.draws = 0
+        self.conflicts = 0
+
+    def record_request(self, status, length):
+        self.requests += 1
+        self.bytes += length
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def record_error(self, message):
+        self.requests += 1
+        self.errors[message] = self.errors.get(message, 0) + 1
+
+class Kiosk:
+    """A simulated kiosk browser: a few keep-alive connections and an HTTP cache"""
+
+    def __init__(self, name, host, port, accept_encoding, results):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.accept_encoding = accept_encoding
+        self.results = results
+        self.idle = []
+        self.slots = asyncio.Semaphore(CONNECTIONS_PER_KIOSK)
+        # path -> (ETag, time until which it is fresh)
+        self.cache = {}
+
+    async def fetch(self, path, method='GET', body=None, use_cache=True):
+        """Request a path; returns the status, or None if the request failed or was served from cache"""
+
+        cached = self.cache.get(path) if use_cache else None
+        if cached is not None and cached[1] > time.monotonic():
+            return None
+        headers = {'Host': f"{self.host}:{self.port}", 'Accept-Encoding': self.accept_encoding, 'User-Agent': self.name}
+        if cached is not None and cached[0]:
+            headers['If-None-Match'] = cached[0]
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+
+        async with self.slots:
+            # A kept-alive connection the server has since closed is retried once on a new one
+            for attempt in range(2):
+                connection = self.idle.pop() if self.idle else None
+                fresh = connection is None
+                try:
+                    if fresh:
+                        connection = await HttpConnection.open(self.host, self.port)
+                    status, response_headers, length = await asyncio.wait_for(
+                        connection.request(method, '/' + path, headers, body), REQUEST_TIMEOUT)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, RequestFailed, ValueError, IndexError) as e:
+                    if connection is not None:
+                        connection.close()
+                    if fresh or attempt:
+                        self.results.record_error(f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+                        return None
+                    continue
+                if connection.reusable:
+                    self.idle.append(connection)
+                else:
+                    connection.close()
+                break
+
+        self.results.record_request(status, length)
+        if use_cache and status in (200, 304):
+            self.remember(path, response_headers)
+        return status
+
+    def remember(self, path, headers):
+        cache_control = headers.get('cache-control', '')
+        max_age = 0
+        for directive in cache_control.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name == 'max-age' and value.isdigit():
+                max_age = int(value)
+        if 'no-store' in cache_control:
+            return
+        self.cache[path] = (headers.get('etag'), time.monotonic() + max_age)
+
+    async def step(self, name, paths, expected=(200, 304), **kwargs):
+        """Fetch paths in parallel as one step of the flow; returns their statuses
+
+        A status outside expected counts as an error of the step.
+        """
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(self.fetch(path, **kwargs) for path in paths))
+        self.results.step_latencies[name].append(time.perf_counter() - started)
+        for status in statuses:
+            if status is not None and status not in expected:
+                self.results.errors[f"{name}: HTTP {status}"] = self.results.errors.get(f"{name}: HTTP {status}", 0) + 1
+        return statuses
+
+    def close(self):
+        for connection in self.idle:
+            connection.close()
+        self.idle = []
+
+def load_players(root):
+    """[(group ID, employee ID, name, tickets, prize counts), ...] of the data under root"""
+
+    data_dir = os.path.join(root, 'data')
+    try:
+        with open(os.path.join(data_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            group_ids = list(json.load(f))
+        groups = {}
+        for group_id in group_ids:
+            with open(os.path.join(data_dir, 'groups', f"{group_id}.json"), 'r', encoding='utf-8') as f:
+                groups[group_id] = json.load(f)
+    except (OSError, ValueError):
+        with open(os.path.join(root, 'extracted_data.json'), 'r', encoding='utf-8') as f:
+            groups = json.load(f)
+    return [(group_id, worker['employeeId'], worker['name'], worker['tickets'], worker.get('prizeCounts') or {})
+            for group_id, group in groups.items() for worker in group['workers']]
+
+async def run_kiosk(kiosk, variant, players, sessions, think, record_draws, rng):
+    """Walk the pages `sessions` times, as a kiosk does for each player"""
+
+    async def pause():
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * think if think else 0)
+
+    data_file = VARIANTS[variant][0]
+    try:
+        for _ in range(sessions):
+            group_id, employee_id, name, tickets, prizes = rng.choice(players)
+            quoted_group = urllib.parse.quote(group_id)
+
+            await kiosk.step('index page', INDEX_PAGE)
+            await kiosk.step('group list', [data_file])
+            await pause()
+            if variant == 'sharded':
+                await kiosk.step('player list', [f"data/groups/{quoted_group}.json", f"data/search/{quoted_group}.json"])
+                await pause()
+            if record_draws:
+                # 404: not drawn yet
+                await kiosk.step('player check', [f"api/draws/{quoted_group}/{urllib.parse.quote(employee_id)}"],
+                                 expected=(200, 404), use_cache=False)
+            await kiosk.step('drawing page', DRAWING_PAGE)
+            await kiosk.step('draw data', [f"data/draw/{quoted_group}.json" if variant == 'sharded' else data_file])
+            await pause()
+            if record_draws:
+                draw = json.dumps({'groupId': group_id, 'employeeId': employee_id, 'name': name,
+                                   'kiosk': kiosk.name, 'tickets': tickets, 'prizes': prizes}).encode('utf-8')
+                status, = await kiosk.step('draw', ['api/draws'], expected=(201, 409),
+                                           method='POST', body=draw, use_cache=False)
+                if status == 201:
+                    kiosk.results.draws += 1
+                elif status == 409:
+                    kiosk.results.conflicts += 1
+    finally:
+        kiosk.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_stand_in_server(root, ledger_path):
+    """serve.py in its own process on a free local port, with a draw ledger; returns (process, port)"""
+
+    port = free_port()
+    serve_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+    process = subprocess.Popen([sys.executable, serve_py, str(port), '--bind=127.0.0.1', f"--root={root}",
+                                f"--ledger={ledger_path}", '--quiet'], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"serve.py did not start within {SERVER_START_TIMEOUT}s")
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of a sorted list"""
+
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+def summarize(variant, results, seconds, kiosks, sessions):
+    """Report entry of one variant"""
+
+    steps = {}
+    for step, latencies in results.step_latencies.items():
+        if not latencies:
+            continue
+        latencies = sorted(latencies)
+        steps[step] = {'count': len(latencies),
+                       **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 2) for p in (50, 90, 99)},
+                       'max_ms': round(latencies[-1] * 1000, 2)}
+    errors = sum(results.errors.values())
+    total_sessions = kiosks * sessions
+    return {
+        'variant': variant,
+        'kiosks': kiosks,
+        'sessions': total_sessions,
+        'seconds': round(seconds, 3),
+        'requests': results.requests,
+        'requests_per_sec': round(results.requests / seconds, 1) if seconds else None,
+        'sessions_per_sec': round(total_sessions / seconds, 2) if seconds else None,
+        'bytes': results.bytes,
+        'bytes_per_session': round(results.bytes / total_sessions) if total_sessions else 0,
+        'bytes_per_sec': round(results.bytes / seconds) if seconds else None,
+        'errors': errors,
+        'error_rate': round(errors / results.requests, 4) if results.requests else 0,
+        'error_counts': results.errors,
+        'statuses': {str(status): count for status, count in sorted(results.statuses.items())},
+        'draws': results.draws,
+        'conflicts': results.conflicts,
+        'steps': steps,
+    }
+
+async def run_load(host, port, variant, players, kiosks, sessions, think, record_draws, seed):
+    results = LoadResults()
+    accept_encoding = VARIANTS[variant][1]
+    kiosk_tasks = []
+    for number in range(kiosks):
+        kiosk = Kiosk(f"kiosk-{number + 1}", host, port, accept_encoding, results)
+        # The same players for every variant, so they are compared on the same walk
+        rng = random.Random(f"{seed}:{number}")
+        kiosk_tasks.append(run_kiosk(kiosk, variant, players, sessions, think, record_draws, rng))
+    started = time.perf_counter()
+    await asyncio.gather(*kiosk_tasks)
+    return results, time.perf_counter() - started
+
+def run_variant(variant, root, players, kiosks, sessions, think=0, seed=0, url=None, record_draws=True):
+    """Load one variant, against url or a fresh stand-in server; returns its report entry"""
+
+    if url is not None:
+        address = urllib.parse.urlsplit(url)
+        results, seconds = asyncio.run(run_load(address.hostname, address.port or 80, variant, players,
+                                                kiosks, sessions, think, record_draws, seed))
+        return summarize(variant, results, seconds, kiosks, sessions)
+
+    with tempfile.TemporaryDirectory(prefix='kiosk-load-') as ledger_dir:
+        process, port = start_stand_in_server(root, os.path.join(ledger_dir, 'draws.log'))
+        try:
+            results, seconds = asyncio.run(run_load('127.0.0.1', port, variant, players,
+                                                    kiosks, sessions, think, record_draws, seed))
+        finally:
+            process.terminate()
+            process.wait()
+    return summarize(variant, results, seconds, kiosks, sessions)
+
+def print_variant(result):
+    """Readable results of one variant on stderr; stdout is kept for the JSON report"""
+
+    print(f"{result['variant']}: {result['sessions']} sessions on {result['kiosks']} kiosks in {result['seconds']:.2f}s, "
+          f"{result['requests']:,} requests ({result['requests_per_sec']:,.0f}/s), "
+          f"{result['bytes_per_sec'] / 1024 / 1024:,.1f} MB/s, "
+          f"{result['errors']} errors ({result['error_rate']:.2%}), "
+          f"{result['draws']} draws, {result['conflicts']} conflicts", file=sys.stderr)
+    print(f"  {'step':<14} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}", file=sys.stderr)
+    for step, latency in result['steps'].items():
+        print(f"  {step:<14} {latency['count']:>6} {latency['p50_ms']:>9.1f} {latency['p90_ms']:>9.1f} "
+              f"{latency['p99_ms']:>9.1f} {latency['max_ms']:>9.1f}", file=sys.stderr)
+    for error, count in result['error_counts'].items():
+        print(f"  error x{count}: {error}", file=sys.stderr)
+
+def print_comparison(results):
+    print(f"{'variant':<16} {'sessions/s':>10} {'KB/session':>11} {'list p50':>9} {'list p99':>9} "
+          f"{'data p99':>9} {'errors':>7}", file=sys.stderr)
+    for result in results:
+        group_list = result['steps'].get('group list', {})
+        draw_data = result['steps'].get('draw data', {})
+        print(f"{result['variant']:<16} {result['sessions_per_sec']:>10,.1f} {result['bytes_per_session'] / 1024:>11,.1f} "
+              f"{group_list.get('p50_ms', 0):>9.1f} {group_list.get('p99_ms', 0):>9.1f} "
+              f"{draw_data.get('p99_ms', 0):>9.1f} {result['error_rate']:>7.2%}", file=sys.stderr)
+
+def usage():
+    return __doc__[__doc__.index('Usage:'):].rstrip()
+
+if __name__ == "__main__":
+    args, flags = split_cli_flags(sys.argv[1:])
+
+    if 'help' in flags or '-h' in args:
+        print(usage())
+        sys.exit(0)
+    unknown = [f"--{name}" for name in flags if name not in VALUE_OPTIONS + FLAG_OPTIONS] + args
+    unknown += [f"--{name} needs a value" for name in VALUE_OPTIONS if flags.get(name) is True]
+    unknown += [f"--{name} takes no value" for name in FLAG_OPTIONS if isinstance(flags.get(name), str)]
+    if unknown:
+        print(f"Invalid options: {', '.join(unknown)}")
+        print(usage())
+        sys.exit(1)
+
+    root = os.path.abspath(flags['root']) if 'root' in flags else os.path.dirname(os.path.abspath(__file__))
+    url = flags.get('url')
+    try:
+        kiosks = int(flags.get('kiosks', DEFAULT_KIOSKS))
+        sessions = int(flags.get('sessions', DEFAULT_SESSIONS))
+        think = float(flags.get('think', 0)) / 1000
+        seed = int(flags.get('seed', 0))
+    except ValueError as e:
+        print(f"Invalid option value: {e}")
+        print(usage())
+        sys.exit(1)
+    # A real server's ledger is only written to when asked
+    record_draws = url is None or 'record-draws' in flags
+
+    available = [variant for variant, (data_file, _) in VARIANTS.items() if os.path.exists(os.path.join(root, data_file))]
+    if isinstance(flags.get('variants'), str):
+        variants = flags['variants'].split(',')
+        unknown = [variant for variant in variants if variant not in VARIANTS]
+        if unknown:
+            print(f"Unknown variants: {', '.join(unknown)}")
+            print(f"Variants: {', '.join(VARIANTS)}")
+            sys.exit(1)
+        missing = [variant for variant in variants if variant not in available]
+        if missing:
+            print(f"No data for {', '.join(missing)} under {root}")
+            sys.exit(1)
+    else:
+        variants = available
+    if not variants:
+        print(f"No extracted data under {root} (run simple_extract.py first)")
+        sys.exit(1)
+
+    try:
+        players = load_players(root)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Cannot read players under {root}: {e}")
+        sys.exit(1)
+    if not players:
+        print(f"No players under {root}")
+        sys.exit(1)
+
+    print(f"{kiosks} kiosks x {sessions} sessions, {len(players):,} players, "
+          f"{'against ' + url if url else 'stand-in server for ' + root}", file=sys.stderr)
+    results = []
+    for variant in variants:
+        try:
+            result = run_variant(variant, root, players, kiosks, sessions, think, seed, url, record_draws)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print_variant(result)
+        results.append(result)
+    if len(results) > 1:
+        print_comparison(results)
+
+    report = {
+        'version': LOAD_TEST_FORMAT_VERSION,
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'url': url,
+        'think_ms': think * 1000,
+        'seed': seed,
+        'results': results,
+    }
+    report_text = json.dumps(report, indent=2)
+    if isinstance(flags.get('output'), str):
+        with open(flags['output'], 'w', encoding='utf-8') as f:
+            f.write(report_text + '\n')
+        print(f"Results saved to: {flags['output']}", file=sys.stderr)
+    else:
+        print(report_text)
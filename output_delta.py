@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Output deltas for the AIA Lucky Draw System
+Every extraction that changes the published group data appends a revision
+to data/delta.json. A revision lists the groups that were added, changed or
+removed. For a changed group it also lists the employee IDs of the workers
+that were added, changed or removed. Kiosks poll this small file and refetch
+only the groups a revision touched:
+
+    {
+      "version": 1,
+      "revision": 12,
+      "baseRevision": 0,      # kiosks at this revision or later can catch up
+      "changes": [            # from the changes; older ones reload everything
+        {
+          "revision": 12,
+          "workbook": "<sha256 of the workbook>",
+          "time": "2026-10-18T09:30:00Z",
+          "groups": {
+            "group-3": {"status": "changed", "added": [], "changed": ["EMP003012"], "removed": []},
+            "group-9": {"status": "added"},
+            "group-2": {"status": "removed"}
+          }
+        }
+      ]
+    }
+
+Only the most recent MAX_DELTA_REVISIONS revisions are kept.
+"""
+
+import json
+import time
+
+DELTA_FORMAT_VERSION = 1
+DELTA_FILE = 'delta.json'
+MAX_DELTA_REVISIONS = 50
+
+def diff_group(old_group, new_group):
+    """Change entry for one group; old_group is None for a new group
+
+    Workers are matched on employeeId, which employee_ids.py keeps stable
+    across runs. Changes to the group's own fields (name, district, ...)
+    show up as a changed group with empty worker lists.
+    """
+
+    if old_group is None:
+        return {'status': 'added'}
+
+    old_workers = {worker['employeeId']: worker for worker in old_group['workers']}
+    new_workers = {worker['employeeId']: worker for worker in new_group['workers']}
+    return {
+        'status': 'changed',
+        'added': [employee_id for employee_id in new_workers if employee_id not in old_workers],
+        'changed': [employee_id for employee_id, worker in new_workers.items()
+                    if employee_id in old_workers and old_workers[employee_id] != worker],
+        'removed': [employee_id for employee_id in old_workers if employee_id not in new_workers],
+    }
+
+class DeltaLog:
+    """The revisions kept in data/delta.json"""
+
+    def __init__(self, revision=0, base_revision=0, changes=None):
+        self.revision = revision
+        self.base_revision = base_revision
+        self.changes = [] if changes is None else changes
+
+    @classmethod
+    def load(cls, path):
+        """Read the delta file, or start a new log if there is none (or it is unreadable)"""
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != DELTA_FORMAT_VERSION:
+            return cls()
+        return cls(data['revision'], data['baseRevision'], data['changes'])
+
+    def record(self, groups, content_hash):
+        """Append a revision with the given group change entries; returns its number"""
+
+        self.revision += 1
+        self.changes.append({
+            'revision': self.revision,
+            'workbook': content_hash,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'groups': groups,
+        })
+        if len(self.changes) > MAX_DELTA_REVISIONS:
+            del self.changes[:-MAX_DELTA_REVISIONS]
+            self.base_revision = self.changes[0]['revision'] - 1
+        return self.revision
+
+    def dumps(self):
+        return json.dumps({
+            'version': DELTA_FORMAT_VERSION,
+            'revision': self.revision,
+            'baseRevision': self.base_revision,
+            'changes': self.changes,
+        }, indent=2, ensure_ascii=False)
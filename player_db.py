@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+SQLite export of the player data for the AIA Lucky Draw System
+simple_extract.py --sqlite writes the generated groups to an indexed SQLite
+database (extracted_data.sqlite next to the output by default), and
+serve.py --db answers paged player lists and single-player presets from it
+under /api/, so a page fetches only the players it shows.
+
+Schema (version 1):
+
+    meta(key, value)                    version, revision (of data/delta.json)
+    groups(id, position, group_no, name, district, campaign, description,
+           icon, total_workers, total_tickets)
+    workers(id, group_id, employee_id, name, tickets, group_no, agent,
+            agency_code, district, total_prize_amount, draw_key)
+    agents(agent, name, agency_code, district, workers, tickets)
+    prize_counts(worker_id, position, prize, label, amount, count)
+
+workers.id follows the order of the generated data, so ORDER BY id lists
+players as extracted_data.json does. agents has one row per agent code.
+prize_counts keeps each worker's prizes in their prizeCounts order, with
+the amount in dollars (cents included) for sums. Ad-hoc questions are plain SQL:
+
+    -- prize totals per district
+    SELECT w.district, SUM(p.amount * p.count) FROM workers w
+    JOIN prize_counts p ON p.worker_id = w.id GROUP BY w.district;
+
+    -- agents with more than 20 tickets
+    SELECT * FROM agents WHERE tickets > 20 ORDER BY tickets DESC;
+
+The database is built in a temp file in one transaction, indexed once the
+rows are in, and renamed over the old one, so readers never see it half
+written.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from extract_summary import prize_value
+from json_stream import temp_path_for
+
+PLAYER_DB_VERSION = 2
+DEFAULT_DB_FILE = 'extracted_data.sqlite'
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE groups (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    group_no TEXT NOT NULL,
+    name TEXT NOT NULL,
+    district TEXT NOT NULL,
+    campaign TEXT,
+    description TEXT NOT NULL,
+    icon TEXT NOT NULL,
+    total_workers INTEGER NOT NULL,
+    total_tickets INTEGER NOT NULL
+);
+CREATE TABLE workers (
+    id INTEGER PRIMARY KEY,
+    group_id TEXT NOT NULL REFERENCES groups (id),
+    employee_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tickets INTEGER NOT NULL,
+    group_no TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    agency_code TEXT NOT NULL,
+    district TEXT NOT NULL,
+    total_prize_amount REAL NOT NULL,
+    draw_key TEXT NOT NULL
+);
+CREATE TABLE agents (
+    agent TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    agency_code TEXT NOT NULL,
+    district TEXT NOT NULL,
+    workers INTEGER NOT NULL,
+    tickets INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE prize_counts (
+    worker_id INTEGER NOT NULL REFERENCES workers (id),
+    position INTEGER NOT NULL,
+    prize TEXT NOT NULL,
+    label TEXT NOT NULL,
+    amount REAL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (worker_id, position)
+) WITHOUT ROWID;
+"""
+
+# Created after the bulk load; building an index once is faster than updating it per row
+INDEXES = """
+CREATE INDEX groups_position ON groups (position);
+CREATE INDEX workers_group ON workers (group_id);
+CREATE INDEX workers_employee ON workers (employee_id);
+CREATE INDEX workers_district ON workers (district, tickets);
+CREATE INDEX workers_tickets ON workers (tickets);
+CREATE INDEX workers_agent ON workers (agent);
+CREATE INDEX agents_tickets ON agents (tickets);
+CREATE INDEX prize_counts_prize ON prize_counts (prize, count);
+"""
+
+def _group_rows(js_groups):
+    for position, (group_id, group) in enumerate(js_groups.items()):
+        yield (group_id, position, group['groupNo'], group['name'], group['district'], group.get('campaign'),
+               group['description'], group['icon'], len(group['workers']),
+               sum(worker['tickets'] for worker in group['workers']))
+
+def _worker_rows(js_groups, draw_key, prize_labels, prize_rows):
+    """Worker rows, appending each worker's prize_counts rows to prize_rows as it goes"""
+
+    worker_id = 0
+    for group_id, group in js_groups.items():
+        for worker in group['workers']:
+            worker_id += 1
+            for position, (prize, count) in enumerate((worker.get('prizeCounts') or {}).items()):
+                prize_rows.append((worker_id, position, prize, prize_labels.get(prize, prize), prize_value(prize), count))
+            yield (worker_id, group_id, worker['employeeId'], worker['name'], worker['tickets'], worker['groupNo'],
+                   worker['agent'], worker['agencyCode'], worker['district'], worker['totalPrizeAmount'],
+                   draw_key(group, worker))
+
+def _agent_rows(js_groups):
+    """One row per agent code; name, agency code and district come from the agent's first worker"""
+
+    agents = {}
+    for group in js_groups.values():
+        for worker in group['workers']:
+            if not worker['agent']:
+                continue
+            row = agents.get(worker['agent'])
+            if row is None:
+                agents[worker['agent']] = [worker['agent'], worker['name'], worker['agencyCode'], worker['district'],
+                                           1, worker['tickets']]
+            else:
+                row[4] += 1
+                row[5] += worker['tickets']
+    return agents.values()
+
+def write_player_database(js_groups, db_path, revision, draw_key, prize_labels):
+    """Write the groups to a new SQLite database at db_path
+
+    draw_key(group, worker) is the key the drawing page finds a worker's
+    preset results under and prize_labels maps prize keys to the labels it
+    shows (simple_extract.draw_key and PRIZE_LABELS). revision is the
+    data/delta.json revision the groups were published as.
+    """
+
+    tmp_path = temp_path_for(db_path)
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        # A fresh file that is renamed into place only once complete needs no journal
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        with connection:
+            connection.executemany("INSERT INTO meta VALUES (?, ?)",
+                                   [('version', str(PLAYER_DB_VERSION)), ('revision', str(revision))])
+            connection.executemany("INSERT INTO groups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _group_rows(js_groups))
+            prize_rows = []
+            connection.executemany("INSERT INTO workers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   _worker_rows(js_groups, draw_key, prize_labels, prize_rows))
+            connection.executemany("INSERT INTO prize_counts VALUES (?, ?, ?, ?, ?, ?)", prize_rows)
+            connection.executemany("INSERT INTO agents VALUES (?, ?, ?, ?, ?, ?)", _agent_rows(js_groups))
+        connection.executescript(INDEXES)
+        connection.execute("ANALYZE")
+        connection.close()
+    except BaseException:
+        connection.close()
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, db_path)
+
+def read_database_revision(db_path):
+    """The revision a database was written at, or None if there is no readable database of this version"""
+
+    if not os.path.exists(db_path):
+        return None
+    try:
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    if meta.get('version') != str(PLAYER_DB_VERSION):
+        return None
+    return int(meta['revision'])
+
+class PlayerDatabase:
+    """Read-only queries for the HTTP API
+
+    Each thread keeps its own connection. A connection is reopened when
+    the database file is replaced, so a server picks up a new extraction
+    without restarting.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = os.path.abspath(db_path)
+        self.local = threading.local()
+
+    def connection(self):
+        stat = os.stat(self.db_path)
+        marker = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if getattr(self.local, 'marker', None) != marker:
+            if getattr(self.local, 'connection', None) is not None:
+                self.local.connection.close()
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            connection.row_factory = sqlite3.Row
+            self.local.connection = connection
+            self.local.marker = marker
+        return self.local.connection
+
+    def revision(self):
+        return int(self.connection().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0])
+
+    def groups(self):
+        """Every group as it appears in data/manifest.json, without the file paths"""
+
+        groups = []
+        for row in self.connection().execute("SELECT * FROM groups ORDER BY position"):
+            group = {'id': row['id'], 'name': row['name'], 'groupNo': row['group_no'], 'district': row['district'],
+                     'icon': row['icon'], 'description': row['description']}
+            if row['campaign'] is not None:
+                group['campaign'] = row['campaign']
+            group['totalWorkers'] = row['total_workers']
+            group['totalTickets'] = row['total_tickets']
+            groups.append(group)
+        return groups
+
+    def _prize_counts(self, worker_ids):
+        prize_counts = {worker_id: [] for worker_id in worker_ids}
+        if worker_ids:
+            placeholders = ', '.join('?' * len(worker_ids))
+            for row in self.connection().execute(
+                    f"SELECT worker_id, prize, label, count FROM prize_counts "
+                    f"WHERE worker_id IN ({placeholders}) ORDER BY worker_id, position", worker_ids):
+                prize_counts[row['worker_id']].append((row['prize'], row['label'], row['count']))
+        return prize_counts
+
+    @staticmethod
+    def _player(row, prize_counts):
+        """A worker as it appears in its group's shard, plus its group ID"""
+
+        return {
+            'name': row['name'],
+            'tickets': row['tickets'],
+            'employeeId': row['employee_id'],
+            'groupNo': row['group_no'],
+            'agent': row['agent'],
+            'agencyCode': row['agency_code'],
+            'district': row['district'],
+            'prizeCounts': {prize: count for prize, _, count in prize_counts},
+            'totalPrizeAmount': row['total_prize_amount'],
+            'groupId': row['group_id'],
+        }
+
+    def players(self, group_id=None, district=None, min_tickets=None, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """One page of players in data order, optionally filtered; pages count from 1"""
+
+        if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page must be at least 1 and pageSize between 1 and {MAX_PAGE_SIZE}")
+        conditions = []
+        params = []
+        for condition, value in (('group_id = ?', group_id), ('district = ?', district), ('tickets >= ?', min_tickets)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = self.connection()
+        total = connection.execute(f"SELECT COUNT(*) FROM workers{where}", params).fetchone()[0]
+        rows = connection.execute(f"SELECT * FROM workers{where} ORDER BY id LIMIT ? OFFSET ?",
+                                  params + [page_size, (page - 1) * page_size]).fetchall()
+        prize_counts = self._prize_counts([row['id'] for row in rows])
+        return {
+            'page': page,
+            'pageSize': page_size,
+            'total': total,
+            'players': [self._player(row, prize_counts[row['id']]) for row in rows],
+        }
+
+    def player_preset(self, employee_id, group_id=None):
+        """A player with its preset results, or None if there is no such player
+
+        The preset is the player's entry in its group's draw index
+        (data/draw/<group-id>.json): its draw key, preset results and
+        starting player state.
+        """
+
+        query = "SELECT * FROM workers WHERE employee_id = ?"
+        params = [employee_id]
+        if group_id is not None:
+            query += " AND group_id = ?"
+            params.append(group_id)
+        row = self.connection().execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        prize_counts = self._prize_counts([row['id']])[row['id']]
+        preset_results = {label: count for _, label, count in prize_counts}
+        tickets = sum(preset_results.values())
+        return {
+            'player': self._player(row, prize_counts),
+            'drawKey': row['draw_key'],
+            'presetResults': preset_results,
+            'playerState': {'name': row['name'] or row['employee_id'] or 'Unknown', 'tickets': tickets,
+                            'remaining': tickets, 'totalWinnings': 0},
+        }
+
+def dumps_api_response(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Prize allocation for the AIA Lucky Draw System
+Deals the Lay See prizes of a campaign to its tickets in Python instead of
+recalculating the .xlsm (run with simple_extract.py --allocate). Each
+ticket-holding agent of the Generation sheet keeps their ticket count; the
+amounts in its Lay See column are ignored and every ticket is given one
+prize from a quota table instead:
+
+    {"$20": 30000, "$50": 40000, "$100": 18000, "$200": 8000, "$500": 3000, "$1000": 1000}
+
+The quotas must add up to the number of tickets, so every tier is handed
+out exactly as often as listed; a "$0" tier covers tickets that win
+nothing. The prizes are laid out tier by tier, shuffled with NumPy's
+default generator seeded with the given seed, and dealt to the agents'
+tickets in sheet order. Each agent's prize histogram is then counted with
+one bincount per batch of about a million tickets. The same tickets,
+quotas and seed always give the same allocation (with the same NumPy
+version).
+
+The result replaces the Generation sheet's workers (a WorkersByGroup of
+WorkerRecords), so it goes through generate_javascript_data and the rest
+of the output unchanged. Its sheet_totals are those of the quota table, so
+the summary reconciles the workers' totals against the quotas.
+"""
+
+import json
+
+from extract_records import SheetTotals, WorkerRecord, WorkersByGroup, intern
+from extract_summary import prize_value
+
+# Tickets counted per bincount; bounds the temporary arrays to a few MB
+BATCH_TICKETS = 1 << 20
+
+class AllocationError(ValueError):
+    """Raised for a quota table that cannot be dealt to the tickets"""
+
+def prize_key(amount):
+    """The "$50" / "$12.50" key simple_extract.py gives a prize amount"""
+
+    return intern(f"${int(amount)}" if amount == int(amount) else f"${amount:.2f}")
+
+def parse_prize_quotas(quotas):
+    """[(amount, count), ...] in order of amount from a {prize: count} table"""
+
+    if not isinstance(quotas, dict) or not quotas:
+        raise AllocationError("Prize quotas must be a JSON object of prize amounts and counts")
+    tiers = {}
+    for prize, count in quotas.items():
+        amount = prize_value(str(prize))
+        if amount is None or amount < 0:
+            raise AllocationError(f"Prize quota {prize!r} is not a prize amount")
+        if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+            raise AllocationError(f"Prize quota for {prize} must be a whole number of prizes, got {count!r}")
+        if amount in tiers:
+            raise AllocationError(f"Prize amount {prize} is listed twice")
+        tiers[amount] = count
+    return sorted(tiers.items())
+
+def load_prize_quotas(path):
+    """Quota table of a JSON file, as parse_prize_quotas returns it"""
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            quotas = json.load(f)
+    except OSError as e:
+        raise AllocationError(f"Cannot read prize quotas {path}: {e}")
+    except ValueError as e:
+        raise AllocationError(f"Prize quotas {path} are not valid JSON: {e}")
+    return parse_prize_quotas(quotas)
+
+def allocate_prize_counts(ticket_counts, tiers, seed):
+    """Deal the tiers' prizes to tickets; returns an (agents x tiers) array of prize counts
+
+    ticket_counts holds each agent's number of tickets, tiers is
+    [(amount, count), ...]. Row i counts the prizes of agent i per tier;
+    every column adds up to its tier's count.
+    """
+
+    import numpy as np
+
+    ticket_counts = np.asarray(ticket_counts, dtype=np.int64)
+    tier_counts = np.array([count for _, count in tiers], dtype=np.int64)
+    total_tickets = int(ticket_counts.sum())
+    if int(tier_counts.sum()) != total_tickets:
+        raise AllocationError(f"Prize quotas add up to {int(tier_counts.sum())} prizes but there are "
+                              f"{total_tickets} tickets; add a \"$0\" tier for tickets without a prize")
+
+    # One tier index per ticket, shuffled; agent i's tickets are the slice
+    # starting at ticket_offsets[i]
+    tier_dtype = np.uint8 if len(tiers) <= 256 else np.int32
+    prizes = np.repeat(np.arange(len(tiers), dtype=tier_dtype), tier_counts)
+    np.random.default_rng(seed).shuffle(prizes)
+    ticket_offsets = np.concatenate(([0], np.cumsum(ticket_counts)))
+
+    agent_count = len(ticket_counts)
+    tier_count = len(tiers)
+    prize_counts = np.zeros((agent_count, tier_count), dtype=np.int64)
+    first_agent = 0
+    while first_agent < agent_count:
+        # Whole agents, about BATCH_TICKETS tickets (at least one agent) per batch
+        end_agent = int(np.searchsorted(ticket_offsets, ticket_offsets[first_agent] + BATCH_TICKETS, side='right')) - 1
+        end_agent = min(max(end_agent, first_agent + 1), agent_count)
+        start, end = ticket_offsets[first_agent], ticket_offsets[end_agent]
+        batch_agents = np.repeat(np.arange(end_agent - first_agent, dtype=np.int64), ticket_counts[first_agent:end_agent])
+        cells = batch_agents * tier_count + prizes[start:end]
+        prize_counts[first_agent:end_agent] = np.bincount(
+            cells, minlength=(end_agent - first_agent) * tier_count).reshape(-1, tier_count)
+        first_agent = end_agent
+    return prize_counts
+
+def allocate_generation_prizes(workers_data, tiers, seed):
+    """Workers of the Generation sheet with prizes dealt from the quota tiers instead of its amounts
+
+    workers_data is what process_generation_data returns (WorkerRecords by
+    group number and agent name, in sheet order); only their ticket counts
+    are used. Returns a WorkersByGroup in the same order, whose
+    sheet_totals hold the quota table's totals.
+    """
+
+    workers = [worker for group_workers in workers_data.values() for worker in group_workers.values()]
+    prize_counts = allocate_prize_counts([worker.tickets for worker in workers], tiers, seed)
+
+    sheet_totals = SheetTotals()
+    sheet_totals.rows = sum(worker.tickets for worker in workers)
+    sheet_totals.prize_amount = float(sum(amount * count for amount, count in tiers))
+    allocated = WorkersByGroup(sheet_totals=sheet_totals)
+
+    keys = [prize_key(amount) if amount > 0 else None for amount, _ in tiers]
+    amounts = [amount for amount, _ in tiers]
+    for worker, counts in zip(workers, prize_counts.tolist()):
+        group_no = worker.group_no
+        record = WorkerRecord(worker.name, group_no, tickets=worker.tickets)
+        for key, amount, count in zip(keys, amounts, counts):
+            if count and key is not None:
+                record.prize_counts[key] = count
+                record.total_prize_amount += amount * count
+        allocated.setdefault(group_no, {})[worker.name] = record
+
+        group_totals = sheet_totals.groups.get(group_no)
+        if group_totals is None:
+            group_totals = sheet_totals.groups[group_no] = [0, 0]
+        group_totals[0] += worker.tickets
+        group_totals[1] += record.total_prize_amount
+    return allocated
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Player search index for the AIA Lucky Draw System
+Built per group at extraction time so the player-selection page answers a
+search from the matching postings instead of scanning every worker.
+
+Each worker is indexed on its name, agent code and agency code, normalized
+to lower case with runs of whitespace collapsed to one space. Postings are
+sorted lists of positions in the group's "workers" list:
+
+    {
+      "version": 1,
+      "gramSize": 3,
+      "prefixLength": 2,
+      "grams": {"ha ": [0, 4], ...},    # every 3-character substring of a field
+      "prefixes": {"h": [0, 4, 9], ...} # 1- and 2-character token prefixes
+    }
+
+A query of gramSize characters or more intersects the postings of its
+3-grams and checks the (few) candidates for the full substring, giving the
+same results as a substring scan. Shorter queries are answered from the
+token prefix postings, matching workers with a name word or code starting
+with the query.
+"""
+
+SEARCH_INDEX_VERSION = 1
+GRAM_SIZE = 3
+PREFIX_LENGTH = 2
+
+# Worker fields a search matches against
+SEARCH_FIELDS = ('name', 'agent', 'agencyCode')
+
+def normalize_search_text(text):
+    """Lower case with runs of whitespace collapsed to one space"""
+
+    return ' '.join(str(text).lower().split())
+
+def generate_search_index(workers):
+    """Build the gram and prefix postings for one group's workers"""
+
+    grams = {}
+    prefixes = {}
+    for position, worker in enumerate(workers):
+        # Dicts rather than sets keep first-seen order, so the index (and the
+        # file it is written to) is the same on every run
+        worker_grams = {}
+        worker_prefixes = {}
+        for field in SEARCH_FIELDS:
+            text = normalize_search_text(worker.get(field) or '')
+            for start in range(len(text) - GRAM_SIZE + 1):
+                worker_grams[text[start:start + GRAM_SIZE]] = None
+            for token in text.split(' '):
+                for length in range(1, min(PREFIX_LENGTH, len(token)) + 1):
+                    worker_prefixes[token[:length]] = None
+
+        # Positions are visited in order, so every posting list stays sorted
+        for gram in worker_grams:
+            grams.setdefault(gram, []).append(position)
+        for prefix in worker_prefixes:
+            prefixes.setdefault(prefix, []).append(position)
+
+    return {
+        'version': SEARCH_INDEX_VERSION,
+        'gramSize': GRAM_SIZE,
+        'prefixLength': PREFIX_LENGTH,
+        'grams': grams,
+        'prefixes': prefixes,
+    }
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Static file server for the AIA Lucky Draw System kiosks
+Replaces `python -m http.server`. Each connection gets its own thread and
+connections are kept alive between requests. Every response carries an
+ETag and Last-Modified, and a conditional request for an unchanged file is
+answered with 304 and no body.
+
+For clients that accept it, a data file is sent as its precompressed .br or
+.gz sibling written by simple_extract.py --compact. Other small text files
+are gzipped once in memory. Files up to MAX_CACHED_FILE_BYTES are kept in
+memory, so many kiosks reloading at once are served without disk reads.
+A cached file is checked against the disk (one stat) on every request and
+reloaded when it changes, e.g. when simple_extract.py --watch republishes
+data/.
+
+With --db, the SQLite database written by simple_extract.py --sqlite is
+also served as JSON (see player_db.py):
+
+    /api/groups                             every group with its totals
+    /api/players?page=1&pageSize=50         players in data order; filter with
+                                            group=, district= and minTickets=
+    /api/players/<employeeId>?group=<id>    one player with its preset results
+
+With --ledger, draws are recorded in the draw ledger (see draw_ledger.py),
+.ledger/draws.log under the root by default:
+
+    POST /api/draws                         record a draw: 201, or 409 with the
+                                            earlier draw if the player was drawn
+    /api/draws?since=<seq>                  draws recorded after seq
+    /api/draws/<groupId>/<employeeId>       one player's draw, 404 if not drawn
+
+Usage: python3 serve.py [port] [--bind=address] [--root=directory] [--cache-mb=N] [--db[=path]] [--ledger[=path]] [--quiet]
+"""
+
+import email.utils
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import sqlite3
+import sys
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from draw_ledger import DEFAULT_LEDGER_PATH, DrawLedger, LedgerError
+from player_db import DEFAULT_DB_FILE, DEFAULT_PAGE_SIZE, PlayerDatabase, dumps_api_response
+from simple_extract import split_cli_flags
+
+DEFAULT_PORT = 8000
+
+# Command line options: --name=value, --name or --name=value, and --name
+VALUE_OPTIONS = ('bind', 'root', 'cache-mb')
+OPTIONAL_VALUE_OPTIONS = ('db', 'ledger')
+FLAG_OPTIONS = ('quiet',)
+
+# In-memory cache bounds; larger files are streamed from disk on each request
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+MAX_CACHED_FILE_BYTES = 8 * 1024 * 1024
+
+# Largest request body accepted (a draw submission is well under 1 KB)
+MAX_REQUEST_BODY_BYTES = 64 * 1024
+
+# Seconds an idle keep-alive connection is held open
+KEEP_ALIVE_TIMEOUT = 30
+
+# Connections waiting to be accepted; the socketserver default of 5 drops
+# connections when a room full of kiosks reloads at once
+REQUEST_QUEUE_SIZE = 128
+
+# Precompressed siblings, in order of preference
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+# Compressed in memory when no precompressed sibling exists
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Pages, scripts and data change between deployments without changing name,
+# so browsers must revalidate them (a cheap 304); images and fonts may be reused
+REVALIDATE_EXTENSIONS = ('.html', '.js', '.css', '.json')
+STATIC_MAX_AGE = 3600
+
+CONTENT_TYPES = {
+    '.js': 'text/javascript',
+    '.json': 'application/json',
+    '.html': 'text/html',
+    '.css': 'text/css',
+    '.svg': 'image/svg+xml',
+}
+
+def content_type_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    content_type = CONTENT_TYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type == 'application/json':
+        content_type += '; charset=utf-8'
+    return content_type
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q=0 excluded)"""
+
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if coding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            encodings.add(coding.lower())
+    if 'x-gzip' in encodings:
+        encodings.add('gzip')
+    return encodings
+
+class StaticFile:
+    """One file's bytes (when cached) and validators"""
+
+    __slots__ = ('path', 'size', 'mtime_ns', 'inode', 'etag', 'last_modified', 'body', 'gzip_body')
+
+    def __init__(self, path, stat, body=None, gzip_body=None):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.inode = stat.st_ino
+        self.body = body
+        self.gzip_body = gzip_body
+        if body is not None:
+            # Content-based, so rewriting a file with the same bytes keeps its ETag
+            self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        else:
+            self.etag = f'"{self.inode:x}-{self.size:x}-{self.mtime_ns:x}"'
+        self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+    def matches(self, stat):
+        return (self.size, self.mtime_ns, self.inode) == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def cost(self):
+        return (len(self.body) if self.body is not None else 0) + (len(self.gzip_body) if self.gzip_body is not None else 0)
+
+class Representation:
+    """What a response sends: a StaticFile, or its in-memory gzip, under one content coding"""
+
+    __slots__ = ('file', 'encoding', 'content_type', 'body', 'etag', 'last_modified')
+
+    def __init__(self, static_file, encoding, content_type, last_modified):
+        self.file = static_file
+        self.encoding = encoding
+        self.content_type = content_type
+        self.last_modified = last_modified
+        if encoding == 'gzip' and static_file.gzip_body is not None:
+            self.body = static_file.gzip_body
+            self.etag = static_file.etag[:-1] + '-gzip"'
+        else:
+            self.body = static_file.body
+            self.etag = static_file.etag
+
+    @property
+    def length(self):
+        return len(self.body) if self.body is not None else self.file.size
+
+class StaticFiles:
+    """Files under a root directory, with the hot ones held in memory (least recently used evicted)"""
+
+    def __init__(self, root, max_cache_bytes=MAX_CACHE_BYTES, max_file_bytes=MAX_CACHED_FILE_BYTES):
+        self.root = os.path.realpath(root)
+        self.max_cache_bytes = max_cache_bytes
+        self.max_file_bytes = max_file_bytes
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, url_path):
+        """File path for a URL path, or None if it is outside the root or hidden"""
+
+        path = posixpath.normpath(urllib.parse.unquote(url_path))
+        parts = [part for part in path.split('/') if part]
+        # Dot files and directories (.git, .extract_cache) are never served
+        if any(part.startswith('.') or '\\' in part or '\0' in part for part in parts):
+            return None
+        file_path = os.path.realpath(os.path.join(self.root, *parts))
+        if file_path != self.root and not file_path.startswith(self.root + os.sep):
+            return None
+        return file_path
+
+    def _load(self, path, stat):
+        if stat.st_size > self.max_file_bytes:
+            return StaticFile(path, stat)
+        with open(path, 'rb') as f:
+            body = f.read()
+        # The file may have been replaced between stat and read; validate against what was read
+        stat = os.stat(path)
+        if len(body) != stat.st_size:
+            return StaticFile(path, stat)
+        gzip_body = None
+        content_type = content_type_for(path)
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(body) > 1024:
+            compressed = gzip.compress(body, compresslevel=6, mtime=0)
+            if len(compressed) < len(body):
+                gzip_body = compressed
+        return StaticFile(path, stat, body, gzip_body)
+
+    def get(self, path, stat):
+        """StaticFile for path at stat, from memory if it is cached and unchanged"""
+
+        with self.lock:
+            static_file = self.cache.get(path)
+            if static_file is not None and static_file.matches(stat):
+                self.cache.move_to_end(path)
+                return static_file
+
+        static_file = self._load(path, stat)
+        if static_file.body is None:
+            return static_file
+
+        with self.lock:
+            old = self.cache.pop(path, None)
+            if old is not None:
+                self.cache_bytes -= old.cost()
+            self.cache[path] = static_file
+            self.cache_bytes += static_file.cost()
+            while self.cache_bytes > self.max_cache_bytes and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.cache_bytes -= evicted.cost()
+        return static_file
+
+    def representation(self, path, encodings):
+        """Best Representation of a regular file for the accepted encodings, or None if there is no such file"""
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        content_type = content_type_for(path)
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+        # A sibling older than the file was left by an earlier run; never serve it
+        for encoding, suffix in PRECOMPRESSED_VARIANTS:
+            if encoding not in encodings:
+                continue
+            try:
+                variant_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+                return Representation(self.get(path + suffix, variant_stat), encoding, content_type, last_modified)
+
+        static_file = self.get(path, stat)
+        encoding = 'gzip' if 'gzip' in encodings and static_file.gzip_body is not None else None
+        return Representation(static_file, encoding, content_type, static_file.last_modified)
+
+class StaticRequestHandler(BaseHTTPRequestHandler):
+    """GET and HEAD for files under the server's root, plus the /api/ of --db and --ledger"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AIALuckyDraw'
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def do_POST(self):
+        url_path = urllib.parse.urlsplit(self.path).path
+        length = self.headers.get('Content-Length')
+        if length is None or not length.isdigit() or int(length) > MAX_REQUEST_BODY_BYTES:
+            # The body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            self.send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE if length and length.isdigit() else HTTPStatus.LENGTH_REQUIRED)
+            return
+        body = self.rfile.read(int(length))
+        if url_path != '/api/draws' or self.server.ledger is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        try:
+            recorded, draw = self.server.ledger.record_draw(json.loads(body))
+        except ValueError as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except LedgerError as e:
+            self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+            return
+        self.send_json({'draw': draw}, status=HTTPStatus.CREATED if recorded else HTTPStatus.CONFLICT)
+
+    def serve(self, send_body):
+        url = urllib.parse.urlsplit(self.path)
+        url_path = url.path
+        if url_path.startswith('/api/draws') and self.server.ledger is not None:
+            self.serve_draws(url_path, urllib.parse.parse_qs(url.query), send_body)
+            return
+        if url_path.startswith('/api/') and self.server.database is not None:
+            self.serve_api(url_path, urllib.parse.parse_qs(url.query), send_body)
+            return
+        files = self.server.files
+        path = files.resolve(url_path)
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if os.path.isdir(path):
+            if not url_path.endswith('/'):
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header('Location', url_path + '/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            path = os.path.join(path, 'index.html')
+
+        representation = files.representation(path, accepted_encodings(self.headers.get('Accept-Encoding', '')))
+        if representation is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        if self.not_modified(representation):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_validators(path, representation)
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', representation.content_type)
+        self.send_header('Content-Length', str(representation.length))
+        if representation.encoding:
+            self.send_header('Content-Encoding', representation.encoding)
+        self.send_validators(path, representation)
+        self.end_headers()
+        if not send_body:
+            return
+        if representation.body is not None:
+            self.wfile.write(representation.body)
+        else:
+            with open(representation.file.path, 'rb') as f:
+                self.connection.sendfile(f, count=representation.file.size)
+
+    def serve_api(self, url_path, query, send_body):
+        database = self.server.database
+        parts = [urllib.parse.unquote(part) for part in url_path.split('/')[2:]]
+        def param(name):
+            return query[name][-1] if name in query else None
+
+        try:
+            if parts == ['groups']:
+                data = {'groups': database.groups()}
+            elif parts == ['players']:
+                min_tickets = param('minTickets')
+                data = database.players(
+                    group_id=param('group'), district=param('district'),
+                    min_tickets=int(min_tickets) if min_tickets is not None else None,
+                    page=int(param('page') or 1), page_size=int(param('pageSize') or DEFAULT_PAGE_SIZE))
+            elif len(parts) == 2 and parts[0] == 'players' and parts[1]:
+                data = database.player_preset(parts[1], param('group'))
+                if data is None:
+                    self.send_error(HTTPStatus.NOT_FOUND, f"No player {parts[1]}")
+                    return
+            else:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+        except ValueError as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except (OSError, sqlite3.Error) as e:
+            self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, f"Database unavailable: {e}")
+            return
+        self.send_json(data, send_body)
+
+    def serve_draws(self, url_path, query, send_body):
+        ledger = self.server.ledger
+        parts = [urllib.parse.unquote(part) for part in url_path.split('/')[3:]]
+        if not parts:
+            since = query.get('since', ['0'])[-1]
+            if not since.isdigit():
+                self.send_error(HTTPStatus.BAD_REQUEST, "since must be a sequence number")
+                return
+            draws = ledger.records_since(int(since))
+            self.send_json({'seq': int(since) + len(draws), 'draws': draws}, send_body)
+        elif len(parts) == 2 and all(parts):
+            draw = ledger.lookup(parts[0], parts[1])
+            if draw is None:
+                self.send_error(HTTPStatus.NOT_FOUND, f"{parts[1]} has not been drawn")
+                return
+            self.send_json({'draw': draw}, send_body)
+        else:
+            self.send_error(HTTPStatus.NOT_FOUND)
+
+    def send_json(self, data, send_body=True, status=HTTPStatus.OK):
+        """Send an API response; a GET for a 200 response the client already has gets a 304"""
+
+        body = dumps_api_response(data).encode('utf-8')
+        etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        if_none_match = self.headers.get('If-None-Match')
+        if (status == HTTPStatus.OK and if_none_match is not None
+                and etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+        encoding = None
+        if len(body) > 1024 and 'gzip' in accepted_encodings(self.headers.get('Accept-Encoding', '')):
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            encoding = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def not_modified(self, representation):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # Weak comparison, as RFC 9110 requires for If-None-Match
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or representation.etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            return if_modified_since == representation.last_modified or self._not_modified_since(if_modified_since, representation)
+        return False
+
+    def _not_modified_since(self, header, representation):
+        try:
+            since = email.utils.parsedate_to_datetime(header)
+            modified = email.utils.parsedate_to_datetime(representation.last_modified)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and modified <= since
+
+    def send_validators(self, path, representation):
+        self.send_header('ETag', representation.etag)
+        self.send_header('Last-Modified', representation.last_modified)
+        self.send_header('Vary', 'Accept-Encoding')
+        if path.lower().endswith(REVALIDATE_EXTENSIONS):
+            self.send_header('Cache-Control', 'no-cache')
+        else:
+            self.send_header('Cache-Control', f'max-age={STATIC_MAX_AGE}')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class KioskServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the StaticFiles, PlayerDatabase and DrawLedger it serves"""
+
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+    def __init__(self, address, files, database=None, ledger=None, quiet=False):
+        self.files = files
+        self.database = database
+        self.ledger = ledger
+        self.quiet = quiet
+        super().__init__(address, StaticRequestHandler)
+
+def usage():
+    return __doc__[__doc__.index('Usage:'):].rstrip()
+
+if __name__ == "__main__":
+    args, flags = split_cli_flags(sys.argv[1:])
+
+    if 'help' in flags or '-h' in args:
+        print(usage())
+        sys.exit(0)
+    # A mistyped --ledger would otherwise start a server that cannot refuse a second draw
+    invalid = [f"--{name}" for name in flags if name not in VALUE_OPTIONS + OPTIONAL_VALUE_OPTIONS + FLAG_OPTIONS]
+    invalid += [f"--{name} needs a value" for name in VALUE_OPTIONS if flags.get(name) is True]
+    invalid += [f"--{name} takes no value" for name in FLAG_OPTIONS if isinstance(flags.get(name), str)]
+    invalid += [f"unexpected argument {arg}" for arg in args[1:]]
+    try:
+        port = int(args[0]) if args else DEFAULT_PORT
+        max_cache_bytes = int(float(flags['cache-mb']) * 1024 * 1024) if 'cache-mb' in flags else MAX_CACHE_BYTES
+    except (ValueError, TypeError):
+        invalid.append("port and --cache-mb must be numbers")
+    if invalid:
+        print(f"Invalid options: {', '.join(invalid)}")
+        print(usage())
+        sys.exit(1)
+    root = flags['root'] if 'root' in flags else os.path.dirname(os.path.abspath(__file__))
+
+    files = StaticFiles(root, max_cache_bytes)
+    database = None
+    if 'db' in flags:
+        db_path = flags['db'] if isinstance(flags['db'], str) else os.path.join(root, DEFAULT_DB_FILE)
+        if not os.path.exists(db_path):
+            print(f"Database not found: {db_path} (write it with simple_extract.py --sqlite)")
+            sys.exit(1)
+        database = PlayerDatabase(db_path)
+    ledger = None
+    if 'ledger' in flags:
+        try:
+            ledger = DrawLedger(flags['ledger'] if isinstance(flags['ledger'], str) else os.path.join(root, DEFAULT_LEDGER_PATH))
+        except LedgerError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    server = KioskServer((flags['bind'] if 'bind' in flags else '', port), files, database, ledger, quiet='quiet' in flags)
+    print(f"Serving {files.root} on http://{flags.get('bind') or 'localhost'}:{port}/ (Ctrl+C to stop)")
+    if database is not None:
+        print(f"Player API at /api/ from {database.db_path}")
+    if ledger is not None:
+        print(f"Draw ledger at /api/draws: {ledger.path} ({len(ledger.records)} draws recorded)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        server.server_close()
+        if ledger is not None:
+            ledger.close()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Columnar sheet snapshots for the AIA Lucky Draw System
+The first parse of a workbook saves the Generation and Eligible Agent sheets
+as dictionary-encoded columns, so later runs with a different column mapping
+(or just listing headers) read only the columns they need instead of the .xlsm
+"""
+
+import datetime
+import json
+import os
+import shutil
+import sys
+from array import array
+
+from extract_cache import CACHE_DIR
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshots')
+
+# Bump when the on-disk layout changes so old snapshots are rebuilt
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Workbook snapshots kept on disk; the least recently used are evicted first
+MAX_SNAPSHOTS = 4
+
+# Column codes are unsigned 32-bit indexes into the column's value dictionary;
+# code 0 is always None (an empty cell)
+CODE_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+class UnsupportedCellValue(ValueError):
+    """Raised when a cell holds a value type the snapshot cannot round-trip"""
+
+def _encode_value(value):
+    """Encode a cell value as JSON, tagging types JSON cannot represent"""
+
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'$time': value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {'$timedelta': value.total_seconds()}
+    raise UnsupportedCellValue(f"Cannot snapshot cell value of type {type(value).__name__}")
+
+def _decode_value(value):
+    """Inverse of _encode_value"""
+
+    if not isinstance(value, dict):
+        return value
+    if '$datetime' in value:
+        return datetime.datetime.fromisoformat(value['$datetime'])
+    if '$date' in value:
+        return datetime.date.fromisoformat(value['$date'])
+    if '$time' in value:
+        return datetime.time.fromisoformat(value['$time'])
+    return datetime.timedelta(seconds=value['$timedelta'])
+
+def _value_key(value):
+    # 1, 1.0 and True compare equal in a dict but must stay distinct cell values
+    return (type(value), value)
+
+def write_sheet_snapshot(snapshot_dir, headers, rows, max_row=None, max_column=None):
+    """Write data rows (every row after the header) as dictionary-encoded columns
+
+    rows yields tuples of cell values; each is truncated or padded to the
+    header width. Raises UnsupportedCellValue for values that cannot be
+    stored faithfully, leaving no snapshot behind.
+    """
+
+    width = len(headers)
+    dictionaries = [[None] for _ in range(width)]
+    lookups = [{_value_key(None): 0} for _ in range(width)]
+    codes = [array(CODE_TYPECODE) for _ in range(width)]
+    row_count = 0
+
+    for row in rows:
+        for col in range(width):
+            value = row[col] if col < len(row) else None
+            key = _value_key(value)
+            code = lookups[col].get(key)
+            if code is None:
+                code = len(dictionaries[col])
+                dictionaries[col].append(_encode_value(value))
+                lookups[col][key] = code
+            codes[col].append(code)
+        row_count += 1
+
+    tmp_dir = f"{snapshot_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for col in range(width):
+        with open(os.path.join(tmp_dir, f"col{col}.codes"), 'wb') as f:
+            codes[col].tofile(f)
+        with open(os.path.join(tmp_dir, f"col{col}.dict.json"), 'w', encoding='utf-8') as f:
+            json.dump(dictionaries[col], f, ensure_ascii=False, separators=(',', ':'))
+
+    meta = {
+        'version': SNAPSHOT_FORMAT_VERSION,
+        'headers': list(headers),
+        'row_count': row_count,
+        'max_row': max_row,
+        'max_column': max_column,
+        'code_typecode': CODE_TYPECODE,
+        'byteorder': sys.byteorder,
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(tmp_dir, snapshot_dir)
+
+class SheetSnapshot:
+    """Read access to one sheet snapshot, loading columns on demand"""
+
+    def __init__(self, snapshot_dir, meta):
+        self.snapshot_dir = snapshot_dir
+        self.headers = meta['headers']
+        self.row_count = meta['row_count']
+        self.max_row = meta['max_row']
+        self.max_column = meta['max_column']
+
+    @classmethod
+    def open(cls, snapshot_dir):
+        """Open a snapshot directory, or return None if it is missing or stale"""
+
+        try:
+            with open(os.path.join(snapshot_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != SNAPSHOT_FORMAT_VERSION or meta.get('byteorder') != sys.byteorder:
+            return None
+        if array(meta['code_typecode']).itemsize != array(CODE_TYPECODE).itemsize:
+            return None
+        return cls(snapshot_dir, meta)
+
+    def _read_column(self, col, limit=None):
+        """Read one column's value dictionary and its first `limit` codes"""
+
+        with open(os.path.join(self.snapshot_dir, f"col{col}.dict.json"), 'r', encoding='utf-8') as f:
+            dictionary = [_decode_value(value) for value in json.load(f)]
+        count = self.row_count if limit is None else min(limit, self.row_count)
+        codes = array(CODE_TYPECODE)
+        with open(os.path.join(self.snapshot_dir, f"col{col}.codes"), 'rb') as f:
+            codes.fromfile(f, count)
+        return dictionary, codes
+
+    def iter_rows(self, column_indices, limit=None):
+        """Yield tuples of the given 0-based columns, reading only those columns"""
+
+        columns = [self._read_column(col, limit) for col in column_indices]
+        decoded = [map(dictionary.__getitem__, codes) for dictionary, codes in columns]
+        return zip(*decoded)
+
+def workbook_snapshot_dir(content_hash, snapshot_root=SNAPSHOT_DIR):
+    return os.path.join(snapshot_root, content_hash)
+
+def read_workbook_manifest(content_hash, snapshot_root=SNAPSHOT_DIR):
+    """Load the snapshot manifest (sheet names and snapshotted sheets) for a workbook, or None"""
+
+    workbook_dir = workbook_snapshot_dir(content_hash, snapshot_root)
+    try:
+        with open(os.path.join(workbook_dir, 'workbook.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+
+    # Mark as recently used for eviction
+    try:
+        os.utime(workbook_dir)
+    except OSError:
+        pass
+    return manifest
+
+def write_workbook_manifest(content_hash, sheetnames, sheets, snapshot_root=SNAPSHOT_DIR, max_snapshots=MAX_SNAPSHOTS):
+    """Record a workbook's sheet names and which sheet each snapshot role holds
+
+    sheets maps a role ('generation', 'eligible') to the sheet name stored
+    under that role's subdirectory, or None if the workbook has no such sheet.
+    Written last, so a manifest only exists once every sheet snapshot does.
+    """
+
+    workbook_dir = workbook_snapshot_dir(content_hash, snapshot_root)
+    manifest = {
+        'version': SNAPSHOT_FORMAT_VERSION,
+        'sheetnames': list(sheetnames),
+        'sheets': dict(sheets),
+    }
+    tmp_path = os.path.join(workbook_dir, f"workbook.json.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(workbook_dir, 'workbook.json'))
+
+    evict_snapshots(snapshot_root, max_snapshots)
+
+def open_sheet_snapshot(content_hash, role, snapshot_root=SNAPSHOT_DIR):
+    return SheetSnapshot.open(os.path.join(workbook_snapshot_dir(content_hash, snapshot_root), role))
+
+def evict_snapshots(snapshot_root=SNAPSHOT_DIR, max_snapshots=MAX_SNAPSHOTS):
+    """Delete the least recently used workbook snapshots beyond max_snapshots"""
+
+    try:
+        names = os.listdir(snapshot_root)
+    except OSError:
+        return
+    entries = []
+    for name in names:
+        path = os.path.join(snapshot_root, name)
+        try:
+            entries.append((os.stat(path).st_mtime, path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    for mtime, path in entries[max_snapshots:]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -1,24 +1,76 @@
 #!/usr/bin/env python3
 """
 Simple Excel Data Extractor for AIA Lucky Draw System
-Uses openpyxl only (no pandas dependency)
+Uses openpyxl only (no pandas dependency). openpyxl and the process pool are
+imported when first needed, so listing a workbook (--inspect) starts without
+them.
 """
 
 import json
+import re
 import sys
 import os
+import time
+import zipfile
+from collections.abc import Mapping
+from functools import partial
+from xml.etree import ElementTree
 
-try:
-    from openpyxl import load_workbook
-except ImportError:
-    print("Error: openpyxl is required. Install it with: pip3 install --user openpyxl")
-    sys.exit(1)
+from agent_join import AGENT_JOIN_FILE, AgentJoin, agent_join_report, describe_agent_join
+from compact_output import dumps_compact, precompressed_variants
+from employee_ids import EMPLOYEE_IDS_FILE, EmployeeIdRegistry
+from extract_cache import cache_entry_path, evict_cache_entries, extraction_cache_key, file_content_hash, load_cached_output
+from extract_records import AgentRecord, GroupRecord, SheetTotals, WorkerRecord, WorkersByGroup, intern
+from extract_stats import NO_STATS, ExtractionStats
+from extract_summary import SUMMARY_FILE, SummaryBuilder, describe_reconciliation, load_summary
+from json_stream import JsonObjectStreamWriter, iter_object_members, temp_path_for
+from output_delta import DELTA_FILE, DeltaLog, diff_group
+from fast_xlsx import FastWorkbook, UnsupportedWorkbookContent, iter_zip_sheet_rows
+from player_db import DEFAULT_DB_FILE, read_database_revision, write_player_database
+from prize_allocation import AllocationError, allocate_generation_prizes, load_prize_quotas
+from search_index import generate_search_index
+from sheet_snapshot import (
+    UnsupportedCellValue,
+    open_sheet_snapshot,
+    read_workbook_manifest,
+    workbook_snapshot_dir,
+    write_sheet_snapshot,
+    write_workbook_manifest,
+)
+from spill_aggregate import GenerationSpill, SpilledWorkersByGroup, parse_memory_budget
+
+def load_workbook(excel_path, **kwargs):
+    """openpyxl.load_workbook, importing openpyxl on first use"""
+    
+    try:
+        from openpyxl import load_workbook as openpyxl_load_workbook
+    except ImportError:
+        print("Error: openpyxl is required. Install it with: pip3 install --user openpyxl")
+        sys.exit(1)
+    return openpyxl_load_workbook(excel_path, **kwargs)
+
+SPREADSHEETML_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+EXCEL_PATH = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/assets/info/20250811 Lucky Money for Special Districts_Final.xlsm"
+OUTPUT_PATH = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/extracted_data.json"
+
+# Seconds between workbook checks in --watch mode
+WATCH_INTERVAL = 2.0
+
+# Data rows shown per sheet when listing a workbook
+PREVIEW_ROWS = 10
 
 def extract_excel_data_simple(excel_path):
     """Extract data from the Excel file using openpyxl only"""
     
     print(f"Reading Excel file: {excel_path}")
     
+    # Serve the listing from a columnar snapshot when a previous run saved one
+    content_hash = file_content_hash(excel_path)
+    manifest = read_workbook_manifest(content_hash)
+    if manifest is not None:
+        return print_snapshot_overview(content_hash, manifest)
+    
     try:
         workbook = load_workbook(excel_path, read_only=True)
         print(f"Available sheets: {workbook.sheetnames}")
@@ -86,248 +138,1017 @@ def extract_excel_data_simple(excel_path):
         print(f"Error reading Excel file: {e}")
         return None
 
-def process_generation_data(excel_path, agent_name_col, group_no_col, lay_see_amount_col):
-    """Process Generation sheet data and count prize amounts"""
+def print_sheet_preview(sheet_name, max_row, max_column, rows):
+    """Print one sheet's size, headers (the first of rows) and data rows"""
     
-    workbook = load_workbook(excel_path, read_only=True)
+    headers = list(rows[0]) if rows else []
+    width = max(max_column or 0, len(headers))
+    headers = [str(cell_value) if cell_value else f"Col{col}" for col, cell_value in enumerate(headers + [None] * (width - len(headers)), start=1)]
     
-    # Look for "Value only" or similar sheet first
-    value_sheet_names = [sheet for sheet in workbook.sheetnames if 'value' in sheet.lower() and 'only' in sheet.lower()]
+    print(f"\n{sheet_name} sheet:")
+    print(f"Max row: {max_row if max_row is not None else 'unknown'}, Max col: {max_column if max_column is not None else 'unknown'}")
+    print(f"Headers: {headers}")
+    
+    print(f"\nFirst {len(rows) - 1 if rows else 0} data rows:")
+    for row, values in enumerate(rows[1:], start=2):
+        values = list(values[:width]) + [None] * (width - len(values))
+        print(f"Row {row}: {[str(cell_value) if cell_value else '' for cell_value in values]}")
+
+def inspect_workbook(excel_path, preview_rows=PREVIEW_ROWS):
+    """Print every sheet's size, headers and first rows, reading only what that takes
+    
+    The workbook manifest, the start of each sheet's XML and the shared
+    strings those rows use are read with the fast reader (fast_xlsx.py);
+    nothing else is parsed, and openpyxl is only loaded for a sheet the fast
+    reader cannot decode (formulas, dates). Returns the sheet names, or
+    None if the file cannot be read.
+    """
+    
+    print(f"Reading Excel file: {excel_path}")
+    try:
+        workbook = FastWorkbook(excel_path)
+    except (OSError, zipfile.BadZipFile, UnsupportedWorkbookContent) as e:
+        print(f"Fast reader cannot open the workbook ({e}), loading it with openpyxl")
+        return extract_excel_data_simple(excel_path)
+    
+    fallback_workbook = None
+    with workbook:
+        print(f"Available sheets: {workbook.sheetnames}")
+        for sheet_name in workbook.sheetnames:
+            max_row, max_column = workbook.sheet_dimension(sheet_name)
+            try:
+                rows = workbook.preview_rows(sheet_name, preview_rows + 1)
+            except UnsupportedWorkbookContent as e:
+                print(f"\n(Reading {sheet_name} with openpyxl: {e})")
+                if fallback_workbook is None:
+                    fallback_workbook = load_workbook(excel_path, read_only=True)
+                ws = fallback_workbook[sheet_name]
+                rows = list(ws.iter_rows(min_row=1, max_row=preview_rows + 1, values_only=True))
+                max_row, max_column = ws.max_row, ws.max_column
+            print_sheet_preview(sheet_name, max_row, max_column, rows)
+    if fallback_workbook is not None:
+        fallback_workbook.close()
+    return workbook.sheetnames
+
+def print_snapshot_overview(content_hash, manifest, preview_rows=PREVIEW_ROWS):
+    """Print sheet names, headers and preview rows from a workbook snapshot"""
+    
+    print(f"Available sheets: {manifest['sheetnames']} (from snapshot)")
+    
+    for role in ('generation', 'eligible'):
+        sheet_name = manifest['sheets'][role]
+        snapshot = open_sheet_snapshot(content_hash, role) if sheet_name else None
+        if snapshot is None:
+            continue
+        
+        print(f"\n{sheet_name} sheet:")
+        print(f"Max row: {snapshot.max_row}, Max col: {snapshot.max_column}")
+        print(f"Headers: {snapshot.headers}")
+        
+        print(f"\nFirst {preview_rows} data rows:")
+        preview = snapshot.iter_rows(range(len(snapshot.headers)), limit=preview_rows)
+        for row, values in enumerate(preview, start=2):
+            row_data = [str(cell_value) if cell_value else "" for cell_value in values]
+            print(f"Row {row}: {row_data}")
+    
+    return manifest['sheetnames']
+
+def read_header_row(ws):
+    """Read the header row of a sheet, naming blank headers Col1, Col2, ..."""
+    
+    first_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    return [str(cell_value) if cell_value else f"Col{col}" for col, cell_value in enumerate(first_row, start=1)]
+
+def iter_mapped_rows(ws, column_indices, min_row=2):
+    """Stream a sheet in one forward pass, yielding only the mapped columns
+    
+    column_indices are 0-based positions in the header row. Each yielded row is
+    a tuple with one value per index, in the order given. Rows shorter than the
+    widest mapped column (trailing empty cells) are padded with None.
+    """
+    
+    width = max(column_indices) + 1
+    padding = (None,) * width
+    for row in ws.iter_rows(min_row=min_row, max_col=width, values_only=True):
+        if len(row) < width:
+            row = row + padding[len(row):]
+        yield tuple(row[idx] for idx in column_indices)
+
+def read_sheet_names(excel_path):
+    """Read sheet names from the workbook manifest without loading any sheet"""
+    
+    with zipfile.ZipFile(excel_path) as archive:
+        root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in root.iter(f"{{{SPREADSHEETML_NS}}}sheet")]
+
+def find_generation_sheet_name(sheetnames):
+    """Pick the "Value only" sheet if the workbook has one, else Generation"""
+    
+    value_sheet_names = [sheet for sheet in sheetnames if 'value' in sheet.lower() and 'only' in sheet.lower()]
     if value_sheet_names:
-        generation_ws = workbook[value_sheet_names[0]]
         print(f"Using value-only sheet: {value_sheet_names[0]}")
-    else:
-        generation_ws = workbook['Generation']
-        print("Using Generation sheet (no value-only sheet found)")
+        return value_sheet_names[0]
+    print("Using Generation sheet (no value-only sheet found)")
+    return 'Generation'
+
+def find_eligible_sheet_name(sheetnames):
+    """Pick the Eligible Agent sheet, or None if the workbook has none"""
     
-    # Get column indices (convert from 1-based to 0-based, or use column names)
-    headers = []
-    for col in range(1, generation_ws.max_column + 1):
-        cell_value = generation_ws.cell(row=1, column=col).value
-        headers.append(str(cell_value) if cell_value else f"Col{col}")
+    eligible_sheets = [sheet for sheet in sheetnames if 'eligible' in sheet.lower() and 'agent' in sheet.lower()]
+    return eligible_sheets[0] if eligible_sheets else None
+
+def resolve_column_indices(headers, column_names, label):
+    """Map column names to 0-based header positions, or None if one is missing"""
     
-    print(f"Generation headers: {headers}")
+    print(f"{label} headers: {headers}")
     
-    # Find column indices
     try:
-        agent_name_idx = headers.index(agent_name_col) + 1
-        group_no_idx = headers.index(group_no_col) + 1
-        lay_see_amount_idx = headers.index(lay_see_amount_col) + 1
+        return tuple(headers.index(column_name) for column_name in column_names)
     except ValueError as e:
         print(f"Column not found: {e}")
-        workbook.close()
-        return {}
+        return None
+
+def parse_prize_amount(lay_see_amount):
+    """Numeric Lay See amount of a cell, 0 if it holds none"""
+    
+    if lay_see_amount and str(lay_see_amount).strip() not in ['None', '', 'null']:
+        try:
+            # Try to extract numeric value
+            return float(str(lay_see_amount).strip())
+        except (ValueError, TypeError):
+            # If still not a number, skip this entry
+            return 0
+    return 0
+
+def aggregate_generation_rows(mapped_rows, row_counts=None, memory_budget=None):
+    """Count tickets and prize amounts per worker from (agent name, group no, lay see amount) rows
     
-    workers_data = {}
+    If row_counts is a dict, rows scanned and skipped are recorded in it.
+    The sheet's own totals are kept in the result's sheet_totals (see
+    extract_summary.py), counted in the same pass.
     
-    # Process each row
-    for row in range(2, generation_ws.max_row + 1):
-        agent_name = generation_ws.cell(row=row, column=agent_name_idx).value
-        group_no = generation_ws.cell(row=row, column=group_no_idx).value
-        lay_see_amount = generation_ws.cell(row=row, column=lay_see_amount_idx).value
-        
+    With memory_budget (bytes), workers beyond the budget are spilled to
+    disk and a SpilledWorkersByGroup is returned, which yields the same
+    groups (see spill_aggregate.py).
+    """
+    
+    sheet_totals = SheetTotals()
+    workers_data = WorkersByGroup(sheet_totals=sheet_totals)
+    prize_keys = {}  # prize amount -> interned "$50" style key
+    rows_scanned = rows_skipped = 0
+    spill = GenerationSpill(memory_budget) if memory_budget else None
+    workers_held = 0
+    
+    for agent_name, group_no, lay_see_amount in mapped_rows:
+        rows_scanned += 1
         if not agent_name or not group_no:
+            rows_skipped += 1
+            # A row with only an amount or only one of the two still counts on the sheet
+            if agent_name or group_no or lay_see_amount is not None:
+                sheet_totals.rows += 1
+                sheet_totals.rows_skipped += 1
+                prize_amount = parse_prize_amount(lay_see_amount)
+                if prize_amount > 0:
+                    sheet_totals.prize_amount += prize_amount
+                    sheet_totals.prize_amount_skipped += prize_amount
             continue
             
         agent_name = str(agent_name).strip()
-        group_no = str(group_no).strip()
+        group_no = intern(str(group_no).strip())
         
         # Process lay_see_amount - should be actual values now
-        prize_amount = 0
-        if lay_see_amount and str(lay_see_amount).strip() not in ['None', '', 'null']:
-            try:
-                # Try to extract numeric value
-                prize_amount = float(str(lay_see_amount).strip())
-            except (ValueError, TypeError):
-                # If still not a number, skip this entry
-                prize_amount = 0
+        prize_amount = parse_prize_amount(lay_see_amount)
+        
+        sheet_totals.rows += 1
+        group_totals = sheet_totals.groups.get(group_no)
+        if group_totals is None:
+            group_totals = sheet_totals.groups[group_no] = [0, 0]
+        group_totals[0] += 1
+        if prize_amount > 0:
+            sheet_totals.prize_amount += prize_amount
+            group_totals[1] += prize_amount
         
         # Create group if not exists
         if group_no not in workers_data:
             workers_data[group_no] = {}
         
         # Create worker if not exists
-        if agent_name not in workers_data[group_no]:
-            workers_data[group_no][agent_name] = {
-                'name': agent_name,
-                'group_no': group_no,
-                'prize_counts': {},  # Count of each prize amount
-                'total_prize_amount': 0,
-                'tickets': 0
-            }
+        worker = workers_data[group_no].get(agent_name)
+        if worker is None:
+            worker = workers_data[group_no][agent_name] = WorkerRecord(agent_name, group_no)
+            workers_held += 1
         
         # Count prize amounts
-        worker = workers_data[group_no][agent_name]
         if prize_amount > 0:
-            prize_key = f"${int(prize_amount)}" if prize_amount == int(prize_amount) else f"${prize_amount:.2f}"
-            if prize_key not in worker['prize_counts']:
-                worker['prize_counts'][prize_key] = 0
-            worker['prize_counts'][prize_key] += 1
-            worker['total_prize_amount'] += prize_amount
+            prize_key = prize_keys.get(prize_amount)
+            if prize_key is None:
+                prize_key = f"${int(prize_amount)}" if prize_amount == int(prize_amount) else f"${prize_amount:.2f}"
+                prize_key = prize_keys[prize_amount] = intern(prize_key)
+            worker.prize_counts[prize_key] = worker.prize_counts.get(prize_key, 0) + 1
+            worker.total_prize_amount += prize_amount
         
-        worker['tickets'] += 1
+        worker.tickets += 1
+        
+        # Over the memory budget: move the partial totals to disk and start afresh
+        if spill is not None and workers_held >= spill.max_workers:
+            spill.write_run(workers_data)
+            workers_data.clear()
+            workers_held = 0
     
-    workbook.close()
+    if spill is not None and spill.run_paths:
+        spill.write_run(workers_data)
+        print(f"Memory budget reached: worker totals spilled to disk in {len(spill.run_paths)} runs")
+        workers_data = SpilledWorkersByGroup(spill, sheet_totals)
+    
+    if row_counts is not None:
+        row_counts.update(rows_scanned=rows_scanned, rows_skipped=rows_skipped)
     return workers_data
 
-def process_eligible_agent_data(excel_path, group_no_col, family_col, agent_col, agent_name_col, agency_code_col, district_col):
-    """Process Eligible Agent sheet data"""
+def aggregate_eligible_rows(mapped_rows, row_counts=None):
+    """Collect family, district and agents per group from Eligible Agent rows
     
-    workbook = load_workbook(excel_path, read_only=True)
-    
-    # Find eligible agent sheet
-    eligible_sheets = [sheet for sheet in workbook.sheetnames if 'eligible' in sheet.lower() and 'agent' in sheet.lower()]
-    if not eligible_sheets:
-        workbook.close()
-        return {}
-    
-    eligible_ws = workbook[eligible_sheets[0]]
-    
-    # Get column indices
-    headers = []
-    for col in range(1, eligible_ws.max_column + 1):
-        cell_value = eligible_ws.cell(row=1, column=col).value
-        headers.append(str(cell_value) if cell_value else f"Col{col}")
-    
-    print(f"Eligible Agent headers: {headers}")
-    
-    # Find column indices
-    try:
-        group_no_idx = headers.index(group_no_col) + 1
-        family_idx = headers.index(family_col) + 1
-        agent_idx = headers.index(agent_col) + 1
-        agent_name_idx = headers.index(agent_name_col) + 1
-        agency_code_idx = headers.index(agency_code_col) + 1
-        district_idx = headers.index(district_col) + 1
-    except ValueError as e:
-        print(f"Column not found: {e}")
-        workbook.close()
-        return {}
+    If row_counts is a dict, rows scanned and skipped are recorded in it.
+    """
     
     group_families_data = {}
+    rows_scanned = rows_skipped = 0
     
-    # Process each row
-    for row in range(2, eligible_ws.max_row + 1):
-        group_no = eligible_ws.cell(row=row, column=group_no_idx).value
-        family = eligible_ws.cell(row=row, column=family_idx).value
-        agent = eligible_ws.cell(row=row, column=agent_idx).value
-        agent_name = eligible_ws.cell(row=row, column=agent_name_idx).value
-        agency_code = eligible_ws.cell(row=row, column=agency_code_idx).value
-        district = eligible_ws.cell(row=row, column=district_idx).value
-        
+    for group_no, family, agent, agent_name, agency_code, district in mapped_rows:
+        rows_scanned += 1
         if not group_no:
+            rows_skipped += 1
             continue
             
-        group_no = str(group_no).strip()
-        family = str(family).strip() if family else ""
+        # Group, family, agency and district values repeat across many rows
+        group_no = intern(str(group_no).strip())
+        family = intern(str(family).strip()) if family else ""
         agent = str(agent).strip() if agent else ""
         agent_name = str(agent_name).strip() if agent_name else ""
-        agency_code = str(agency_code).strip() if agency_code else ""
-        district = str(district).strip() if district else ""
+        agency_code = intern(str(agency_code).strip()) if agency_code else ""
+        district = intern(str(district).strip()) if district else ""
         
         # Store group info
-        if group_no not in group_families_data:
-            group_families_data[group_no] = {
-                'family': family,
-                'district': district,
-                'agents': []
-            }
+        group = group_families_data.get(group_no)
+        if group is None:
+            group = group_families_data[group_no] = GroupRecord(family, district)
         
         # Update family and district if this row has better info
-        if family and not group_families_data[group_no]['family']:
-            group_families_data[group_no]['family'] = family
-        if district and not group_families_data[group_no]['district']:
-            group_families_data[group_no]['district'] = district
+        if family and not group.family:
+            group.family = family
+        if district and not group.district:
+            group.district = district
         
-        # Add agent info
+        # Add agent info (with the agent's individual district)
         if agent_name:
-            group_families_data[group_no]['agents'].append({
-                'agent': agent,
-                'agent_name': agent_name,
-                'agency_code': agency_code,
-                'district': district  # Store individual agent's district
-            })
+            group.agents.append(AgentRecord(agent, agent_name, agency_code, district))
+    
+    if row_counts is not None:
+        row_counts.update(rows_scanned=rows_scanned, rows_skipped=rows_skipped)
+    return group_families_data
+
+def process_sheet_fast(excel_path, find_sheet_name, column_names, label, aggregate):
+    """Aggregate one sheet with the fast XML reader, or return None to fall back to openpyxl"""
+    
+    try:
+        with FastWorkbook(excel_path) as workbook:
+            sheet_name = find_sheet_name(workbook.sheetnames)
+            if not sheet_name:
+                return {}
+            column_indices = resolve_column_indices(workbook.read_header_row(sheet_name), column_names, label)
+            if column_indices is None:
+                return {}
+            return aggregate(workbook.iter_rows(sheet_name, column_indices))
+    except UnsupportedWorkbookContent as e:
+        print(f"Fast reader cannot handle {label} sheet ({e}), falling back to openpyxl")
+        return None
+
+def process_generation_data(excel_path, agent_name_col, group_no_col, lay_see_amount_col, fast=False, memory_budget=None):
+    """Process Generation sheet data and count prize amounts"""
+    
+    column_names = (agent_name_col, group_no_col, lay_see_amount_col)
+    aggregate = partial(aggregate_generation_rows, memory_budget=memory_budget)
+    if fast:
+        workers_data = process_sheet_fast(excel_path, find_generation_sheet_name, column_names, "Generation", aggregate)
+        if workers_data is not None:
+            return workers_data
+    
+    workbook = load_workbook(excel_path, read_only=True)
+    generation_ws = workbook[find_generation_sheet_name(workbook.sheetnames)]
+    
+    column_indices = resolve_column_indices(read_header_row(generation_ws), column_names, "Generation")
+    if column_indices is None:
+        workbook.close()
+        return {}
+    
+    workers_data = aggregate(iter_mapped_rows(generation_ws, column_indices))
+    
+    workbook.close()
+    return workers_data
+
+def process_eligible_agent_data(excel_path, group_no_col, family_col, agent_col, agent_name_col, agency_code_col, district_col, fast=False):
+    """Process Eligible Agent sheet data"""
+    
+    column_names = (group_no_col, family_col, agent_col, agent_name_col, agency_code_col, district_col)
+    if fast:
+        group_families_data = process_sheet_fast(excel_path, find_eligible_sheet_name, column_names, "Eligible Agent", aggregate_eligible_rows)
+        if group_families_data is not None:
+            return group_families_data
+    
+    workbook = load_workbook(excel_path, read_only=True)
+    
+    eligible_sheet_name = find_eligible_sheet_name(workbook.sheetnames)
+    if not eligible_sheet_name:
+        workbook.close()
+        return {}
+    
+    eligible_ws = workbook[eligible_sheet_name]
+    
+    column_indices = resolve_column_indices(read_header_row(eligible_ws), column_names, "Eligible Agent")
+    if column_indices is None:
+        workbook.close()
+        return {}
+    
+    group_families_data = aggregate_eligible_rows(iter_mapped_rows(eligible_ws, column_indices))
     
     workbook.close()
     return group_families_data
 
-def generate_javascript_data(workers_data, group_families_data):
+def iter_sheet_xml_rows(excel_path, sheet_path, shared_strings, reader_options, column_indices):
+    """Stream mapped columns straight from a sheet's XML inside the workbook zip
+    
+    Used by process-pool workers: the parent has already parsed the shared
+    strings table, so the worker only opens the one zip member it needs.
+    Rows missing from the XML are yielded as all-None rows, as iter_mapped_rows does.
+    """
+    
+    from openpyxl.worksheet._reader import WorkSheetParser
+    
+    empty_row = (None,) * len(column_indices)
+    next_row_idx = 2
+    with zipfile.ZipFile(excel_path) as archive, archive.open(sheet_path) as src:
+        parser = WorkSheetParser(src, shared_strings, **reader_options)
+        for row_idx, cells in parser.parse():
+            if row_idx < next_row_idx:
+                continue
+            for _ in range(next_row_idx, row_idx):
+                yield empty_row
+            next_row_idx = row_idx + 1
+            values = {cell['column'] - 1: cell['value'] for cell in cells}
+            yield tuple(values.get(idx) for idx in column_indices)
+
+def _sheet_stream_args(excel_path, workbook, ws):
+    """Leading iter_sheet_xml_rows arguments that let a worker process stream ws, or None"""
+    
+    sheet_path = getattr(ws, '_worksheet_path', None)
+    shared_strings = getattr(ws, '_shared_strings', None)
+    if sheet_path is None or shared_strings is None:
+        return None
+    reader_options = {
+        'data_only': workbook.data_only,
+        'epoch': workbook.epoch,
+        'date_formats': workbook._date_formats,
+        'timedelta_formats': workbook._timedelta_formats,
+    }
+    return (excel_path, sheet_path, list(shared_strings), reader_options)
+
+def consume_sheet_rows(consume, stream_args, column_indices, fast=False):
+    """Feed a sheet's mapped rows, streamed from the workbook zip, to consume
+    
+    With fast, rows come from the fast XML reader; if it meets a construct it
+    does not support, consume is re-run from the start on openpyxl's parser.
+    """
+    
+    if fast:
+        excel_path, sheet_path, shared_strings, reader_options = stream_args
+        date_style_ids = set(reader_options['date_formats']) | set(reader_options['timedelta_formats'])
+        try:
+            return consume(iter_zip_sheet_rows(excel_path, sheet_path, shared_strings, date_style_ids, column_indices))
+        except UnsupportedWorkbookContent as e:
+            print(f"Fast reader cannot handle {sheet_path} ({e}), falling back to openpyxl")
+    return consume(iter_sheet_xml_rows(*stream_args, column_indices))
+
+def _aggregate_sheet_task(task):
+    """Process-pool entry point: aggregate one sheet streamed from the workbook zip
+    
+    Returns (aggregated data, row counts).
+    """
+    
+    aggregate, stream_args, column_indices, fast = task
+    row_counts = {}
+    result = consume_sheet_rows(partial(aggregate, row_counts=row_counts), stream_args, column_indices, fast)
+    return result, row_counts
+
+def _snapshot_sheet_task(task):
+    """Process-pool entry point: write one sheet streamed from the workbook zip as a snapshot"""
+    
+    snapshot_dir, headers, max_row, max_column, stream_args, fast = task
+    write_snapshot = partial(write_sheet_snapshot, snapshot_dir, headers, max_row=max_row, max_column=max_column)
+    consume_sheet_rows(write_snapshot, stream_args, range(len(headers)), fast)
+
+def _run_tasks_in_pool(task_function, tasks, max_workers):
+    """Run tasks in a process pool, or return None if a pool cannot be used"""
+    
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(task_function, task) for task in tasks]
+            return [future.result() for future in futures]
+    except (OSError, ImportError, BrokenProcessPool) as e:
+        print(f"Process pool unavailable ({e}), reading sheets sequentially")
+        return None
+
+def build_workbook_snapshot(excel_path, content_hash, max_workers=2, fast=False):
+    """Parse the Generation and Eligible Agent sheets once and save them as columnar snapshots
+    
+    Every column is stored, not just the mapped ones, so any later column
+    mapping can be served from the snapshot. Returns True on success.
+    """
+    
+    workbook = load_workbook(excel_path, read_only=True)
+    
+    sheets = {
+        'generation': find_generation_sheet_name(workbook.sheetnames),
+        'eligible': find_eligible_sheet_name(workbook.sheetnames),
+    }
+    workbook_dir = workbook_snapshot_dir(content_hash)
+    os.makedirs(workbook_dir, exist_ok=True)
+    
+    # (snapshot dir, headers, worksheet) per sheet that exists
+    jobs = []
+    for role, sheet_name in sheets.items():
+        if sheet_name:
+            ws = workbook[sheet_name]
+            jobs.append((os.path.join(workbook_dir, role), read_header_row(ws), ws))
+    
+    print("Saving columnar snapshot of the workbook sheets")
+    try:
+        done = False
+        if max_workers > 1 and len(jobs) > 1:
+            tasks = []
+            for snapshot_dir, headers, ws in jobs:
+                stream_args = _sheet_stream_args(excel_path, workbook, ws)
+                if stream_args is None:
+                    break
+                tasks.append((snapshot_dir, headers, ws.max_row, ws.max_column, stream_args, fast))
+            else:
+                done = _run_tasks_in_pool(_snapshot_sheet_task, tasks, max_workers) is not None
+        
+        if not done:
+            for snapshot_dir, headers, ws in jobs:
+                stream_args = _sheet_stream_args(excel_path, workbook, ws) if fast else None
+                if stream_args is not None:
+                    _snapshot_sheet_task((snapshot_dir, headers, ws.max_row, ws.max_column, stream_args, fast))
+                    continue
+                rows = ws.iter_rows(min_row=2, max_col=len(headers), values_only=True)
+                write_sheet_snapshot(snapshot_dir, headers, rows, ws.max_row, ws.max_column)
+    except UnsupportedCellValue as e:
+        print(f"Snapshot skipped: {e}")
+        workbook.close()
+        return False
+    
+    write_workbook_manifest(content_hash, workbook.sheetnames, sheets)
+    workbook.close()
+    return True
+
+def aggregate_workbook_snapshot(content_hash, manifest, generation_columns, eligible_columns, stats=NO_STATS, memory_budget=None):
+    """Aggregate both sheets from a workbook snapshot, reading only the mapped columns"""
+    
+    results = []
+    for role, aggregate, column_names, label in (
+        ('generation', partial(aggregate_generation_rows, memory_budget=memory_budget), generation_columns, "Generation"),
+        ('eligible', aggregate_eligible_rows, eligible_columns, "Eligible Agent"),
+    ):
+        sheet_name = manifest['sheets'][role]
+        snapshot = open_sheet_snapshot(content_hash, role) if sheet_name else None
+        if snapshot is None:
+            results.append({})
+            continue
+        print(f"Using snapshot of sheet: {sheet_name}")
+        column_indices = resolve_column_indices(snapshot.headers, column_names, label)
+        if column_indices is None:
+            results.append({})
+            continue
+        row_counts = {}
+        results.append(aggregate(snapshot.iter_rows(column_indices), row_counts=row_counts))
+        stats.record_sheet(label, row_counts)
+    return results[0], results[1]
+
+def extract_workbook_data(excel_path, generation_columns, eligible_columns, max_workers=2, content_hash=None, use_snapshot=True, fast=False, stats=NO_STATS, memory_budget=None):
+    """Open the workbook once and aggregate the Generation and Eligible Agent sheets concurrently
+    
+    generation_columns is (agent name, group no, lay see amount) and
+    eligible_columns is (group no, family, agent, agent name, agency code,
+    district), as taken by process_generation_data and
+    process_eligible_agent_data. Returns (workers_data, group_families_data),
+    identical to calling those two functions separately.
+    
+    With use_snapshot, the first run saves both sheets as a columnar snapshot
+    and every run aggregates from it, so remapping columns never re-reads the
+    .xlsm. Without it, the workbook manifest and shared strings are parsed once
+    here and each sheet is parsed in its own worker process. Either way, work
+    falls back to this process if a pool cannot be used.
+    
+    With fast, sheets are streamed by the fast XML reader (fast_xlsx.py),
+    falling back to openpyxl per sheet when it meets an unsupported construct.
+    
+    With memory_budget (bytes), the Generation sheet's worker totals are
+    spilled to disk beyond the budget (see aggregate_generation_rows), and
+    sheets are read in this process only, as a pool worker would hold its
+    own copy of the shared strings and totals.
+    
+    Stage times and rows scanned per sheet are recorded in stats.
+    """
+    
+    if memory_budget:
+        max_workers = 1
+    
+    if use_snapshot:
+        if content_hash is None:
+            content_hash = file_content_hash(excel_path)
+        manifest = read_workbook_manifest(content_hash)
+        if manifest is None:
+            with stats.stage('build snapshot'):
+                if build_workbook_snapshot(excel_path, content_hash, max_workers, fast):
+                    manifest = read_workbook_manifest(content_hash)
+        if manifest is not None:
+            with stats.stage('aggregate snapshot'):
+                return aggregate_workbook_snapshot(content_hash, manifest, generation_columns, eligible_columns, stats, memory_budget)
+    
+    with stats.stage('load workbook'):
+        workbook = load_workbook(excel_path, read_only=True)
+    
+    # (aggregate function, worksheet, column indices) per sheet; None when the sheet is unusable
+    jobs = [None, None]
+    
+    generation_ws = workbook[find_generation_sheet_name(workbook.sheetnames)]
+    column_indices = resolve_column_indices(read_header_row(generation_ws), generation_columns, "Generation")
+    if column_indices is not None:
+        jobs[0] = (partial(aggregate_generation_rows, memory_budget=memory_budget), generation_ws, column_indices)
+    
+    eligible_sheet_name = find_eligible_sheet_name(workbook.sheetnames)
+    if eligible_sheet_name:
+        eligible_ws = workbook[eligible_sheet_name]
+        column_indices = resolve_column_indices(read_header_row(eligible_ws), eligible_columns, "Eligible Agent")
+        if column_indices is not None:
+            jobs[1] = (aggregate_eligible_rows, eligible_ws, column_indices)
+    
+    active_jobs = [job for job in jobs if job is not None]
+    with stats.stage('scan sheets'):
+        job_results = None
+        if max_workers > 1 and len(active_jobs) > 1:
+            tasks = []
+            for aggregate, ws, column_indices in active_jobs:
+                stream_args = _sheet_stream_args(excel_path, workbook, ws)
+                if stream_args is None:
+                    break
+                tasks.append((aggregate, stream_args, column_indices, fast))
+            else:
+                job_results = _run_tasks_in_pool(_aggregate_sheet_task, tasks, max_workers)
+    
+        if job_results is None:
+            job_results = []
+            for aggregate, ws, column_indices in active_jobs:
+                stream_args = _sheet_stream_args(excel_path, workbook, ws) if fast else None
+                if stream_args is not None:
+                    job_results.append(_aggregate_sheet_task((aggregate, stream_args, column_indices, fast)))
+                else:
+                    row_counts = {}
+                    job_results.append((aggregate(iter_mapped_rows(ws, column_indices), row_counts=row_counts), row_counts))
+    
+    job_results = iter(job_results)
+    results = []
+    for job, label in zip(jobs, ("Generation", "Eligible Agent")):
+        if job is None:
+            results.append({})
+            continue
+        result, row_counts = next(job_results)
+        stats.record_sheet(label, row_counts)
+        results.append(result)
+    
+    workbook.close()
+    return results[0], results[1]
+
+def workbook_sheet_fingerprints(excel_path):
+    """Fingerprint of the Generation and Eligible Agent sheets (see FastWorkbook.sheet_fingerprint)
+    
+    Returns {'generation': ..., 'eligible': ...}, or {} if the workbook zip
+    cannot be read this way.
+    """
+    
+    try:
+        with FastWorkbook(excel_path) as workbook:
+            fingerprints = {}
+            for role, find_sheet_name in (('generation', find_generation_sheet_name), ('eligible', find_eligible_sheet_name)):
+                sheet_name = find_sheet_name(workbook.sheetnames)
+                fingerprints[role] = workbook.sheet_fingerprint(sheet_name) if sheet_name else None
+            return fingerprints
+    except (OSError, KeyError, zipfile.BadZipFile, UnsupportedWorkbookContent):
+        return {}
+
+def extract_changed_sheets(excel_path, generation_columns, eligible_columns, state, content_hash=None, use_snapshot=True, fast=False, stats=NO_STATS, memory_budget=None):
+    """extract_workbook_data for watch mode: re-read only the sheets that changed since the last run
+    
+    An .xlsm stores each sheet as one compressed XML part, so a sheet is the
+    smallest unit that can be skipped: a sheet whose part, shared strings and
+    styles are unchanged (see workbook_sheet_fingerprints) reuses the rows
+    aggregated from it last time, kept in state.sheets.
+    """
+    
+    fingerprints = workbook_sheet_fingerprints(excel_path)
+    reusable = {role for role, fingerprint in fingerprints.items()
+                if fingerprint is not None and role in state.sheets and state.sheets[role][0] == fingerprint}
+    
+    if not reusable:
+        results = extract_workbook_data(excel_path, generation_columns, eligible_columns, content_hash=content_hash,
+                                        use_snapshot=use_snapshot, fast=fast, stats=stats, memory_budget=memory_budget)
+    else:
+        results = []
+        for role, label in (('generation', "Generation"), ('eligible', "Eligible Agent")):
+            if role in reusable:
+                print(f"{label} sheet unchanged, reusing its rows")
+                results.append(state.sheets[role][1])
+            elif role == 'generation':
+                with stats.stage('scan sheets'):
+                    results.append(process_generation_data(excel_path, *generation_columns, fast=fast, memory_budget=memory_budget))
+            else:
+                with stats.stage('scan sheets'):
+                    results.append(process_eligible_agent_data(excel_path, *eligible_columns, fast=fast))
+    
+    state.sheets = {role: (fingerprints.get(role), result) for role, result in zip(('generation', 'eligible'), results)}
+    return results[0], results[1]
+
+def generate_javascript_data(workers_data, group_families_data, employee_ids=None):
     """Generate JavaScript data structure"""
     
-    js_groups = {}
-    group_counter = 1
+    return dict(iter_javascript_groups(workers_data, group_families_data, employee_ids))
+
+def iter_javascript_groups(workers_data, group_families_data, employee_ids=None, campaign=None, join=None):
+    """Yield (group id, group) pairs of generate_javascript_data one group at a time
+    
+    Group and employee IDs come from employee_ids (an EmployeeIdRegistry),
+    which keeps them stable across runs; a fresh registry numbers them in
+    workbook order. When several workbooks are merged, campaign names the
+    workbook the groups come from: it is added to each group and keeps its
+    group numbers apart from the same numbers in other workbooks.
+    
+    Workers are matched to their Eligible Agent rows by join (an AgentJoin
+    of group_families_data, see agent_join.py), whose report covers every
+    worker once the groups have all been generated.
+    """
+    
+    if employee_ids is None:
+        employee_ids = EmployeeIdRegistry()
+    if join is None:
+        join = AgentJoin(group_families_data)
     
     for group_no, workers in workers_data.items():
-        group_id = f"group-{group_counter}"
+        group_key = f"{campaign}/{group_no}" if campaign else group_no
+        group_id = employee_ids.group_id(group_key)
         
         # Get family and district info
         family_name = group_no  # Default to group number
         district_name = ""
-        agents_info = {}
         
         if group_no in group_families_data:
             family_info = group_families_data[group_no]
-            family_name = family_info['family'] if family_info['family'] else group_no
-            district_name = family_info['district']
-            
-            # Create a lookup map for agent info
-            for agent_info in family_info['agents']:
-                agents_info[agent_info['agent_name']] = {
-                    'agent': agent_info['agent'],
-                    'agency_code': agent_info['agency_code'],
-                    'district': agent_info['district']  # Use individual agent's district
-                }
+            family_name = family_info.family if family_info.family else group_no
+            district_name = family_info.district
         
         # Convert workers
         js_workers = []
-        emp_counter = 1
         
         for agent_name, worker_info in workers.items():
-            employee_id = f"EMP{group_counter:03d}{emp_counter:03d}"
+            employee_id = employee_ids.employee_id(group_key, agent_name)
             
-            # Find agency code for this agent
-            agent_info = agents_info.get(agent_name, {})
-            agent_code = agent_info.get('agent', "")
-            agency_code = agent_info.get('agency_code', "")
-            agent_district = agent_info.get('district', "")  # Use individual agent's district
+            # Find agency code and the agent's individual district
+            agent_info = join.resolve(group_no, agent_name)
             
             js_workers.append({
                 'name': agent_name,
-                'tickets': worker_info['tickets'],
+                'tickets': worker_info.tickets,
                 'employeeId': employee_id,
                 'groupNo': group_no,
-                'agent': agent_code,
-                'agencyCode': agency_code,
-                'district': agent_district,  # Use agent's individual district
-                'prizeCounts': worker_info['prize_counts'],
-                'totalPrizeAmount': worker_info['total_prize_amount']
+                'agent': agent_info.agent,
+                'agencyCode': agent_info.agency_code,
+                'district': agent_info.district,  # Use agent's individual district
+                'prizeCounts': worker_info.prize_counts,
+                # Rounded to the cent: float sums of the same amounts differ in
+                # their last bits with the order they were added in (as they are
+                # when --memory-budget adds up partial totals)
+                'totalPrizeAmount': round(worker_info.total_prize_amount, 2)
             })
-            emp_counter += 1
         
         # Create group data
-        js_groups[group_id] = {
+        group = {
             'id': group_id,
             'name': family_name,
             'groupNo': group_no,
             'district': district_name,
             'icon': '👨‍👩‍👧‍👦',
             'description': f"{district_name} District" if district_name else f"Group {group_no}",
-            'workers': js_workers
         }
-        
-        group_counter += 1
+        if campaign:
+            group['campaign'] = campaign
+        group['workers'] = js_workers
+        yield group_id, group
+
+def generate_group_manifest(js_groups):
+    """Summarize every group without its workers, for the group list page"""
     
-    return js_groups
+    return {group_id: group_manifest_entry(group_id, group) for group_id, group in js_groups.items()}
+
+def group_manifest_entry(group_id, group):
+    """One group's manifest summary"""
+    
+    summary = {key: value for key, value in group.items() if key != 'workers'}
+    summary['totalWorkers'] = len(group['workers'])
+    summary['totalTickets'] = sum(worker['tickets'] for worker in group['workers'])
+    summary['shard'] = f"groups/{group_id}.json"
+    summary['drawIndex'] = f"draw/{group_id}.json"
+    summary['searchIndex'] = f"search/{group_id}.json"
+    return summary
+
+# Prize labels used by the drawing page (sales-lottery.js); keys are the
+# Lay See amounts as they appear in prizeCounts
+PRIZE_LABELS = {
+    '$20': '$20 Cash Prize',
+    '$50': '$50 Cash Prize',
+    '$100': '$100 Cash Prize',
+    '$200': '$200 Cash Prize',
+    '$500': '$500 Cash Prize',
+    '$1000': '$1000 Cash Prize',
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+def draw_key(group, worker):
+    """Key the drawing page uses to find a worker's preset results"""
+    
+    group_key = _WHITESPACE.sub('', group.get('name') or group.get('district') or group.get('id') or '')
+    worker_key = _WHITESPACE.sub('', worker.get('name') or worker.get('employeeId') or '')
+    return f"{group_key}-{worker_key}"
+
+def generate_draw_index(group):
+    """Preset results and starting player state for one group, keyed by draw key
+    
+    This is exactly what sales-lottery.js used to rebuild from the group's
+    workers on every page load, so the page can assign it directly.
+    """
+    
+    preset_results = {}
+    players = {}
+    for worker in group['workers']:
+        key = draw_key(group, worker)
+        mapped_prize_counts = {}
+        for prize, count in (worker.get('prizeCounts') or {}).items():
+            mapped_prize_counts[PRIZE_LABELS.get(prize, prize)] = count
+        tickets = sum(mapped_prize_counts.values())
+        preset_results[key] = mapped_prize_counts
+        players[key] = {
+            'name': worker.get('name') or worker.get('employeeId') or 'Unknown',
+            'tickets': tickets,
+            'remaining': tickets,
+            'totalWinnings': 0
+        }
+    return {'presetResults': preset_results, 'players': players}
+
+def write_text_if_changed(path, text):
+    """Write text to path unless the file already holds exactly it; returns True if written"""
+    
+    return write_bytes_if_changed(path, text.encode('utf-8'))
+
+def write_bytes_if_changed(path, data):
+    """Write bytes to path unless the file already holds exactly them; returns True if written"""
+    
+    if output_file_matches(path, data):
+        return False
+    # Write beside the file and rename over it, so readers never see a partial file
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def write_sharded_output(js_groups, data_dir):
+    """Write one JSON file per group plus a manifest.json listing them
+    
+    Each shard holds the full group object as it appears in
+    extracted_data.json; data/draw/<group-id>.json holds the group's
+    precomputed draw index and data/search/<group-id>.json its player
+    search index (see search_index.py). The manifest is written last, so it never points
+    at a shard that does not exist yet. Unchanged files are left untouched
+    and shards of groups that no longer exist are removed.
+    Returns the paths written.
+    """
+    
+    paths_written = []
+    for group_id, group in js_groups.items():
+        paths_written.extend(write_group_files(group_id, group, data_dir))
+    paths_written.extend(finish_sharded_output(generate_group_manifest(js_groups), data_dir))
+    return paths_written
+
+def write_group_files(group_id, group, data_dir, shard_text=None):
+    """Write one group's shard, draw index and search index; returns the paths written
+    
+    shard_text is the group's json.dumps(group, indent=2, ensure_ascii=False)
+    if the caller already has it.
+    """
+    
+    if shard_text is None:
+        shard_text = json.dumps(group, indent=2, ensure_ascii=False)
+    draw_text = json.dumps(generate_draw_index(group), indent=2, ensure_ascii=False)
+    # Postings are plain position lists, so this file is kept unindented
+    search_text = json.dumps(generate_search_index(group['workers']), ensure_ascii=False, separators=(',', ':'))
+    
+    paths_written = []
+    for subdir, text in (('groups', shard_text), ('draw', draw_text), ('search', search_text)):
+        directory = os.path.join(data_dir, subdir)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{group_id}.json")
+        if write_text_if_changed(path, text):
+            paths_written.append(path)
+    return paths_written
+
+def finish_sharded_output(manifest, data_dir):
+    """Write the manifest once every group's files exist, then remove files of groups that are gone
+    
+    manifest is generate_group_manifest of the groups just written.
+    """
+    
+    paths_written = []
+    manifest_text = json.dumps(manifest, indent=2, ensure_ascii=False)
+    manifest_path = os.path.join(data_dir, 'manifest.json')
+    if write_text_if_changed(manifest_path, manifest_text):
+        paths_written.append(manifest_path)
+    
+    current_shards = {f"{group_id}.json" for group_id in manifest}
+    for subdir in ('groups', 'draw', 'search'):
+        directory = os.path.join(data_dir, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if name.endswith('.json') and name not in current_shards:
+                os.remove(os.path.join(directory, name))
+    
+    return paths_written
+
+def read_published_group_ids(data_dir):
+    """Group IDs listed in the current data/manifest.json, or [] if there is none"""
+    
+    try:
+        with open(os.path.join(data_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            return list(json.load(f))
+    except (OSError, ValueError):
+        return []
+
+class PublishedGroups(Mapping):
+    """Groups by group ID, read back from their shards in data/groups/ when accessed
+    
+    Stands in for a dict of every group when the groups are not kept in
+    memory (--memory-budget); each access parses the group's shard again.
+    """
+    
+    def __init__(self, data_dir, group_ids):
+        self.data_dir = data_dir
+        self.group_ids = dict.fromkeys(group_ids)
+    
+    def __getitem__(self, group_id):
+        if group_id not in self.group_ids:
+            raise KeyError(group_id)
+        with open(os.path.join(self.data_dir, 'groups', f"{group_id}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def __iter__(self):
+        return iter(self.group_ids)
+    
+    def __len__(self):
+        return len(self.group_ids)
+
+def publish_group(group_id, group, data_dir, previous_groups=None, need_text=True):
+    """Write one group's files if it changed since it was last published
+    
+    previous_groups holds the groups published by the previous run of a
+    watch session; an unchanged group is then skipped without serializing
+    it (unless need_text). Without it, the group is compared with its shard
+    on disk. Returns (change entry or None, paths written, group text or
+    None); the change entry is the group's output_delta.diff_group.
+    """
+    
+    if previous_groups is not None:
+        old_group = previous_groups.get(group_id)
+        if old_group == group:
+            return None, [], json.dumps(group, indent=2, ensure_ascii=False) if need_text else None
+        group_text = json.dumps(group, indent=2, ensure_ascii=False)
+    else:
+        group_text = json.dumps(group, indent=2, ensure_ascii=False)
+        shard_path = os.path.join(data_dir, 'groups', f"{group_id}.json")
+        try:
+            with open(shard_path, 'r', encoding='utf-8') as f:
+                old_text = f.read()
+        except OSError:
+            old_text = None
+        if old_text == group_text:
+            # Still rewrite the draw and search files if they are missing or stale
+            return None, write_group_files(group_id, group, data_dir, group_text), group_text
+        try:
+            old_group = json.loads(old_text) if old_text is not None else None
+        except ValueError:
+            old_group = None
+    
+    change = diff_group(old_group, group)
+    return change, write_group_files(group_id, group, data_dir, group_text), group_text
+
+def write_compact_output(js_groups, compact_path):
+    """Write the compact encoding of the group data plus its .gz/.br siblings
+    
+    The format is described in compact_output.py and decoded in the browser
+    by js/compact-data.js. A .br file is only produced when the brotli
+    package is installed; a stale one is removed otherwise so a server never
+    serves it for newer data. Returns the paths written.
+    """
+    
+    data = dumps_compact(js_groups).encode('utf-8')
+    variants = precompressed_variants(data)
+    
+    paths_written = []
+    if write_bytes_if_changed(compact_path, data):
+        paths_written.append(compact_path)
+    for suffix in ('.gz', '.br'):
+        variant_path = compact_path + suffix
+        if suffix in variants:
+            if write_bytes_if_changed(variant_path, variants[suffix]):
+                paths_written.append(variant_path)
+        elif os.path.exists(variant_path):
+            os.remove(variant_path)
+    return paths_written
+
+def remove_compact_output(compact_path):
+    """Remove a compact file and its .gz/.br siblings left by an earlier --compact run
+    
+    The pages load the compact file before extracted_data.json, so one left
+    behind would hide newer data. Returns the paths removed.
+    """
+    
+    paths_removed = []
+    for path in (compact_path, compact_path + '.gz', compact_path + '.br'):
+        if os.path.exists(path):
+            os.remove(path)
+            paths_removed.append(path)
+    return paths_removed
+
+def remove_player_database(db_path):
+    """Remove a player database left by an earlier --sqlite run; returns True if one was removed
+    
+    serve.py --db would otherwise keep answering /api/ from it while the
+    shards move on; without the file it answers 503 until --sqlite is run
+    again.
+    """
+    
+    if not os.path.exists(db_path):
+        return False
+    try:
+        os.remove(db_path)
+    except OSError as e:
+        # Windows refuses while a server has it open
+        print(f"Warning: could not remove the database of an earlier run: {e}")
+        return False
+    return True
+
+def split_cli_flags(argv):
+    """Split command line arguments into positional args and --flag / --flag=value options"""
+    
+    args = []
+    flags = {}
+    for arg in argv:
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            flags[name] = value if value else True
+        else:
+            args.append(arg)
+    return args, flags
+
+def output_file_matches(output_path, output_text):
+    """Check whether the output file already holds exactly this text (or bytes)"""
+    
+    encoded = output_text.encode('utf-8') if isinstance(output_text, str) else output_text
+    try:
+        if os.path.getsize(output_path) != len(encoded):
+            return False
+        with open(output_path, 'rb') as f:
+            return f.read() == encoded
+    except OSError:
+        return False
 
 def main():
-    excel_path = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/assets/info/20250811 Lucky Money for Special Districts_Final.xlsm"
+    excel_path = EXCEL_PATH
     
     if not os.path.exists(excel_path):
         print(f"Excel file not found: {excel_path}")
         return
     
-    # Extract and show data structure first
-    sheet_names = extract_excel_data_simple(excel_path)
+    # Show the sheets, headers and first rows
+    sheet_names = inspect_workbook(excel_path)
     
     if sheet_names is None:
         print("Failed to read Excel file")
@@ -339,37 +1160,438 @@ def main():
     print("\nTo extract data, run with column names:")
     print("python3 simple_extract.py 'Agent Name' 'Group No.' 'Lay See amount' 'Group No.' 'Family' 'Agent' 'Agent name' 'Agency code' 'District'")
 
-if __name__ == "__main__":
-    if len(sys.argv) == 10:
-        excel_path = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/assets/info/20250811 Lucky Money for Special Districts_Final.xlsm"
-        
-        # Generation sheet columns
-        agent_name_col = sys.argv[1]
-        group_no_col = sys.argv[2] 
-        lay_see_amount_col = sys.argv[3]
-        
-        # Eligible Agent sheet columns
-        eligible_group_no_col = sys.argv[4]
-        family_col = sys.argv[5]
-        agent_col = sys.argv[6]
-        eligible_agent_name_col = sys.argv[7]
-        agency_code_col = sys.argv[8]
-        district_col = sys.argv[9]
-        
-        workers_data = process_generation_data(excel_path, agent_name_col, group_no_col, lay_see_amount_col)
-        group_families_data = process_eligible_agent_data(excel_path, eligible_group_no_col, family_col, agent_col, eligible_agent_name_col, agency_code_col, district_col)
-        js_data = generate_javascript_data(workers_data, group_families_data)
+def print_data_banner():
+    print("\n" + "="*50)
+    print("GENERATED JAVASCRIPT DATA")
+    print("="*50)
+
+class ExtractionState:
+    """What a --watch session keeps between runs
+    
+    marker is the workbook's (mtime, size) when it was last read,
+    content_hash its hash, sheets the aggregated rows per sheet with the
+    sheet fingerprints they were read at (see extract_changed_sheets) and
+    groups the groups published last, by group ID.
+    """
+    
+    def __init__(self):
+        self.marker = None
+        self.content_hash = None
+        self.sheets = {}
+        self.groups = {}
+
+def workbook_change_marker(excel_path):
+    """(mtime, size) of the workbook, or None if it cannot be read right now"""
+    
+    try:
+        stat = os.stat(excel_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def run_extraction(args, flags, stats=NO_STATS, state=None):
+    """Extract the workbook with the 9 column names in args and write every output
+    
+    flags are the --options from split_cli_flags. Stage times, row and
+    output counts are recorded in stats. With state (an ExtractionState),
+    the run is part of a --watch session: an unchanged workbook is skipped,
+    unchanged sheets are not re-read and unchanged groups are not rewritten.
+    """
+    
+    excel_path = EXCEL_PATH
+    
+    # Generation sheet columns
+    agent_name_col = args[0]
+    group_no_col = args[1] 
+    lay_see_amount_col = args[2]
+    
+    # Eligible Agent sheet columns
+    eligible_group_no_col = args[3]
+    family_col = args[4]
+    agent_col = args[5]
+    eligible_agent_name_col = args[6]
+    agency_code_col = args[7]
+    district_col = args[8]
+    
+    # Taken before reading, so a save made during this run is seen next time
+    if state is not None:
+        state.marker = workbook_change_marker(excel_path)
+    
+    content_hash = None
+    if state is not None or 'no-cache' not in flags or 'no-snapshot' not in flags:
+        with stats.stage('hash workbook'):
+            content_hash = file_content_hash(excel_path)
+    if state is not None and content_hash == state.content_hash:
+        print("Workbook content unchanged")
+        return
+    
+    employee_ids = EmployeeIdRegistry.load(employee_ids_path())
+    allocation = prize_allocation_settings(flags)
+    allocation_key = {'quotas': allocation[0], 'seed': allocation[1]} if allocation is not None else None
+    
+    # Reuse the previous output if the workbook, column mapping, employee IDs and allocation are unchanged
+    output_text = None
+    cache_key = None
+    if 'no-cache' not in flags:
+        with stats.stage('cache lookup'):
+            sheet_name = find_generation_sheet_name(read_sheet_names(excel_path))
+            cache_key = extraction_cache_key(content_hash, sheet_name, args, employee_ids.content_hash(), allocation_key)
+            output_text = load_cached_output(cache_key)
+        if output_text is not None:
+            print("Workbook and column mapping unchanged, using cached extraction")
+    stats.set('cache_hit', output_text is not None)
+    
+    # Groups published by the previous run of a watch session are compared in
+    # memory; otherwise each group is compared with its shard on disk
+    previous_groups = state.groups if state is not None and state.content_hash is not None else None
+    
+    cache_path = None
+    if output_text is None:
+        memory_budget = parse_memory_budget(flags['memory-budget']) if 'memory-budget' in flags else None
+        generation_columns = (agent_name_col, group_no_col, lay_see_amount_col)
+        eligible_columns = (eligible_group_no_col, family_col, agent_col, eligible_agent_name_col, agency_code_col, district_col)
+        with stats.stage('extract workbook'):
+            if state is not None:
+                # Snapshots are only built on the first run: every save is a new workbook version
+                workers_data, group_families_data = extract_changed_sheets(
+                    excel_path, generation_columns, eligible_columns, state,
+                    content_hash=content_hash,
+                    use_snapshot='no-snapshot' not in flags and previous_groups is None,
+                    fast='fast-xlsx' in flags,
+                    stats=stats,
+                    memory_budget=memory_budget
+                )
+            else:
+                # Open the workbook once and read both sheets concurrently
+                workers_data, group_families_data = extract_workbook_data(
+                    excel_path, generation_columns, eligible_columns,
+                    content_hash=content_hash,
+                    use_snapshot='no-snapshot' not in flags,
+                    fast='fast-xlsx' in flags,
+                    stats=stats,
+                    memory_budget=memory_budget
+                )
+        if isinstance(workers_data, SpilledWorkersByGroup):
+            stats.set('spill_runs', len(workers_data.spill.run_paths))
+        if allocation is not None:
+            # Prizes dealt from the quota table replace the sheet's Lay See amounts
+            with stats.stage('allocate prizes'):
+                try:
+                    workers_data = allocate_generation_prizes(workers_data, *allocation)
+                except AllocationError as e:
+                    print(f"Error: {e}")
+                    sys.exit(1)
+            print(f"Prizes allocated from {flags['allocate']} with seed {allocation[1]}")
+        join = AgentJoin(group_families_data)
+        groups = iter_javascript_groups(workers_data, group_families_data, employee_ids, join=join)
+        sheet_totals = [(None, getattr(workers_data, 'sheet_totals', None))]
+        joins = [(None, join)]
         
-        # Output the JavaScript data
+        # Intermediate saves of a watch session are not cached
+        if cache_key is not None and previous_groups is None:
+            cache_path = cache_entry_path(cache_key)
+    else:
+        groups = iter_object_members(output_text)
+        sheet_totals = None
+        joins = None
+    
+    js_groups = publish_extraction(groups, flags, stats, employee_ids, content_hash, previous_groups, output_text, cache_path, sheet_totals, joins)
+    
+    if cache_path is not None:
+        # New workers were numbered while generating; the cached output
+        # belongs under the key of the registry that now includes them
+        if employee_ids.changed:
+            os.replace(cache_path, cache_entry_path(
+                extraction_cache_key(content_hash, sheet_name, args, employee_ids.content_hash(), allocation_key)))
+        evict_cache_entries()
+    
+    if state is not None:
+        state.content_hash = content_hash
+        state.groups = js_groups
+
+def prize_allocation_settings(flags):
+    """(quota tiers, seed) for --allocate=quotas.json --seed=N, or None without --allocate
+    
+    Prints the error and exits if the quotas cannot be read.
+    """
+    
+    if 'allocate' not in flags:
+        return None
+    # The seed is required, so every allocation can be repeated
+    if not isinstance(flags['allocate'], str) or not isinstance(flags.get('seed'), str):
+        print("Error: --allocate needs a quota file and a seed (--allocate=quotas.json --seed=N)")
+        sys.exit(1)
+    try:
+        return load_prize_quotas(flags['allocate']), int(flags['seed'])
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def employee_ids_path():
+    return os.path.join(os.path.dirname(OUTPUT_PATH), 'data', EMPLOYEE_IDS_FILE)
+
+def publish_extraction(groups, flags, stats=NO_STATS, employee_ids=None, content_hash=None, previous_groups=None, output_text=None, cache_path=None, sheet_totals=None, joins=None):
+    """Write every output for the extracted groups and print the run summary
+    
+    groups yields (group id, group) pairs, as iter_javascript_groups does.
+    Each group is serialized once, as it is generated: the text goes to
+    cache_path (if given), extracted_data.json (with --monolithic), stdout
+    (with --print-json) and the group's shard. output_text is the cached
+    extraction the groups were read from, if they were.
+    
+    previous_groups are the groups published by the previous run of a watch
+    session (see publish_group). Groups that were added, changed or removed
+    are recorded as a new revision in data/delta.json (see output_delta.py),
+    and the employee_ids registry is saved if it numbered anyone new.
+    
+    Group, district and campaign totals are accumulated as the groups go
+    by and saved to data/summary.json, reconciled against sheet_totals
+    ([(campaign or None, SheetTotals), ...] of the workbooks read; None for
+    a cached extraction). See extract_summary.py.
+    
+    joins are the AgentJoins the groups were generated with ([(campaign or
+    None, AgentJoin), ...]); their report is saved to data/agent-join.json
+    once every group is out. A cached extraction (None) leaves the report
+    of the run that read the workbook in place.
+    
+    Returns the groups by group ID. With --memory-budget the groups are not
+    kept once written: a PublishedGroups reading them back from their
+    shards is returned, and the compact and SQLite outputs read them from
+    there too.
+    """
+    
+    output_path = OUTPUT_PATH
+    data_dir = os.path.join(os.path.dirname(output_path), 'data')
+    print_json = 'print-json' in flags
+    keep_groups = 'memory-budget' not in flags
+    paths_written = []
+    
+    old_group_ids = list(previous_groups) if previous_groups is not None else read_published_group_ids(data_dir)
+    changes = {}
+    js_groups = {}
+    manifest = {}
+    summary_builder = SummaryBuilder()
+    
+    if output_text is None:
+        json_paths = [cache_path] if cache_path is not None else []
+        if 'monolithic' in flags:
+            json_paths.append(output_path)
+        if print_json:
+            print_data_banner()
+        with stats.stage('generate and write groups'):
+            with JsonObjectStreamWriter(json_paths, [sys.stdout] if print_json else []) as writer:
+                for group_id, group in groups:
+                    change, group_paths, group_text = publish_group(
+                        group_id, group, data_dir, previous_groups, need_text=bool(writer.outputs))
+                    if group_text is not None:
+                        writer.write_member(group_id, group_text)
+                    if change is not None:
+                        changes[group_id] = change
+                    paths_written.extend(group_paths)
+                    summary_builder.add_group(group_id, group)
+                    manifest[group_id] = group_manifest_entry(group_id, group)
+                    if keep_groups:
+                        js_groups[group_id] = group
+        monolithic_written = output_path in writer.paths_written
+    else:
+        if print_json:
+            print_data_banner()
+            print(output_text)
+        with stats.stage('write groups'):
+            for group_id, group in groups:
+                change, group_paths, _ = publish_group(group_id, group, data_dir, previous_groups, need_text=False)
+                if change is not None:
+                    changes[group_id] = change
+                paths_written.extend(group_paths)
+                summary_builder.add_group(group_id, group)
+                manifest[group_id] = group_manifest_entry(group_id, group)
+                if keep_groups:
+                    js_groups[group_id] = group
+        monolithic_written = False
+        if 'monolithic' in flags:
+            with stats.stage('write monolithic'):
+                monolithic_written = write_text_if_changed(output_path, output_text)
+    
+    if not keep_groups:
+        js_groups = PublishedGroups(data_dir, manifest)
+    
+    for group_id in old_group_ids:
+        if group_id not in manifest:
+            changes[group_id] = {'status': 'removed'}
+    
+    if employee_ids is not None and employee_ids.changed:
+        os.makedirs(data_dir, exist_ok=True)
+        if write_text_if_changed(employee_ids_path(), employee_ids.dumps()):
+            paths_written.append(employee_ids_path())
+    
+    summary_path = os.path.join(data_dir, SUMMARY_FILE)
+    summary = summary_builder.summary(content_hash, sheet_totals, load_summary(summary_path))
+    os.makedirs(data_dir, exist_ok=True)
+    if write_text_if_changed(summary_path, json.dumps(summary, indent=2, ensure_ascii=False)):
+        paths_written.append(summary_path)
+    join_report = None
+    if joins is not None:
+        join_report = agent_join_report(joins)
+        join_path = os.path.join(data_dir, AGENT_JOIN_FILE)
+        if write_text_if_changed(join_path, json.dumps(join_report, indent=2, ensure_ascii=False)):
+            paths_written.append(join_path)
+    
+    # The manifest goes last, once every group's files are in place, and the
+    # delta after it, so a kiosk told about a revision finds it published
+    with stats.stage('write manifest'):
+        paths_written.extend(finish_sharded_output(manifest, data_dir))
+    revision = None
+    if changes:
+        delta_path = os.path.join(data_dir, DELTA_FILE)
+        delta = DeltaLog.load(delta_path)
+        revision = delta.record(changes, content_hash)
+        write_text_if_changed(delta_path, delta.dumps())
+        paths_written.append(delta_path)
+    
+    workers = summary['totals']['workers']
+    tickets = summary['totals']['tickets']
+    stats.set('groups', len(manifest))
+    stats.set('workers', workers)
+    stats.set('groups_changed', len(changes))
+    stats.set('reconciliation', summary['reconciliation']['status'])
+    if join_report is not None:
+        stats.set('agent_join', join_report['totals'])
+    print(f"\nExtracted {len(manifest)} groups, {workers} workers, {tickets} tickets"
+          + ("" if print_json else " (pass --print-json to print the data)"))
+    print(f"Group shards saved to: {data_dir} ({len(paths_written)} files updated)")
+    print(f"Summary saved to: {summary_path} (reconciliation: {describe_reconciliation(summary['reconciliation'])})")
+    if join_report is not None:
+        print(f"Agent join saved to: {os.path.join(data_dir, AGENT_JOIN_FILE)} ({describe_agent_join(join_report)})")
+    if revision is not None:
+        print(f"Delta saved to: {os.path.join(data_dir, DELTA_FILE)} (revision {revision}, groups added, changed or removed: {len(changes)})")
+    else:
+        print("No group changed")
+    
+    # The single-file extracted_data.json is only written on request
+    if 'monolithic' in flags:
+        if monolithic_written:
+            paths_written.append(output_path)
+            print(f"Data saved to: {output_path}")
+        else:
+            print(f"Data unchanged: {output_path}")
+    
+    # Dictionary-encoded, minified copy with precompressed siblings
+    compact_path = os.path.join(os.path.dirname(output_path), 'extracted_data.compact.json')
+    if 'compact' in flags:
+        with stats.stage('write compact'):
+            compact_paths = write_compact_output(js_groups, compact_path)
+        paths_written.extend(compact_paths)
+        print(f"Compact data saved to: {compact_path} ({len(compact_paths)} files updated)")
+    elif remove_compact_output(compact_path):
+        print(f"Removed compact data of an earlier run: {compact_path} (pass --compact to keep it current)")
+    
+    # Indexed SQLite copy for the /api/ of serve.py --db
+    if 'sqlite' in flags:
+        db_path = flags['sqlite'] if isinstance(flags['sqlite'], str) else os.path.join(os.path.dirname(output_path), DEFAULT_DB_FILE)
+        if revision is None:
+            revision = DeltaLog.load(os.path.join(data_dir, DELTA_FILE)).revision
+        if changes or read_database_revision(db_path) != revision:
+            with stats.stage('write sqlite'):
+                write_player_database(js_groups, db_path, revision, draw_key, PRIZE_LABELS)
+            paths_written.append(db_path)
+            print(f"Database saved to: {db_path}")
+        else:
+            print(f"Database unchanged: {db_path}")
+    elif remove_player_database(os.path.join(os.path.dirname(output_path), DEFAULT_DB_FILE)):
+        print(f"Removed database of an earlier run: {os.path.join(os.path.dirname(output_path), DEFAULT_DB_FILE)} (pass --sqlite to keep it current)")
+    
+    stats.set('files_written', len(paths_written))
+    stats.set('bytes_written', sum(os.path.getsize(path) for path in paths_written))
+    return js_groups
+
+def print_stats_report(stats, flags):
+    """Print the --stats report, or save it to the path given with --stats=path"""
+    
+    report_text = json.dumps(stats.report(), indent=2)
+    if isinstance(flags['stats'], str):
+        with open(flags['stats'], 'w', encoding='utf-8') as f:
+            f.write(report_text + '\n')
+        print(f"Stats saved to: {flags['stats']}")
+    else:
         print("\n" + "="*50)
-        print("GENERATED JAVASCRIPT DATA")
+        print("EXTRACTION STATS")
         print("="*50)
-        print(json.dumps(js_data, indent=2, ensure_ascii=False))
+        print(report_text)
+
+def run_watched_extraction(args, flags, state):
+    """One run of a watch session; a workbook that cannot be read is retried when it changes again"""
+    
+    stats = ExtractionStats() if 'stats' in flags else NO_STATS
+    try:
+        run_extraction(args, flags, stats, state)
+    except Exception as e:
+        # Typically a save still in progress; the finished save changes the file again
+        print(f"Could not extract {EXCEL_PATH} ({type(e).__name__}: {e}), waiting for the next change")
+        return
+    if 'stats' in flags:
+        print_stats_report(stats, flags)
+
+def watch_extraction(args, flags, interval=WATCH_INTERVAL):
+    """Extract once, then re-extract whenever the workbook changes, until interrupted
+    
+    The workbook's modification time and size are polled every interval
+    seconds; a change is only acted on once they have held still for one
+    more interval, so a save in progress is not read half-written.
+    """
+    
+    state = ExtractionState()
+    run_watched_extraction(args, flags, state)
+    print(f"\nWatching {EXCEL_PATH} for changes every {interval:g}s (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            marker = workbook_change_marker(EXCEL_PATH)
+            if marker is None or marker == state.marker:
+                continue
+            time.sleep(interval)
+            if workbook_change_marker(EXCEL_PATH) != marker:
+                continue
+            print(f"\n{time.strftime('%H:%M:%S')} Workbook changed, re-extracting")
+            run_watched_extraction(args, flags, state)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+if __name__ == "__main__":
+    args, flags = split_cli_flags(sys.argv[1:])
+    
+    if 'batch' in flags:
+        # Several workbooks merged into one dataset; args are workbook paths, directories or globs
+        from batch_extract import DEFAULT_CONFIG_PATH, run_batch_extraction
+        stats = ExtractionStats() if 'stats' in flags else NO_STATS
+        config_path = flags['batch'] if isinstance(flags['batch'], str) else DEFAULT_CONFIG_PATH
+        if not run_batch_extraction(config_path, args, flags, stats):
+            sys.exit(1)
+        if 'stats' in flags:
+            print_stats_report(stats, flags)
+    elif 'inspect' in flags:
+        # List the given workbooks (default: the configured one) without extracting
+        preview_rows = int(flags['inspect']) if isinstance(flags['inspect'], str) else PREVIEW_ROWS
+        for excel_path in args or [EXCEL_PATH]:
+            if not os.path.exists(excel_path):
+                print(f"Excel file not found: {excel_path}")
+                sys.exit(1)
+            inspect_workbook(excel_path, preview_rows)
+    elif len(args) == 9 and 'watch' in flags:
+        watch_extraction(args, flags, float(flags['watch']) if isinstance(flags['watch'], str) else WATCH_INTERVAL)
+    elif len(args) == 9:
+        stats = ExtractionStats() if 'stats' in flags else NO_STATS
+        
+        if isinstance(flags.get('profile'), str):
+            # Profiles this process only; sheets read in pool workers show up as waiting
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.runcall(run_extraction, args, flags, stats)
+            profiler.dump_stats(flags['profile'])
+            print(f"Profile saved to: {flags['profile']}")
+        else:
+            run_extraction(args, flags, stats)
         
-        # Save to file
-        output_path = "/Users/user/html/aia.luckdraw/aia-lucky-draw-wheel/extracted_data.json"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(js_data, f, indent=2, ensure_ascii=False)
-        print(f"\nData saved to: {output_path}")
+        if 'stats' in flags:
+            print_stats_report(stats, flags)
     else:
         main()
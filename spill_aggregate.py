@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Memory-bounded aggregation for the AIA Lucky Draw System
+With --memory-budget, the Generation sheet's per-worker totals are not all
+held until the sheet is read: once the workers held in memory reach the
+budget, they are written to a run file in .extract_cache/spill/ and
+aggregation starts over with an empty dict. Each run holds one pickled
+batch of partial totals per group, in the order the groups first appear in
+the sheet.
+
+The runs are merged back one group at a time as the groups are generated
+(SpilledWorkersByGroup.items), so only the largest group's workers are in
+memory at once. The merge keeps the in-memory order: runs are read in sheet
+order, so a worker and each of their prize keys are added where they first
+appeared, and tickets, prize counts and prize amounts are added up across
+runs. Prize amounts added up per run can differ from the row-by-row float
+sum in the last bits (0.1 + (0.2 + 0.3) is not (0.1 + 0.2) + 0.3);
+iter_javascript_groups rounds each worker's total to the cent, so for
+whole-dollar and cent Lay See amounts the output is the same either way.
+
+Run files are removed once the result is no longer used, or when the
+process exits; files left by a process that was killed can be deleted
+whenever no extraction is running.
+"""
+
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from operator import itemgetter
+
+from extract_cache import CACHE_DIR
+from extract_records import WorkerRecord, intern
+
+SPILL_DIR = os.path.join(CACHE_DIR, 'spill')
+
+# Used by --memory-budget without a value
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Rough size of one worker's totals in memory: the WorkerRecord, its name,
+# its prize counts dict and its entry in the group's dict
+WORKER_BYTES = 400
+
+def parse_memory_budget(value):
+    """Bytes for a --memory-budget flag value: megabytes, or True for the default"""
+
+    megabytes = DEFAULT_MEMORY_BUDGET_MB if value is True else float(value)
+    if megabytes <= 0:
+        raise ValueError(f"Memory budget must be positive, got {value}")
+    return int(megabytes * 1024 * 1024)
+
+def _read_run(path):
+    """Yield the (group position, group number, worker totals) batches of one run file"""
+
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+class GenerationSpill:
+    """Runs of partial worker totals written out whenever the budget is reached"""
+
+    def __init__(self, memory_budget):
+        self.max_workers = max(1, memory_budget // WORKER_BYTES)
+        # Group number -> position of its first appearance in the sheet
+        self.group_order = {}
+        self.run_paths = []
+        self.directory = None
+
+    def write_run(self, workers_data):
+        """Write the groups of workers_data (group number -> agent name -> WorkerRecord) as a new run"""
+
+        if self.directory is None:
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix='generation-', dir=SPILL_DIR)
+            weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+        # Runs are written in sheet order, so a group's first run places it
+        for group_no in workers_data:
+            self.group_order.setdefault(group_no, len(self.group_order))
+
+        path = os.path.join(self.directory, f"run-{len(self.run_paths):05d}.pickle")
+        with open(path, 'wb') as f:
+            for group_no in sorted(workers_data, key=self.group_order.__getitem__):
+                totals = [(worker.name, worker.tickets, worker.prize_counts, worker.total_prize_amount)
+                          for worker in workers_data[group_no].values()]
+                pickle.dump((self.group_order[group_no], group_no, totals), f, pickle.HIGHEST_PROTOCOL)
+        self.run_paths.append(path)
+
+class SpilledWorkersByGroup:
+    """Workers by group number, then agent name, merged back from a GenerationSpill
+
+    Stands in for the WorkersByGroup of aggregate_generation_rows: groups
+    come out of items() in the same order with the same WorkerRecords, but
+    each is rebuilt from the run files as it is reached. Can be iterated
+    more than once.
+    """
+
+    def __init__(self, spill, sheet_totals=None):
+        self.spill = spill
+        self.sheet_totals = sheet_totals
+
+    def __len__(self):
+        return len(self.spill.group_order)
+
+    def __iter__(self):
+        return iter(self.spill.group_order)
+
+    def keys(self):
+        return self.spill.group_order.keys()
+
+    def items(self):
+        runs = [_read_run(path) for path in self.spill.run_paths]
+        # heapq.merge keeps run order among batches of the same group
+        batches = heapq.merge(*runs, key=itemgetter(0))
+        for _, group_batches in itertools.groupby(batches, key=itemgetter(0)):
+            workers = {}
+            for _, group_no, totals in group_batches:
+                group_no = intern(group_no)
+                for name, tickets, prize_counts, total_prize_amount in totals:
+                    worker = workers.get(name)
+                    if worker is None:
+                        workers[name] = WorkerRecord(name, group_no, tickets, prize_counts, total_prize_amount)
+                        continue
+                    worker.tickets += tickets
+                    for prize_key, count in prize_counts.items():
+                        worker.prize_counts[prize_key] = worker.prize_counts.get(prize_key, 0) + count
+                    worker.total_prize_amount += total_prize_amount
+            yield group_no, workers
+
+    def values(self):
+        for _, workers in self.items():
+            yield workers
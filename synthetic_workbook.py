@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Synthetic campaign workbook generator for the AIA Lucky Draw System
+Writes an .xlsx shaped like the real Lucky Money workbook (Generation,
+Value only and Eligible Agent sheets with the same headers) filled with
+random but reproducible agents and tickets, for benchmarking the extractors
+without the confidential campaign file.
+
+The sheets are written as raw SpreadsheetML straight into the zip, with
+shared strings like Excel writes them, so million-row workbooks take
+seconds rather than the minutes openpyxl needs.
+
+Usage: python3 synthetic_workbook.py <ticket rows> <output.xlsx> [--seed=N]
+"""
+
+import random
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+
+GENERATION_HEADERS = ('Agent Name', 'Group No.', 'Lay See amount')
+ELIGIBLE_HEADERS = ('Group No.', 'Family', 'Agent', 'Agent name', 'Agency code', 'District')
+
+# Prize tiers and how often each is drawn
+PRIZE_TIERS = (20, 50, 100, 200, 500, 1000)
+PRIZE_WEIGHTS = (30, 40, 18, 8, 3, 1)
+
+# Tickets per agent: 1 to 10, most agents holding only a few
+TICKET_WEIGHTS = (30, 20, 15, 10, 8, 6, 4, 3, 2, 2)
+
+# Share of eligible agents who hold no tickets at all
+AGENTS_WITHOUT_TICKETS = 0.05
+
+DISTRICTS = (
+    'PORTFOLIO MANAGEMENT', 'KOWLOON EAST', 'KOWLOON WEST', 'HONG KONG ISLAND',
+    'NEW TERRITORIES EAST', 'NEW TERRITORIES WEST', 'MACAU', 'PREMIER AGENCY',
+)
+SURNAMES = (
+    'CHAN', 'WONG', 'LEE', 'CHEUNG', 'LAU', 'HO', 'NG', 'LEUNG', 'LAM', 'TSANG',
+    'YEUNG', 'CHOI', 'TANG', 'KWOK', 'MAK', 'FUNG', 'YIP', 'LAI', 'SO', 'TAM',
+)
+GIVEN_SYLLABLES = (
+    'KA', 'YAN', 'WAI', 'MAN', 'CHI', 'HO', 'KIN', 'MING', 'SIU', 'FAI', 'YEE',
+    'LOK', 'TAK', 'SZE', 'HEI', 'KWAN', 'PUI', 'WING', 'YU', 'CHUN', 'HIU', 'TSZ',
+)
+
+NAMESPACES = ('xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+              'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+
+def group_count_for(ticket_rows):
+    """Roughly 8,000 agents per group, between 4 and 200 groups"""
+
+    return min(200, max(4, ticket_rows // 25000))
+
+def generate_campaign(ticket_rows, seed=0):
+    """Random agents and tickets totalling exactly ticket_rows Generation rows
+
+    Returns (generation_rows, eligible_rows) as lists of tuples in header
+    order. Agents are listed group by group; every ticket-holding agent has
+    an Eligible Agent row.
+    """
+
+    rng = random.Random(seed)
+    group_count = group_count_for(ticket_rows)
+    groups = [(group_no, rng.choice(DISTRICTS)) for group_no in range(1, group_count + 1)]
+
+    generation_rows = []
+    eligible_rows = []
+    used_names = set()
+    agent_number = 10000
+    while len(generation_rows) < ticket_rows:
+        group_no, district = groups[rng.randrange(group_count)]
+
+        # Names are unique across the workbook so every agent stays a separate worker
+        given = ' '.join(rng.choice(GIVEN_SYLLABLES) for _ in range(rng.choice((1, 2, 2))))
+        name = f"{rng.choice(SURNAMES)} {given}"
+        while name in used_names:
+            name = f"{name} {rng.choice(GIVEN_SYLLABLES)}"
+        used_names.add(name)
+
+        agent_number += rng.randrange(1, 40)
+        eligible_rows.append((group_no, district, str(agent_number), name, f"{rng.randrange(100000):05d}", district))
+
+        if rng.random() < AGENTS_WITHOUT_TICKETS:
+            continue
+        tickets = rng.choices(range(1, len(TICKET_WEIGHTS) + 1), TICKET_WEIGHTS)[0]
+        tickets = min(tickets, ticket_rows - len(generation_rows))
+        for _ in range(tickets):
+            generation_rows.append((name, group_no, rng.choices(PRIZE_TIERS, PRIZE_WEIGHTS)[0]))
+
+    # Group by group number, keeping each group's agents in creation order
+    group_order = {group_no: position for position, (group_no, district) in enumerate(groups)}
+    generation_rows.sort(key=lambda row: group_order[row[1]])
+    eligible_rows.sort(key=lambda row: group_order[row[0]])
+    return generation_rows, eligible_rows
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+class _SharedStrings:
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def index(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+def _write_sheet(archive, path, headers, rows, shared_strings, chunk_rows=10000):
+    letters = [_column_letter(col) for col in range(len(headers))]
+    last_cell = f"{letters[-1]}{len(rows) + 1}"
+    with archive.open(path, 'w', force_zip64=True) as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet {NAMESPACES}><dimension ref="A1:{last_cell}"/><sheetData>'.encode('utf-8'))
+        chunk = []
+        for row_number, row in enumerate([headers, *rows], start=1):
+            cells = []
+            for letter, value in zip(letters, row):
+                if isinstance(value, str):
+                    cells.append(f'<c r="{letter}{row_number}" t="s"><v>{shared_strings.index(value)}</v></c>')
+                else:
+                    cells.append(f'<c r="{letter}{row_number}"><v>{value}</v></c>')
+            chunk.append(f'<row r="{row_number}">{"".join(cells)}</row>')
+            if len(chunk) >= chunk_rows:
+                f.write(''.join(chunk).encode('utf-8'))
+                chunk = []
+        f.write(''.join(chunk).encode('utf-8'))
+        f.write(b'</sheetData></worksheet>')
+
+def write_campaign_workbook(output_path, generation_rows, eligible_rows):
+    """Write the three campaign sheets as an .xlsx with shared strings"""
+
+    sheets = (
+        ('Generation', GENERATION_HEADERS, generation_rows),
+        ('Value only', GENERATION_HEADERS, generation_rows),
+        ('Eligible Agent', ELIGIBLE_HEADERS, eligible_rows),
+    )
+    shared_strings = _SharedStrings()
+
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for number, (name, headers, rows) in enumerate(sheets, start=1):
+            _write_sheet(archive, f"xl/worksheets/sheet{number}.xml", headers, rows, shared_strings)
+
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for number in range(1, len(sheets) + 1))
+        archive.writestr('[Content_Types].xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            f'{overrides}</Types>')
+        archive.writestr('_rels/.rels',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>')
+
+        sheet_entries = ''.join(
+            f'<sheet name="{escape(name)}" sheetId="{number}" r:id="rId{number}"/>'
+            for number, (name, headers, rows) in enumerate(sheets, start=1))
+        archive.writestr('xl/workbook.xml',
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook {NAMESPACES}><sheets>{sheet_entries}</sheets></workbook>')
+
+        relationships = ''.join(
+            f'<Relationship Id="rId{number}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{number}.xml"/>'
+            for number in range(1, len(sheets) + 1))
+        styles_id = len(sheets) + 1
+        archive.writestr('xl/_rels/workbook.xml.rels',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relationships}'
+            f'<Relationship Id="rId{styles_id}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/>'
+            f'<Relationship Id="rId{styles_id + 1}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+            'Target="sharedStrings.xml"/></Relationships>')
+
+        archive.writestr('xl/styles.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>')
+
+        with archive.open('xl/sharedStrings.xml', 'w', force_zip64=True) as f:
+            count = len(shared_strings.strings)
+            f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                    f'count="{count}" uniqueCount="{count}">'.encode('utf-8'))
+            f.write(''.join(f'<si><t>{escape(value)}</t></si>' for value in shared_strings.strings).encode('utf-8'))
+            f.write(b'</sst>')
+
+def generate_campaign_workbook(output_path, ticket_rows, seed=0):
+    """Generate and write a synthetic campaign workbook; returns (ticket rows, eligible agents)"""
+
+    generation_rows, eligible_rows = generate_campaign(ticket_rows, seed)
+    write_campaign_workbook(output_path, generation_rows, eligible_rows)
+    return len(generation_rows), len(eligible_rows)
+
+if __name__ == "__main__":
+    from simple_extract import split_cli_flags
+
+    args, flags = split_cli_flags(sys.argv[1:])
+    if len(args) != 2:
+        print("Usage: python3 synthetic_workbook.py <ticket rows> <output.xlsx> [--seed=N]")
+        sys.exit(1)
+
+    ticket_rows, agents = generate_campaign_workbook(args[1], int(args[0]), int(flags.get('seed', 0)))
+    print(f"Wrote {args[1]}: {ticket_rows} ticket rows, {agents} eligible agents")